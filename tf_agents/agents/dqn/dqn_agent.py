@@ -41,9 +41,11 @@ from tf_agents.environments import trajectory
 from tf_agents.policies import epsilon_greedy_policy
 from tf_agents.policies import greedy_policy
 from tf_agents.policies import q_policy
+from tf_agents.policies import state_recording_policy
 from tf_agents.utils import common as common_utils
 from tf_agents.utils import eager_utils
 from tf_agents.utils import nest_utils
+from tf_agents.utils import rnn_utils
 
 import gin.tf
 
@@ -95,6 +97,8 @@ class DqnAgent(tf_agent.BaseV2):
       gamma=1.0,
       reward_scale_factor=1.0,
       gradient_clipping=None,
+      store_policy_state=False,
+      burn_in_steps=0,
       # Params for debugging
       debug_summaries=False,
       summarize_grads_and_vars=False):
@@ -118,12 +122,23 @@ class DqnAgent(tf_agent.BaseV2):
       gamma: A discount factor for future rewards.
       reward_scale_factor: Multiplicative scale for the reward.
       gradient_clipping: Norm length to clip gradients.
+      store_policy_state: Whether the collect policy records its policy state
+        in the info of the collected trajectories (see
+        `StateRecordingPolicy`). The recurrent q_network is then unrolled over
+        the training sequences starting from the state stored at their first
+        step, instead of from zeros.
+      burn_in_steps: Number of leading steps of each training sequence only
+        used to compute the state of the recurrent q_network. No gradients
+        flow through this state, and the loss is computed on the remaining
+        steps.
       debug_summaries: A bool to gather debug summaries.
       summarize_grads_and_vars: If True, gradient and network variable summaries
         will be written during training.
 
     Raises:
-      ValueError: If the action spec contains more than one action.
+      ValueError: If the action spec contains more than one action, or if
+        store_policy_state or burn_in_steps are set with a non recurrent
+        q_network.
     """
     flat_action_spec = nest.flatten(action_spec)
     self._num_actions = [
@@ -133,6 +148,9 @@ class DqnAgent(tf_agent.BaseV2):
     # TODO(oars): Get DQN working with more than one dim in the actions.
     if len(flat_action_spec) > 1 or flat_action_spec[0].shape.ndims > 1:
       raise ValueError('Only one dimensional actions are supported now.')
+    if (store_policy_state or burn_in_steps) and not q_network.state_spec:
+      raise ValueError('store_policy_state and burn_in_steps require a '
+                       'recurrent q_network.')
 
     self._q_network = q_network
     self._target_q_network = self._q_network.copy(name='TargetQNetwork')
@@ -144,6 +162,8 @@ class DqnAgent(tf_agent.BaseV2):
     self._gamma = gamma
     self._reward_scale_factor = reward_scale_factor
     self._gradient_clipping = gradient_clipping
+    self._store_policy_state = store_policy_state
+    self._burn_in_steps = burn_in_steps
 
     self._target_update_train_op = None
 
@@ -152,6 +172,9 @@ class DqnAgent(tf_agent.BaseV2):
 
     collect_policy = epsilon_greedy_policy.EpsilonGreedyPolicy(
         policy, epsilon=self._epsilon_greedy)
+    if store_policy_state:
+      collect_policy = state_recording_policy.StateRecordingPolicy(
+          collect_policy)
     policy = greedy_policy.GreedyPolicy(policy)
 
     super(DqnAgent, self).__init__(
@@ -201,9 +224,19 @@ class DqnAgent(tf_agent.BaseV2):
     actions = policy_steps.action
     return time_steps, actions, next_time_steps
 
+  def _experience_to_network_states(self, experience):
+    """Returns the stored q_network states before the first two time steps."""
+    if not self._store_policy_state:
+      return None, None
+    policy_state = experience.policy_info.policy_state
+    return (nest.map_structure(lambda t: t[:, 0], policy_state),
+            nest.map_structure(lambda t: t[:, 1], policy_state))
+
   def _train(self, experience, train_step_counter=None):
     time_steps, actions, next_time_steps = self._experience_to_transitions(
         experience)
+    network_state, next_network_state = self._experience_to_network_states(
+        experience)
 
     loss_info = self._loss(
         time_steps,
@@ -211,7 +244,9 @@ class DqnAgent(tf_agent.BaseV2):
         next_time_steps,
         td_errors_loss_fn=self._td_errors_loss_fn,
         gamma=self._gamma,
-        reward_scale_factor=self._reward_scale_factor)
+        reward_scale_factor=self._reward_scale_factor,
+        network_state=network_state,
+        next_network_state=next_network_state)
 
     transform_grads_fn = None
     if self._gradient_clipping is not None:
@@ -252,7 +287,9 @@ class DqnAgent(tf_agent.BaseV2):
             next_time_steps,
             td_errors_loss_fn=element_wise_huber_loss,
             gamma=1.0,
-            reward_scale_factor=1.0):
+            reward_scale_factor=1.0,
+            network_state=None,
+            next_network_state=None):
     """Computes loss for DQN training.
 
     Args:
@@ -263,6 +300,10 @@ class DqnAgent(tf_agent.BaseV2):
         element wise loss.
       gamma: Discount for future rewards.
       reward_scale_factor: Multiplicative factor to scale rewards.
+      network_state: (optional) State of the recurrent q_network before the
+        first of time_steps. Defaults to zeros.
+      next_network_state: (optional) State of the recurrent q_networks before
+        the first of next_time_steps. Defaults to zeros.
 
     Returns:
       loss: A scalar loss.
@@ -272,8 +313,9 @@ class DqnAgent(tf_agent.BaseV2):
     """
     with tf.name_scope('loss'):
       actions = nest.flatten(actions)[0]
-      q_values, _ = self._q_network(time_steps.observation,
-                                    time_steps.step_type)
+      q_values, _ = rnn_utils.unroll_with_burn_in(
+          self._q_network, (time_steps.observation, time_steps.step_type),
+          network_state, self._burn_in_steps)
 
       # Handle action_spec.shape=(), and shape=(1,) by using the
       # multi_dim_actions param.
@@ -281,7 +323,8 @@ class DqnAgent(tf_agent.BaseV2):
       q_values = common_utils.index_with_actions(
           q_values, tf.to_int32(actions), multi_dim_actions=multi_dim_actions)
 
-      next_q_values = self._compute_next_q_values(next_time_steps)
+      next_q_values = self._compute_next_q_values(next_time_steps,
+                                                  next_network_state)
       td_targets = compute_td_targets(
           next_q_values,
           rewards=reward_scale_factor * next_time_steps.reward,
@@ -289,6 +332,9 @@ class DqnAgent(tf_agent.BaseV2):
 
       weights = tf.to_float(~time_steps.is_last())
       td_loss = weights * td_errors_loss_fn(td_targets, q_values)
+      if self._burn_in_steps:
+        # The loss is only computed on the steps following the burn-in.
+        td_loss = td_loss[:, self._burn_in_steps:]
 
       if nest_utils.is_batched_nested_tensors(
           time_steps, self.time_step_spec(), num_outer_dims=2):
@@ -323,17 +369,21 @@ class DqnAgent(tf_agent.BaseV2):
 
       return tf_agent.LossInfo(loss, DqnLossInfo(td_loss=td_loss))
 
-  def _compute_next_q_values(self, next_time_steps):
+  def _compute_next_q_values(self, next_time_steps, network_state=None):
     """Compute the q value of the next state for TD error computation.
 
     Args:
       next_time_steps: A batch of next timesteps
+      network_state: (optional) State of the recurrent q_networks before the
+        first of next_time_steps.
 
     Returns:
       A tensor of Q values for the given next state.
     """
-    next_target_q_values, _ = self._target_q_network(
-        next_time_steps.observation, next_time_steps.step_type)
+    next_target_q_values, _ = rnn_utils.unroll_with_burn_in(
+        self._target_q_network,
+        (next_time_steps.observation, next_time_steps.step_type),
+        network_state, self._burn_in_steps)
     # Reduce_max below assumes q_values are [BxF] or [BxTxF]
     assert next_target_q_values.shape.ndims in [2, 3]
     return tf.reduce_max(next_target_q_values, -1)
@@ -350,21 +400,24 @@ class DdqnAgent(DqnAgent):
 
   """
 
-  def _compute_next_q_values(self, next_time_steps):
+  def _compute_next_q_values(self, next_time_steps, network_state=None):
     """Compute the q value of the next state for TD error computation.
 
     Args:
       next_time_steps: A batch of next timesteps
+      network_state: (optional) State of the recurrent q_networks before the
+        first of next_time_steps.
 
     Returns:
       A tensor of Q values for the given next state.
     """
     # TODO(b/117175589): Add binary tests for DDQN.
-    next_q_values, _ = self._q_network(next_time_steps.observation,
-                                       next_time_steps.step_type)
+    inputs = (next_time_steps.observation, next_time_steps.step_type)
+    next_q_values, _ = rnn_utils.unroll_with_burn_in(
+        self._q_network, inputs, network_state, self._burn_in_steps)
     best_next_actions = tf.to_int32(tf.argmax(next_q_values, axis=-1))
-    next_target_q_values, _ = self._target_q_network(
-        next_time_steps.observation, next_time_steps.step_type)
+    next_target_q_values, _ = rnn_utils.unroll_with_burn_in(
+        self._target_q_network, inputs, network_state, self._burn_in_steps)
     multi_dim_actions = best_next_actions.shape.ndims > 1
     return common_utils.index_with_actions(
         next_target_q_values,
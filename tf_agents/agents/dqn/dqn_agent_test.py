@@ -25,6 +25,8 @@ import tensorflow as tf
 from tf_agents.agents.dqn import dqn_agent
 from tf_agents.environments import time_step as ts
 from tf_agents.networks import network
+from tf_agents.networks import q_rnn_network
+from tf_agents.policies import state_recording_policy
 from tf_agents.specs import tensor_spec
 
 nest = tf.contrib.framework.nest
@@ -100,6 +102,63 @@ class AgentTest(tf.test.TestCase):
       agent_class(
           self._time_step_spec, action_spec, q_network=q_net, optimizer=None)
 
+  def testCreateAgentStorePolicyStateRequiresRecurrentNetwork(
+      self, agent_class):
+    q_net = DummyNet(self._observation_spec, self._action_spec)
+    with self.assertRaisesRegexp(ValueError, '.*recurrent.*'):
+      agent_class(
+          self._time_step_spec,
+          self._action_spec,
+          q_network=q_net,
+          optimizer=None,
+          store_policy_state=True)
+
+  def testCollectDataSpecRecordsPolicyState(self, agent_class):
+    q_net = q_rnn_network.QRnnNetwork(
+        self._observation_spec, self._action_spec, lstm_size=(4,))
+    agent = agent_class(
+        self._time_step_spec,
+        self._action_spec,
+        q_network=q_net,
+        optimizer=None,
+        store_policy_state=True)
+    self.assertEqual(
+        agent.collect_data_spec().policy_info,
+        state_recording_policy.RecordedStateInfo(
+            policy_state=q_net.state_spec, info=()))
+
+  def testLossWithStoredStateAndBurnIn(self, agent_class):
+    q_net = q_rnn_network.QRnnNetwork(
+        self._observation_spec, self._action_spec, lstm_size=(4,))
+    agent = agent_class(
+        self._time_step_spec,
+        self._action_spec,
+        q_network=q_net,
+        optimizer=None,
+        store_policy_state=True,
+        burn_in_steps=2)
+
+    batch_size, num_steps = 2, 4
+    observations = [tf.random_uniform((batch_size, num_steps, 2))]
+    step_types = tf.ones((batch_size, num_steps), dtype=tf.int32)
+    rewards = tf.ones((batch_size, num_steps), dtype=tf.float32)
+    discounts = tf.ones((batch_size, num_steps), dtype=tf.float32)
+    time_steps = ts.TimeStep(step_types, rewards, discounts, observations)
+    next_time_steps = ts.TimeStep(step_types, rewards, discounts, observations)
+    actions = [tf.zeros((batch_size, num_steps, 1), dtype=tf.int32)]
+    network_state = nest.map_structure(
+        lambda spec: tf.ones([batch_size] + spec.shape.as_list()),
+        q_net.state_spec)
+
+    loss_info = agent._loss(
+        time_steps, actions, next_time_steps,
+        network_state=network_state, next_network_state=network_state)
+    gradients = tf.gradients(loss_info.loss, q_net.trainable_weights)
+    self.assertTrue(all(g is not None for g in gradients))
+
+    self.evaluate(tf.global_variables_initializer())
+    self.assertEqual((), self.evaluate(loss_info.loss).shape)
+
   # TODO(kbanoop): Add a test where the target network has different values.
   def testLoss(self, agent_class):
     q_net = DummyNet(self._observation_spec, self._action_spec)
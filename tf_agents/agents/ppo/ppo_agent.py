@@ -100,6 +100,7 @@ class PPOAgent(tf_agent.Base):
                value_function_l2_reg=0.0,
                value_pred_loss_coef=0.5,
                num_epochs=25,
+               minibatch_size=None,
                use_gae=False,
                use_td_lambda_return=False,
                normalize_rewards=True,
@@ -138,6 +139,10 @@ class PPOAgent(tf_agent.Base):
       value_pred_loss_coef: Multiplier for value prediction loss to balance
         with policy gradient loss.
       num_epochs: Number of epochs for computing policy updates.
+      minibatch_size: Optional number of trajectories (rows of the experience
+        batch) per policy update. Each epoch shuffles the trajectories and
+        trains on ceil(batch_size / minibatch_size) minibatches. If None, each
+        epoch is a single update on the whole batch.
       use_gae: If True (default False), uses generalized advantage estimation
         for computing per-timestep advantage. Else, just subtracts value
         predictions from empirical return.
@@ -178,6 +183,7 @@ class PPOAgent(tf_agent.Base):
     self._use_gae = use_gae
     self._use_td_lambda_return = use_td_lambda_return
     self._num_epochs = num_epochs
+    self._minibatch_size = minibatch_size
     self._log_prob_clipping = log_prob_clipping
     self._gradient_clipping = gradient_clipping or 0.0
     self._kl_cutoff_factor = kl_cutoff_factor
@@ -576,34 +582,11 @@ class PPOAgent(tf_agent.Base):
     returns, normalized_advantages = self.compute_return_and_advantage(
         time_steps, actions, next_time_steps, value_preds)
 
-    # Loss tensors across batches will be aggregated for summaries.
-    policy_gradient_losses = []
-    value_estimation_losses = []
-    l2_regularization_losses = []
-    entropy_regularization_losses = []
-    kl_penalty_losses = []
-
-    # For each epoch, create its own train op that depends on the previous one.
-    last_train_op = tf.no_op()
-    for i_epoch in range(self._num_epochs):
-      with tf.name_scope('epoch_%d' % i_epoch):
-        with tf.control_dependencies([last_train_op]):
-          # Only save debug summaries for first and last epochs.
-          debug_summaries = (self._debug_summaries and
-                             (i_epoch == 0 or i_epoch == self._num_epochs-1))
-
-          # Build one epoch train op.
-          last_train_op, losses = self.build_train_op(
-              time_steps, actions, act_log_probs, returns,
-              normalized_advantages, action_distribution_parameters, valid_mask,
-              train_step_counter,
-              self._summarize_grads_and_vars, self._gradient_clipping,
-              debug_summaries)
-          policy_gradient_losses.append(losses[0])
-          value_estimation_losses.append(losses[1])
-          l2_regularization_losses.append(losses[2])
-          entropy_regularization_losses.append(losses[3])
-          kl_penalty_losses.append(losses[4])
+    # All epochs and minibatches run in a single loop so that the graph size
+    # does not depend on the number of updates.
+    last_train_op, losses = self._train_epochs(
+        time_steps, actions, act_log_probs, returns, normalized_advantages,
+        action_distribution_parameters, valid_mask, train_step_counter)
 
     # After update epochs, update adaptive kl beta, then update observation
     #   normalizer and reward normalizer.
@@ -634,15 +617,11 @@ class PPOAgent(tf_agent.Base):
       last_train_op = tf.identity(last_train_op)
 
     # Make summaries for total loss across all epochs.
-    # The self._*_losses lists will have been populated by
-    #   calls to self.build_train_op.
+    # The losses have been summed over epochs by self._train_epochs.
     with tf.name_scope('Losses/'):
-      total_policy_gradient_loss = tf.add_n(policy_gradient_losses)
-      total_value_estimation_loss = tf.add_n(value_estimation_losses)
-      total_l2_regularization_loss = tf.add_n(l2_regularization_losses)
-      total_entropy_regularization_loss = tf.add_n(
-          entropy_regularization_losses)
-      total_kl_penalty_loss = tf.add_n(kl_penalty_losses)
+      (total_policy_gradient_loss, total_value_estimation_loss,
+       total_l2_regularization_loss, total_entropy_regularization_loss,
+       total_kl_penalty_loss) = losses
       tf.contrib.summary.scalar('policy_gradient_loss',
                                 total_policy_gradient_loss)
       tf.contrib.summary.scalar('value_estimation_loss',
@@ -673,6 +652,78 @@ class PPOAgent(tf_agent.Base):
 
     return last_train_op
 
+  def _train_epochs(self, time_steps, actions, act_log_probs, returns,
+                    normalized_advantages, action_distribution_parameters,
+                    valid_mask, train_step_counter):
+    """Runs `num_epochs` epochs of minibatch updates in a `tf.while_loop`.
+
+    Args:
+      time_steps: Batch major TimeStep tuples with shape [B, T, ...].
+      actions: Batch major actions.
+      act_log_probs: Batch major action log probabilities under the collect
+        policy.
+      returns: Batch major per-timestep returns.
+      normalized_advantages: Batch major normalized per-timestep advantages.
+      action_distribution_parameters: Batch major parameters of the collect
+        action distribution.
+      valid_mask: Batch major mask for invalid timesteps.
+      train_step_counter: An optional variable to increment for each update.
+
+    Returns:
+      A tuple `(train_op, losses)` where `train_op` runs all the updates and
+      `losses` holds the policy_gradient, value_estimation, l2_regularization,
+      entropy_regularization and kl_penalty losses summed over epochs and
+      averaged over the minibatches of each epoch.
+    """
+    train_data = (time_steps, actions, act_log_probs, returns,
+                  normalized_advantages, action_distribution_parameters,
+                  valid_mask)
+    if self._minibatch_size is None:
+      num_minibatches = tf.constant(1)
+    else:
+      batch_size = nest_utils.get_outer_shape(
+          time_steps, self._time_step_spec)[0]
+      num_minibatches = (
+          (batch_size + self._minibatch_size - 1) // self._minibatch_size)
+      # A random permutation of the trajectories for each epoch.
+      _, permutations = tf.nn.top_k(
+          tf.random_uniform([self._num_epochs, batch_size]), k=batch_size)
+    num_iterations = self._num_epochs * num_minibatches
+
+    def _train_step(iteration, unused_total_loss, *loss_sums):
+      """Trains on the minibatch of `iteration`."""
+      minibatch_data = train_data
+      if self._minibatch_size is not None:
+        epoch = iteration // num_minibatches
+        start = (iteration % num_minibatches) * self._minibatch_size
+        indices = permutations[epoch, start:start + self._minibatch_size]
+        minibatch_data = nest.map_structure(
+            lambda t: tf.gather(t, indices), train_data)
+      train_op, losses = self.build_train_op(
+          *minibatch_data,
+          train_step=train_step_counter,
+          summarize_gradients=self._summarize_grads_and_vars,
+          gradient_clipping=self._gradient_clipping,
+          debug_summaries=self._debug_summaries)
+      with tf.control_dependencies([train_op]):
+        return [iteration + 1, tf.to_float(train_op)] + [
+            loss_sum + tf.to_float(loss)
+            for loss_sum, loss in zip(loss_sums, losses)]
+
+    loop_vars = tf.while_loop(
+        cond=lambda iteration, *_: iteration < num_iterations,
+        body=_train_step,
+        loop_vars=[tf.constant(0)] + [tf.constant(0.0)] * 6,
+        parallel_iterations=1,
+        back_prop=False,
+        name='train_epochs')
+    # Like the op returned by build_train_op, evaluates to the total loss of
+    # the last update.
+    train_op = loop_vars[1]
+    losses = [loss_sum / tf.to_float(num_minibatches)
+              for loss_sum in loop_vars[2:]]
+    return train_op, losses
+
   def l2_regularization_loss(self, debug_summaries=False):
     if self._policy_l2_reg > 0 or self._value_function_l2_reg > 0:
       with tf.name_scope('l2_regularization'):
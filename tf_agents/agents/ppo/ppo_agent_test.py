@@ -100,6 +100,30 @@ def _compute_returns_fn(rewards, discounts, next_state_return=0.0):
   return returns
 
 
+def _create_experience():
+  """Returns a batch of 2 trajectories of 3 steps."""
+  observations = tf.constant([
+      [[1, 2], [3, 4], [5, 6]],
+      [[1, 2], [3, 4], [5, 6]],
+  ], dtype=tf.float32)
+  time_steps = ts.TimeStep(
+      step_type=tf.constant([[1] * 3] * 2, dtype=tf.int32),
+      reward=tf.constant([[1] * 3] * 2, dtype=tf.float32),
+      discount=tf.constant([[1] * 3] * 2, dtype=tf.float32),
+      observation=observations)
+  actions = tf.constant([[[0], [1], [1]], [[0], [1], [1]]], dtype=tf.float32)
+  action_distribution_parameters = {
+      'loc': tf.constant([[0.0, 0.0], [0.0, 0.0]], dtype=tf.float32),
+      'scale': tf.constant([[1.0, 1.0], [1.0, 1.0]], dtype=tf.float32),
+  }
+  policy_info = action_distribution_parameters
+
+  experience = trajectory.Trajectory(
+      time_steps.step_type, observations, actions, policy_info,
+      time_steps.step_type, time_steps.reward, time_steps.discount)
+  return experience
+
+
 class PPOAgentTest(parameterized.TestCase, tf.test.TestCase):
 
   def setUp(self):
@@ -183,26 +207,7 @@ class PPOAgentTest(parameterized.TestCase, tf.test.TestCase):
         normalize_observations=False,
         num_epochs=num_epochs,
     )
-    observations = tf.constant([
-        [[1, 2], [3, 4], [5, 6]],
-        [[1, 2], [3, 4], [5, 6]],
-    ],
-                               dtype=tf.float32)
-    time_steps = ts.TimeStep(
-        step_type=tf.constant([[1] * 3] * 2, dtype=tf.int32),
-        reward=tf.constant([[1] * 3] * 2, dtype=tf.float32),
-        discount=tf.constant([[1] * 3] * 2, dtype=tf.float32),
-        observation=observations)
-    actions = tf.constant([[[0], [1], [1]], [[0], [1], [1]]], dtype=tf.float32)
-    action_distribution_parameters = {
-        'loc': tf.constant([[0.0, 0.0], [0.0, 0.0]], dtype=tf.float32),
-        'scale': tf.constant([[1.0, 1.0], [1.0, 1.0]], dtype=tf.float32),
-    }
-    policy_info = action_distribution_parameters
-
-    experience = trajectory.Trajectory(
-        time_steps.step_type, observations, actions, policy_info,
-        time_steps.step_type, time_steps.reward, time_steps.discount)
+    experience = _create_experience()
 
     # Mock the build_train_op to return an op for incrementing this counter.
     counter = tf.train.get_or_create_global_step()
@@ -225,6 +230,63 @@ class PPOAgentTest(parameterized.TestCase, tf.test.TestCase):
       counter_ = sess.run(counter)
       self.assertEqual(num_epochs, counter_)
 
+  @parameterized.named_parameters([
+      ('SingleTrajectoryMinibatches', 1, 6),
+      ('FullBatchMinibatches', 2, 3),
+      ('LargerThanBatchMinibatches', 3, 3),
+  ])
+  def testTrainWithMinibatches(self, minibatch_size, expected_num_updates):
+    agent = ppo_agent.PPOAgent(
+        self._time_step_spec,
+        self._action_spec,
+        tf.train.AdamOptimizer(),
+        actor_net=DummyActorNet(self._action_spec,),
+        value_net=DummyValueNet(outer_rank=2),
+        normalize_observations=False,
+        num_epochs=3,
+        minibatch_size=minibatch_size,
+    )
+    experience = _create_experience()
+
+    counter = tf.train.get_or_create_global_step()
+    minibatch_sizes = tf.Variable([], dtype=tf.int32, validate_shape=False)
+
+    def build_train_op(time_steps, *unused_args, **unused_kwargs):
+      record_size = tf.assign(
+          minibatch_sizes,
+          tf.concat([minibatch_sizes, tf.shape(time_steps.step_type)[:1]], 0),
+          validate_shape=False)
+      with tf.control_dependencies([record_size]):
+        return counter.assign_add(1), [tf.constant(0.0)] * 5
+
+    agent.build_train_op = build_train_op
+    train_op = agent.train(experience)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(train_op)
+      self.assertEqual(expected_num_updates, sess.run(counter))
+      self.assertAllEqual([min(minibatch_size, 2)] * expected_num_updates,
+                          sess.run(minibatch_sizes))
+
+  def testTrainGraphSizeIsIndependentOfNumEpochs(self):
+    num_ops = []
+    for num_epochs in [1, 10]:
+      with tf.Graph().as_default() as graph:
+        agent = ppo_agent.PPOAgent(
+            self._time_step_spec,
+            self._action_spec,
+            tf.train.AdamOptimizer(),
+            actor_net=DummyActorNet(self._action_spec,),
+            value_net=DummyValueNet(outer_rank=2),
+            normalize_observations=False,
+            num_epochs=num_epochs,
+            minibatch_size=1,
+        )
+        agent.train(_create_experience())
+        num_ops.append(len(graph.get_operations()))
+    self.assertEqual(num_ops[0], num_ops[1])
+
   def testBuildTrainOp(self):
     agent = ppo_agent.PPOAgent(
         self._time_step_spec,
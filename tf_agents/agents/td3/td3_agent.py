@@ -35,7 +35,9 @@ from tf_agents.agents import tf_agent
 from tf_agents.environments import trajectory
 from tf_agents.policies import actor_policy
 from tf_agents.policies import ou_noise_policy
+from tf_agents.policies import state_recording_policy
 from tf_agents.utils import nest_utils
+from tf_agents.utils import rnn_utils
 import tf_agents.utils.common as common_utils
 import gin.tf
 
@@ -64,6 +66,8 @@ class Td3Agent(tf_agent.BaseV2):
                target_policy_noise=0.2,
                target_policy_noise_clip=0.5,
                gradient_clipping=None,
+               store_policy_state=False,
+               burn_in_steps=0,
                debug_summaries=False,
                summarize_grads_and_vars=False):
     """Creates a Td3Agent Agent.
@@ -93,10 +97,29 @@ class Td3Agent(tf_agent.BaseV2):
       target_policy_noise: Scale factor on target action noise
       target_policy_noise_clip: Value to clip noise.
       gradient_clipping: Norm length to clip gradients.
+      store_policy_state: Whether the collect policy records its policy state
+        in the info of the collected trajectories (see
+        `StateRecordingPolicy`). The recurrent actor networks are then
+        unrolled over the training sequences starting from the state stored at
+        their first step, instead of from zeros.
+      burn_in_steps: Number of leading steps of each training sequence only
+        used to compute the states of the recurrent networks. No gradients
+        flow through these states, and the losses are computed on the
+        remaining steps.
       debug_summaries: A bool to gather debug summaries.
       summarize_grads_and_vars: If True, gradient and network variable summaries
         will be written during training.
+
+    Raises:
+      ValueError: If store_policy_state or burn_in_steps are set with a non
+        recurrent actor network, or burn_in_steps is set with a non recurrent
+        critic network.
     """
+    if (store_policy_state or burn_in_steps) and not actor_network.state_spec:
+      raise ValueError('store_policy_state and burn_in_steps require a '
+                       'recurrent actor network.')
+    if burn_in_steps and not critic_network.state_spec:
+      raise ValueError('burn_in_steps requires a recurrent critic network.')
     self._actor_network = actor_network
     self._target_actor_network = actor_network.copy(
         name='TargetActorNetwork')
@@ -125,6 +148,8 @@ class Td3Agent(tf_agent.BaseV2):
     self._target_policy_noise = target_policy_noise
     self._target_policy_noise_clip = target_policy_noise_clip
     self._gradient_clipping = gradient_clipping
+    self._store_policy_state = store_policy_state
+    self._burn_in_steps = burn_in_steps
 
     policy = actor_policy.ActorPolicy(
         time_step_spec=time_step_spec, action_spec=action_spec,
@@ -137,6 +162,9 @@ class Td3Agent(tf_agent.BaseV2):
         ou_stddev=self._ou_stddev,
         ou_damping=self._ou_damping,
         clip=True)
+    if store_policy_state:
+      collect_policy = state_recording_policy.StateRecordingPolicy(
+          collect_policy)
 
     super(Td3Agent, self).__init__(
         time_step_spec,
@@ -199,18 +227,29 @@ class Td3Agent(tf_agent.BaseV2):
     actions = policy_steps.action
     return time_steps, actions, next_time_steps
 
+  def _experience_to_network_states(self, experience):
+    """Returns the stored actor network states before the first two steps."""
+    if not self._store_policy_state:
+      return None, None
+    policy_state = experience.policy_info.policy_state
+    return (nest.map_structure(lambda t: t[:, 0], policy_state),
+            nest.map_structure(lambda t: t[:, 1], policy_state))
+
   def _train(self, experience, train_step_counter=None):
     # TODO(b/120034503): Move the conversion to transitions to the base class.
     time_steps, actions, next_time_steps = self._experience_to_transitions(
         experience)
+    actor_network_state, next_actor_network_state = (
+        self._experience_to_network_states(experience))
 
     # TODO(kbanoop): Apply a loss mask or filter boundary transitions.
     critic_loss = self.critic_loss(
         time_steps,
         actions,
-        next_time_steps)
+        next_time_steps,
+        next_actor_network_state)
 
-    actor_loss = self.actor_loss(time_steps)
+    actor_loss = self.actor_loss(time_steps, actor_network_state)
 
     def clip_and_summarize_gradients(grads_and_vars):
       """Clips gradients, and summarizes gradients and variables."""
@@ -258,19 +297,24 @@ class Td3Agent(tf_agent.BaseV2):
     # TODO(kbanoop): Compute per element TD loss and return in loss_info.
     return tf_agent.LossInfo(total_loss, ())
 
-  def critic_loss(self, time_steps, actions, next_time_steps):
+  def critic_loss(self, time_steps, actions, next_time_steps,
+                  next_actor_network_state=None):
     """Computes the critic loss for TD3 training.
 
     Args:
       time_steps: A batch of timesteps.
       actions: A batch of actions.
       next_time_steps: A batch of next timesteps.
+      next_actor_network_state: (optional) State of the recurrent actor network
+        before the first of next_time_steps. Defaults to zeros.
     Returns:
       critic_loss: A scalar critic loss.
     """
     with tf.name_scope('critic_loss'):
-      target_actions, _ = self._target_actor_network(
-          next_time_steps.observation, next_time_steps.step_type)
+      target_actions, _ = rnn_utils.unroll_with_burn_in(
+          self._target_actor_network,
+          (next_time_steps.observation, next_time_steps.step_type),
+          next_actor_network_state, self._burn_in_steps)
 
       # Add gaussian noise to each action before computing target q values
       def add_noise_to_action(action):  # pylint: disable=missing-docstring
@@ -286,22 +330,25 @@ class Td3Agent(tf_agent.BaseV2):
                                                 target_actions)
 
       # Target q-values are the min of the two networks
-      target_q_values_1, _ = self._target_critic_network_1(
-          next_time_steps.observation, noisy_target_actions,
-          next_time_steps.step_type)
-      target_q_values_2, _ = self._target_critic_network_2(
-          next_time_steps.observation, noisy_target_actions,
-          next_time_steps.step_type)
+      target_inputs = (next_time_steps.observation, noisy_target_actions,
+                       next_time_steps.step_type)
+      target_q_values_1, _ = rnn_utils.unroll_with_burn_in(
+          self._target_critic_network_1, target_inputs,
+          burn_in_steps=self._burn_in_steps)
+      target_q_values_2, _ = rnn_utils.unroll_with_burn_in(
+          self._target_critic_network_2, target_inputs,
+          burn_in_steps=self._burn_in_steps)
       target_q_values = tf.minimum(target_q_values_1, target_q_values_2)
 
       td_targets = tf.stop_gradient(
           self._reward_scale_factor * next_time_steps.reward +
           self._gamma * next_time_steps.discount * target_q_values)
 
-      pred_td_targets_1, _ = self._critic_network_1(
-          time_steps.observation, actions, time_steps.step_type)
-      pred_td_targets_2, _ = self._critic_network_2(
-          time_steps.observation, actions, time_steps.step_type)
+      inputs = (time_steps.observation, actions, time_steps.step_type)
+      pred_td_targets_1, _ = rnn_utils.unroll_with_burn_in(
+          self._critic_network_1, inputs, burn_in_steps=self._burn_in_steps)
+      pred_td_targets_2, _ = rnn_utils.unroll_with_burn_in(
+          self._critic_network_2, inputs, burn_in_steps=self._burn_in_steps)
       pred_td_targets_all = [pred_td_targets_1, pred_td_targets_2]
 
       if self._debug_summaries:
@@ -330,6 +377,9 @@ class Td3Agent(tf_agent.BaseV2):
 
       critic_loss = (self._td_errors_loss_fn(td_targets, pred_td_targets_1)
                      + self._td_errors_loss_fn(td_targets, pred_td_targets_2))
+      if self._burn_in_steps:
+        # The loss is only computed on the steps following the burn-in.
+        critic_loss = critic_loss[:, self._burn_in_steps:]
       if nest_utils.is_batched_nested_tensors(
           time_steps, self.time_step_spec(), num_outer_dims=2):
         # Sum over the time dimension.
@@ -337,20 +387,25 @@ class Td3Agent(tf_agent.BaseV2):
 
       return tf.reduce_mean(critic_loss)
 
-  def actor_loss(self, time_steps):
+  def actor_loss(self, time_steps, actor_network_state=None):
     """Computes the actor_loss for TD3 training.
 
     Args:
       time_steps: A batch of timesteps.
+      actor_network_state: (optional) State of the recurrent actor network
+        before the first of time_steps. Defaults to zeros.
 
     Returns:
       actor_loss: A scalar actor loss.
     """
     with tf.name_scope('actor_loss'):
-      actions, _ = self._actor_network(time_steps.observation,
-                                       time_steps.step_type)
-      q_values, _ = self._critic_network_1(time_steps.observation, actions,
-                                           time_steps.step_type)
+      actions, _ = rnn_utils.unroll_with_burn_in(
+          self._actor_network, (time_steps.observation, time_steps.step_type),
+          actor_network_state, self._burn_in_steps)
+      q_values, _ = rnn_utils.unroll_with_burn_in(
+          self._critic_network_1,
+          (time_steps.observation, actions, time_steps.step_type),
+          burn_in_steps=self._burn_in_steps)
 
       actions = nest.flatten(actions)
       dqda = tf.gradients([q_values], actions)
@@ -362,6 +417,8 @@ class Td3Agent(tf_agent.BaseV2):
                                   self._dqda_clipping)
         loss = common_utils.element_wise_squared_loss(
             tf.stop_gradient(dqda + action), action)
+        if self._burn_in_steps:
+          loss = loss[:, self._burn_in_steps:]
         if nest_utils.is_batched_nested_tensors(
             time_steps, self.time_step_spec(), num_outer_dims=2):
           # Sum over the time dimension.
@@ -19,7 +19,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
 import tensorflow as tf
+from tf_agents.agents.ddpg import actor_rnn_network
+from tf_agents.agents.ddpg import critic_rnn_network
 from tf_agents.agents.td3 import td3_agent
 from tf_agents.environments import time_step as ts
 from tf_agents.networks import network
@@ -206,5 +209,99 @@ class TD3AgentTest(tf.test.TestCase):
     self.assertNotEqual(py_action, py_collect_policy_action)
 
 
+  def _create_rnn_networks(self):
+    actor_net = actor_rnn_network.ActorRnnNetwork(
+        self._obs_spec,
+        self._action_spec,
+        input_fc_layer_params=(4,),
+        lstm_size=(3,),
+        output_fc_layer_params=(4,),
+        activation_fn=tf.keras.activations.tanh)
+    critic_net = critic_rnn_network.CriticRnnNetwork(
+        self._obs_spec,
+        self._action_spec,
+        observation_fc_layer_params=(4,),
+        action_fc_layer_params=(4,),
+        joint_fc_layer_params=(4,),
+        lstm_size=(3,),
+        output_fc_layer_params=(4,),
+        activation_fn=tf.keras.activations.tanh)
+    return actor_net, critic_net
+
+  def _create_rnn_agent(self, **kwargs):
+    actor_net, critic_net = self._create_rnn_networks()
+    agent = td3_agent.Td3Agent(
+        self._time_step_spec,
+        self._action_spec,
+        actor_network=actor_net,
+        critic_network=critic_net,
+        actor_optimizer=None,
+        critic_optimizer=None,
+        # Without target noise, the critic loss is deterministic.
+        target_policy_noise=0.,
+        **kwargs)
+    return agent, actor_net
+
+  def _sequence_time_steps(self, observation, batch_size=2, num_steps=4):
+    step_types = tf.ones((batch_size, num_steps), dtype=tf.int32)
+    rewards = tf.ones((batch_size, num_steps), dtype=tf.float32)
+    discounts = tf.ones((batch_size, num_steps), dtype=tf.float32)
+    return ts.TimeStep(step_types, rewards, discounts, [observation])
+
+  def testCreateAgentBurnInRequiresRecurrentCritic(self):
+    actor_net, _ = self._create_rnn_networks()
+    with self.assertRaisesRegexp(ValueError, '.*recurrent critic.*'):
+      td3_agent.Td3Agent(
+          self._time_step_spec,
+          self._action_spec,
+          actor_network=actor_net,
+          critic_network=self._critic_net,
+          actor_optimizer=None,
+          critic_optimizer=None,
+          burn_in_steps=1)
+
+  def testLossesStartFromStoredActorState(self):
+    agent, actor_net = self._create_rnn_agent(store_policy_state=True)
+    time_steps = self._sequence_time_steps(tf.random_uniform([2, 4, 2]))
+    next_time_steps = self._sequence_time_steps(tf.random_uniform([2, 4, 2]))
+    actions = [tf.random_uniform([2, 4, 1], -1, 1)]
+
+    def fill_state(value):
+      return nest.map_structure(
+          lambda spec: tf.fill([2] + spec.shape.as_list(), value),
+          actor_net.state_spec)
+
+    zero_state, ones_state = fill_state(0.), fill_state(1.)
+
+    actor_loss = agent.actor_loss(time_steps, ones_state)
+    gradients = tf.gradients(actor_loss, nest.flatten(ones_state))
+    self.assertTrue(all(g is not None for g in gradients))
+    critic_losses = [
+        agent.critic_loss(time_steps, actions, next_time_steps, state)
+        for state in (zero_state, ones_state)]
+
+    self.evaluate(tf.global_variables_initializer())
+    zero_state_loss, ones_state_loss = self.evaluate(critic_losses)
+    self.assertNotEqual(zero_state_loss, ones_state_loss)
+
+  def testBurnInStepsExcludedFromLosses(self):
+    agent, _ = self._create_rnn_agent(store_policy_state=True, burn_in_steps=2)
+    observation = tf.random_uniform([2, 4, 2])
+    time_steps = self._sequence_time_steps(observation)
+    next_time_steps = self._sequence_time_steps(tf.random_uniform([2, 4, 2]))
+    actions = [tf.random_uniform([2, 4, 1], -1, 1)]
+
+    actor_loss = agent.actor_loss(time_steps)
+    critic_loss = agent.critic_loss(time_steps, actions, next_time_steps)
+    gradients = [tf.gradients(loss, observation)[0]
+                 for loss in (actor_loss, critic_loss)]
+
+    self.evaluate(tf.global_variables_initializer())
+    for gradient in self.evaluate(gradients):
+      # Only the steps after the burn-in contribute to the losses.
+      self.assertAllEqual(np.zeros([2, 2, 2]), gradient[:, :2])
+      self.assertTrue(np.any(gradient[:, 2:]))
+
+
 if __name__ == '__main__':
   tf.test.main()
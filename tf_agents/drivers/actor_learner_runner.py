@@ -0,0 +1,235 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs Python collection and training concurrently.
+
+`ActorLearnerRunner` steps one `PyDriver` per actor thread while the calling
+thread runs the train steps, so the learner does not wait for the environments
+and vice versa:
+
+```python
+replay_buffer = py_uniform_replay_buffer.PyUniformReplayBuffer(...)
+dataset = replay_buffer.as_dataset(sample_batch_size=32, num_steps=2)
+experience = dataset.prefetch(4).make_one_shot_iterator().get_next()
+train_op = tf_agent.train(experience)
+# Actors act with a copy of the policy, refreshed every 100 train steps.
+update_actor_policy_op = common.soft_variables_update(
+    tf_agent.policy().variables(), actor_policy.variables())
+
+with tf.Session() as sess:
+  ...
+  py_policies = [py_tf_policy.PyTFPolicy(actor_policy, batch_size=1)
+                 for _ in envs]
+  for py_policy in py_policies:
+    # The default session is not shared with the actor threads.
+    py_policy.session = sess
+  runner = actor_learner_runner.ActorLearnerRunner(
+      envs, py_policies, observers=[replay_buffer.add_batch],
+      train_step_fn=sess.make_callable(train_op),
+      train_steps_per_env_step=0.25,
+      min_env_steps=1000,
+      policy_update_fn=sess.make_callable(update_actor_policy_op),
+      policy_update_period=100)
+  runner.run(num_train_steps=100000)
+```
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import traceback
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.drivers import py_driver
+
+
+class ActorLearnerRunner(object):
+  """Collects with actor threads while training in the calling thread.
+
+  The ratio of train steps to environment steps is bounded by
+  `train_steps_per_env_step`: the learner waits for enough new environment
+  steps before each train step. Optionally, the actors wait when they are more
+  than `max_env_steps_ahead` environment steps ahead of that ratio, so that
+  the data stays close to the current policy. This limit is counted from the
+  steps needed for the next train step, so the actors can always collect
+  them.
+  """
+
+  def __init__(self,
+               envs,
+               policies,
+               observers,
+               train_step_fn,
+               train_steps_per_env_step=1.0,
+               min_env_steps=0,
+               max_env_steps_ahead=None,
+               steps_per_run=1,
+               policy_update_fn=None,
+               policy_update_period=1):
+    """Creates an ActorLearnerRunner.
+
+    Args:
+      envs: A list of py_environment.Base, one per actor thread.
+      policies: A list of py_policy.Base, one per actor thread, e.g.
+        `PyTFPolicy`s sharing the session of the learner.
+      observers: A list of observers called by every actor with each
+        trajectory, e.g. `replay_buffer.add_batch`. They must be thread safe.
+      train_step_fn: Callable running one train step, e.g. the callable of a
+        train op consuming a prefetched dataset of the replay buffer.
+      train_steps_per_env_step: Maximum number of train steps per environment
+        step collected by all actors together.
+      min_env_steps: Number of environment steps to collect before the first
+        train step.
+      max_env_steps_ahead: Optional number of environment steps the actors can
+        collect beyond the steps needed for the next train step.
+      steps_per_run: Number of environment steps (summed over the batch) of
+        each `PyDriver.run` call of the actors.
+      policy_update_fn: Optional callable refreshing the weights of the actor
+        policies, e.g. the callable of an op copying the trained variables.
+      policy_update_period: Number of train steps between calls of
+        policy_update_fn.
+
+    Raises:
+      ValueError: If envs and policies do not have the same length, or if
+        train_steps_per_env_step is not positive.
+    """
+    if len(envs) != len(policies):
+      raise ValueError('Expected one policy per env, got {} envs and {} '
+                       'policies.'.format(len(envs), len(policies)))
+    if train_steps_per_env_step <= 0:
+      raise ValueError('train_steps_per_env_step must be positive, got '
+                       '{}.'.format(train_steps_per_env_step))
+    self._envs = envs
+    self._policies = policies
+    self._drivers = [
+        py_driver.PyDriver(env, policy,
+                           observers=list(observers) + [self._count_env_steps],
+                           max_steps=steps_per_run)
+        for env, policy in zip(envs, policies)
+    ]
+    self._train_step_fn = train_step_fn
+    self._train_steps_per_env_step = train_steps_per_env_step
+    self._min_env_steps = min_env_steps
+    self._max_env_steps_ahead = max_env_steps_ahead
+    self._policy_update_fn = policy_update_fn
+    self._policy_update_period = policy_update_period
+
+    self._condition = threading.Condition()
+    self._env_steps = 0
+    self._train_steps = 0
+    self._stopped = False
+    self._actor_errors = []
+    # Last time_step and policy_state of each actor, kept across run() calls.
+    self._actor_states = [None] * len(envs)
+
+  @property
+  def env_steps(self):
+    """Number of environment steps collected by all the actors."""
+    return self._env_steps
+
+  @property
+  def train_steps(self):
+    """Number of train steps run."""
+    return self._train_steps
+
+  def _count_env_steps(self, traj):
+    with self._condition:
+      self._env_steps += np.sum(~traj.is_boundary())
+      self._condition.notify_all()
+
+  def _env_steps_needed(self, train_steps):
+    """Environment steps needed before running train_steps train steps."""
+    return max(self._min_env_steps,
+               int(np.ceil(train_steps / self._train_steps_per_env_step)))
+
+  def _can_train(self):
+    return (self._stopped or
+            self._env_steps >= self._env_steps_needed(self._train_steps + 1))
+
+  def _can_act(self):
+    return (self._stopped or self._max_env_steps_ahead is None or
+            self._env_steps < (self._env_steps_needed(self._train_steps + 1) +
+                               self._max_env_steps_ahead))
+
+  def _run_actor(self, index):
+    """Runs the driver of an actor until the runner stops."""
+    env = self._envs[index]
+    try:
+      if self._actor_states[index] is None:
+        self._actor_states[index] = (
+            env.reset(), self._policies[index].get_initial_state(
+                env.batch_size))
+      while True:
+        with self._condition:
+          while not self._can_act():
+            self._condition.wait()
+          if self._stopped:
+            return
+        self._actor_states[index] = self._drivers[index].run(
+            *self._actor_states[index])
+    except Exception as e:  # pylint: disable=broad-except
+      tf.logging.error('Actor %d failed:\n%s', index, traceback.format_exc())
+      with self._condition:
+        self._actor_errors.append(e)
+        self._stopped = True
+        self._condition.notify_all()
+
+  def run(self, num_train_steps):
+    """Collects and trains until num_train_steps train steps are run.
+
+    Args:
+      num_train_steps: Number of train steps to run.
+
+    Raises:
+      RuntimeError: If an actor raised an exception.
+    """
+    self._stopped = False
+    self._actor_errors = []
+    threads = [
+        threading.Thread(target=self._run_actor, args=(i,),
+                         name='actor_{}'.format(i))
+        for i in range(len(self._drivers))
+    ]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+
+    try:
+      for _ in range(num_train_steps):
+        with self._condition:
+          while not self._can_train():
+            self._condition.wait()
+          if self._stopped:
+            break
+        self._train_step_fn()
+        with self._condition:
+          self._train_steps += 1
+          self._condition.notify_all()
+        if (self._policy_update_fn is not None and
+            self._train_steps % self._policy_update_period == 0):
+          self._policy_update_fn()
+    finally:
+      with self._condition:
+        self._stopped = True
+        self._condition.notify_all()
+      for thread in threads:
+        thread.join()
+
+    if self._actor_errors:
+      raise RuntimeError('An actor failed: {!r}'.format(self._actor_errors[0]))
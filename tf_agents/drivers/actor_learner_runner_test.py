@@ -0,0 +1,141 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.drivers.actor_learner_runner."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+import threading
+
+import tensorflow as tf
+
+from tf_agents.drivers import actor_learner_runner
+from tf_agents.drivers import test_utils as driver_test_utils
+
+
+class FailingPyPolicy(driver_test_utils.PyPolicyMock):
+
+  def _action(self, time_step, policy_state):
+    raise ValueError('Policy failed.')
+
+
+class ActorLearnerRunnerTest(tf.test.TestCase):
+
+  def _create_actors(self, num_actors, policy_cls=None):
+    policy_cls = policy_cls or driver_test_utils.PyPolicyMock
+    envs = [driver_test_utils.PyEnvironmentMock() for _ in range(num_actors)]
+    policies = [policy_cls(env.time_step_spec(), env.action_spec())
+                for env in envs]
+    return envs, policies
+
+  def testTrainStepsPerEnvStep(self):
+    envs, policies = self._create_actors(num_actors=2)
+    trajectories = []
+    env_steps_at_train_step = []
+    policy_updates = []
+
+    def train_step():
+      env_steps_at_train_step.append(runner.env_steps)
+
+    runner = actor_learner_runner.ActorLearnerRunner(
+        envs, policies, observers=[trajectories.append],
+        train_step_fn=train_step,
+        train_steps_per_env_step=0.5,
+        min_env_steps=5,
+        policy_update_fn=lambda: policy_updates.append(runner.train_steps),
+        policy_update_period=3)
+    runner.run(num_train_steps=10)
+
+    self.assertEqual(10, runner.train_steps)
+    self.assertEqual([3, 6, 9], policy_updates)
+    for train_steps, env_steps in enumerate(env_steps_at_train_step):
+      self.assertGreaterEqual(env_steps, 5)
+      self.assertGreaterEqual(env_steps, math.ceil((train_steps + 1) / 0.5))
+    self.assertGreaterEqual(runner.env_steps, 20)
+    self.assertNotEmpty(trajectories)
+
+    # Runs continue from the last time_steps of the actors.
+    runner.run(num_train_steps=5)
+    self.assertEqual(15, runner.train_steps)
+    self.assertGreaterEqual(runner.env_steps, 30)
+
+  def testMaxEnvStepsAhead(self):
+    envs, policies = self._create_actors(num_actors=2)
+    runner = actor_learner_runner.ActorLearnerRunner(
+        envs, policies, observers=[], train_step_fn=lambda: None,
+        max_env_steps_ahead=4)
+    runner.run(num_train_steps=5)
+    # The actors stop 4 steps past the steps needed for the next train step,
+    # and each actor can finish one run after the limit is reached.
+    self.assertLessEqual(runner.env_steps, 6 + 4 + 2)
+
+  def _run_with_timeout(self, runner, num_train_steps, timeout=30):
+    errors = []
+
+    def run():
+      try:
+        runner.run(num_train_steps)
+      except Exception as e:  # pylint: disable=broad-except
+        errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    self.assertFalse(thread.is_alive(), 'The runner is deadlocked.')
+    if errors:
+      raise errors[0]
+
+  def testMaxEnvStepsAheadBelowStepsPerTrainStep(self):
+    # Each train step needs 4 env steps, more than max_env_steps_ahead.
+    envs, policies = self._create_actors(num_actors=2)
+    runner = actor_learner_runner.ActorLearnerRunner(
+        envs, policies, observers=[], train_step_fn=lambda: None,
+        train_steps_per_env_step=0.25,
+        min_env_steps=6,
+        max_env_steps_ahead=2)
+    self._run_with_timeout(runner, num_train_steps=5)
+    self.assertEqual(5, runner.train_steps)
+    self.assertGreaterEqual(runner.env_steps, 20)
+    self.assertLessEqual(runner.env_steps, 24 + 2 + 2)
+
+  def testZeroMaxEnvStepsAhead(self):
+    envs, policies = self._create_actors(num_actors=1)
+    runner = actor_learner_runner.ActorLearnerRunner(
+        envs, policies, observers=[], train_step_fn=lambda: None,
+        max_env_steps_ahead=0)
+    self._run_with_timeout(runner, num_train_steps=5)
+    self.assertEqual(5, runner.train_steps)
+
+  def testActorErrorRaises(self):
+    envs, policies = self._create_actors(
+        num_actors=1, policy_cls=FailingPyPolicy)
+    runner = actor_learner_runner.ActorLearnerRunner(
+        envs, policies, observers=[], train_step_fn=lambda: None)
+    with self.assertRaisesRegexp(RuntimeError, 'Policy failed'):
+      self._run_with_timeout(runner, num_train_steps=5)
+
+  def testRaisesIfNotOnePolicyPerEnv(self):
+    envs, policies = self._create_actors(num_actors=2)
+    with self.assertRaises(ValueError):
+      actor_learner_runner.ActorLearnerRunner(
+          envs, policies[:1], observers=[], train_step_fn=lambda: None)
+
+
+if __name__ == '__main__':
+  tf.test.main()
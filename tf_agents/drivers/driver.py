@@ -46,12 +46,20 @@ class Driver(object):
     Raises:
       ValueError:
         If env is not a tf_environment.Base or policy is not an instance of
-        tf_policy.Base.
+        tf_policy.Base, or if env returns batches from a varying subset of
+        environments (e.g. a TFPyEnvironment wrapping an
+        AsyncParallelPyEnvironment), which only PyDriver supports.
     """
 
     if not isinstance(env, tf_environment.Base):
       raise ValueError('`env` must be an instance of tf_environment.Base.')
 
+    # In-graph drivers pair the rows of consecutive batches by position, which
+    # mixes up environments when each batch comes from different ones.
+    if getattr(env, 'provides_env_ids', False):
+      raise ValueError('`env` returns batches from a varying subset of '
+                       'environments, use a PyDriver instead.')
+
     if not isinstance(policy, tf_policy.Base):
       raise ValueError('`policy` must be an instance of tf_policy.Base.')
 
@@ -59,7 +59,8 @@ class DynamicEpisodeDriver(driver.Driver):
     Raises:
       ValueError:
         If env is not a tf_environment.Base or policy is not an instance of
-        tf_policy.Base.
+        tf_policy.Base, or if env returns batches from a varying subset of
+        environments.
     """
     super(DynamicEpisodeDriver, self).__init__(env, policy, observers)
     self._num_episodes = num_episodes
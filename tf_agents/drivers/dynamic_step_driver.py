@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import tensorflow as tf
 from tf_agents.drivers import driver
+from tf_agents.environments import tf_py_environment
 from tf_agents.environments import trajectory
 from tf_agents.utils import nest_utils
 import gin.tf
@@ -45,6 +46,14 @@ class DynamicStepDriver(driver.Driver):
 
   This termination condition can be overridden in subclasses by implementing the
   self._loop_condition_fn() method.
+
+  With `pipelined=True` the environment must be a `PipelinedTFPyEnvironment`.
+  Each iteration then computes the actions of the first half of the batch
+  while stepping the second half, and steps the first half while computing
+  the next actions of the second half. The resulting ops have no dependencies
+  between them, so the session runs policy inference and environment stepping
+  concurrently (given inter-op parallelism). Observers still receive full batch
+  trajectories, with the first half of the batch first.
   """
 
   def __init__(self,
@@ -52,6 +61,7 @@ class DynamicStepDriver(driver.Driver):
                policy,
                observers=None,
                num_steps=1,
+               pipelined=False,
               ):
     """Creates a DynamicStepDriver.
 
@@ -61,14 +71,24 @@ class DynamicStepDriver(driver.Driver):
       observers: A list of observers that are updated after every step in
         the environment. Each observer is a callable(time_step.Trajectory).
       num_steps: The number of steps to take in the environment.
+      pipelined: Whether to overlap policy inference on one half of the batch
+        with stepping the other half. Requires `env` to be a
+        `tf_py_environment.PipelinedTFPyEnvironment`.
 
     Raises:
       ValueError:
         If env is not a tf_environment.Base or policy is not an instance of
-        tf_policy.Base.
+        tf_policy.Base, if env returns batches from a varying subset of
+        environments, or if pipelined is set and env is not a
+        PipelinedTFPyEnvironment.
     """
     super(DynamicStepDriver, self).__init__(env, policy, observers)
+    if pipelined and not isinstance(
+        env, tf_py_environment.PipelinedTFPyEnvironment):
+      raise ValueError('`env` must be an instance of PipelinedTFPyEnvironment '
+                       'when pipelined is set.')
     self._num_steps = num_steps
+    self._pipelined = pipelined
 
   def _loop_condition_fn(self):
     """Returns a function with the condition needed for tf.while_loop."""
@@ -115,6 +135,54 @@ class DynamicStepDriver(driver.Driver):
 
     return loop_body
 
+  def _pipelined_loop_body_fn(self):
+    """Returns a function with the pipelined driver's loop body ops."""
+    first_env, second_env = self._env.halves
+
+    def loop_body(counter, first_time_step, first_policy_state,
+                  second_time_step, second_policy_state, second_action_step):
+      """Runs a step in both halves of the environment.
+
+      Args:
+        counter: Step counters per batch index. Shape [batch_size].
+        first_time_step: TimeStep of the first half of the batch.
+        first_policy_state: Policy state of the first half of the batch.
+        second_time_step: TimeStep of the second half of the batch.
+        second_policy_state: Policy state of the second half of the batch, used
+          to compute second_action_step.
+        second_action_step: PolicyStep computed for second_time_step.
+      Returns:
+        loop_vars for next iteration of tf.while_loop.
+      """
+      # These two ops are independent and run concurrently.
+      first_action_step = self._policy.action(first_time_step,
+                                              first_policy_state)
+      next_second_time_step = second_env.step(second_action_step.action)
+      # And so are these two.
+      next_first_time_step = first_env.step(first_action_step.action)
+      next_second_action_step = self._policy.action(next_second_time_step,
+                                                    second_action_step.state)
+
+      traj = self._env.concat(
+          trajectory.from_transition(first_time_step, first_action_step,
+                                     next_first_time_step),
+          trajectory.from_transition(second_time_step, second_action_step,
+                                     next_second_time_step))
+      observer_ops = [observer(traj) for observer in self._observers]
+      with tf.control_dependencies([tf.group(observer_ops)]):
+        loop_vars = nest.map_structure(
+            tf.identity,
+            (next_first_time_step, first_action_step.state,
+             next_second_time_step, second_action_step.state,
+             next_second_action_step))
+
+      # While loop counter should not be incremented for episode reset steps.
+      counter += tf.to_int32(~traj.is_boundary())
+
+      return [counter] + list(loop_vars)
+
+    return loop_body
+
   # TODO(b/113529538): Add tests for policy_state.
   def run(self,
           time_step=None,
@@ -144,6 +212,10 @@ class DynamicStepDriver(driver.Driver):
         time_step, self._env.time_step_spec())
     counter = tf.zeros(batch_dims, tf.int32)
 
+    if self._pipelined:
+      return self._run_pipelined(counter, time_step, policy_state,
+                                 maximum_iterations)
+
     [_, time_step, policy_state] = tf.while_loop(
         cond=self._loop_condition_fn(),
         body=self._loop_body_fn(),
@@ -157,3 +229,34 @@ class DynamicStepDriver(driver.Driver):
         name='driver_loop'
     )
     return time_step, policy_state
+
+  def _run_pipelined(self, counter, time_step, policy_state,
+                     maximum_iterations):
+    """Runs the pipelined while loop, see `run`."""
+    first_time_step, second_time_step = self._env.split(time_step)
+    first_policy_state, second_policy_state = self._env.split(policy_state)
+    # The actions of the second half are always computed one phase ahead.
+    second_action_step = self._policy.action(second_time_step,
+                                             second_policy_state)
+
+    [_, first_time_step, first_policy_state, second_time_step,
+     second_policy_state, _] = tf.while_loop(
+         cond=self._loop_condition_fn(),
+         body=self._pipelined_loop_body_fn(),
+         loop_vars=[
+             counter,
+             first_time_step,
+             first_policy_state,
+             second_time_step,
+             second_policy_state,
+             second_action_step],
+         back_prop=False,
+         parallel_iterations=1,
+         maximum_iterations=maximum_iterations,
+         name='pipelined_driver_loop'
+     )
+    # The last actions computed for the second half are dropped, its returned
+    # policy state is the one they were computed from.
+    time_step = self._env.concat(first_time_step, second_time_step)
+    policy_state = self._env.concat(first_policy_state, second_policy_state)
+    return time_step, policy_state
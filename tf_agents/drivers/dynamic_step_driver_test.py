@@ -19,10 +19,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
 import tensorflow as tf
 
 from tf_agents.drivers import dynamic_step_driver
 from tf_agents.drivers import test_utils as driver_test_utils
+from tf_agents.environments import batched_py_environment
 from tf_agents.environments import tf_py_environment
 from tf_agents.environments import trajectory
 from tf_agents.policies import policy_step
@@ -62,7 +64,7 @@ def make_replay_buffer(tf_env):
   trajectory_spec = trajectory.from_transition(time_step_spec, action_step_spec,
                                                time_step_spec)
   return tf_uniform_replay_buffer.TFUniformReplayBuffer(
-      trajectory_spec, batch_size=1)
+      trajectory_spec, batch_size=tf_env.batch_size)
 
 
 class DynamicStepDriverTest(tf.test.TestCase):
@@ -190,6 +192,57 @@ class DynamicStepDriverTest(tf.test.TestCase):
     self.assertAllEqual(trajectories.reward, [[1., 1., 0., 1., 1., 0., 1., 1.]])
     self.assertAllEqual(trajectories.discount, [[1., 0., 1, 1, 0, 1., 1., 0.]])
 
+  def testPipelinedReplayBufferObservers(self):
+    env = tf_py_environment.PipelinedTFPyEnvironment(
+        [driver_test_utils.PyEnvironmentMock(),
+         driver_test_utils.PyEnvironmentMock()])
+    policy = driver_test_utils.TFPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    policy_state = policy.get_initial_state(2)
+    replay_buffer = make_replay_buffer(env)
+
+    driver = dynamic_step_driver.DynamicStepDriver(
+        env, policy, num_steps=12, observers=[replay_buffer.add_batch],
+        pipelined=True)
+
+    run_driver = driver.run(policy_state=policy_state)
+    rb_gather_all = replay_buffer.gather_all()
+
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(run_driver)
+    trajectories = self.evaluate(rb_gather_all)
+
+    self.assertAllEqual(trajectories.step_type, [[0, 1, 2, 0, 1, 2, 0, 1]] * 2)
+    self.assertAllEqual(trajectories.observation,
+                        [[0, 1, 3, 0, 1, 3, 0, 1]] * 2)
+    self.assertAllEqual(trajectories.action, [[1, 2, 1, 1, 2, 1, 1, 2]] * 2)
+    self.assertAllEqual(trajectories.policy_info,
+                        [[2, 4, 2, 2, 4, 2, 2, 4]] * 2)
+    self.assertAllEqual(trajectories.next_step_type,
+                        [[1, 2, 0, 1, 2, 0, 1, 2]] * 2)
+
+  def testPipelinedRaisesIfNotPipelinedEnvironment(self):
+    env = tf_py_environment.TFPyEnvironment(
+        driver_test_utils.PyEnvironmentMock())
+    policy = driver_test_utils.TFPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    with self.assertRaisesRegexp(ValueError, 'PipelinedTFPyEnvironment'):
+      dynamic_step_driver.DynamicStepDriver(env, policy, pipelined=True)
+
+  def testRaisesIfEnvProvidesEnvIds(self):
+
+    class EnvIdsPyEnvironment(batched_py_environment.BatchedPyEnvironment):
+
+      def current_env_ids(self):
+        return np.arange(self.batch_size)
+
+    env = tf_py_environment.TFPyEnvironment(
+        EnvIdsPyEnvironment([driver_test_utils.PyEnvironmentMock()] * 2))
+    policy = driver_test_utils.TFPolicyMock(
+        env.time_step_spec(), env.action_spec(), batch_size=2)
+    with self.assertRaisesRegexp(ValueError, 'PyDriver'):
+      dynamic_step_driver.DynamicStepDriver(env, policy)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -20,7 +20,12 @@ from __future__ import division
 from __future__ import print_function
 
 import numpy as np
+import tensorflow as tf
+from tf_agents.environments import time_step as ts
 from tf_agents.environments import trajectory
+from tf_agents.utils import nest_utils
+
+nest = tf.contrib.framework.nest
 
 
 class PyDriver(object):
@@ -31,7 +36,8 @@ class PyDriver(object):
                policy,
                observers,
                max_steps=None,
-               max_episodes=None):
+               max_episodes=None,
+               block_size=None):
     """A driver that runs a python policy in a python environment.
 
     Args:
@@ -45,21 +51,35 @@ class PyDriver(object):
         At least one of max_steps or max_episodes must be provided. If both
         are set, run() terminates when at least one of the conditions is
         satisfied.  Default: 0.
+      block_size: Optional number of steps written into preallocated
+        time-major arrays before notifying the observers. When set, observers
+        are called once per block with a `Trajectory` of arrays of outer shape
+        [block_size, batch_size], e.g. `replay_buffer.add_batch_sequence`, and
+        run() stops at the end of the first block reaching max_steps or
+        max_episodes. The arrays are reused by the next block, observers must
+        copy what they keep.
 
     Raises:
-      ValueError: If both max_steps and max_episodes are None.
+      ValueError: If both max_steps and max_episodes are None, or if block_size
+        is set for an environment with `current_env_ids`.
     """
     max_steps = max_steps or 0
     max_episodes = max_episodes or 0
     if max_steps < 1 and max_episodes < 1:
       raise ValueError(
           'Either `max_steps` or `max_episodes` should be greater than 0.')
+    if block_size and hasattr(env, 'current_env_ids'):
+      raise ValueError('`block_size` is not supported for environments with '
+                       '`current_env_ids`.')
 
     self._env = env
     self._policy = policy
     self._observers = observers or []
     self._max_steps = max_steps or np.inf
     self._max_episodes = max_episodes or np.inf
+    self._block_size = block_size
+    self._block = None
+    self._block_nests = None
 
   def run(self, time_step, policy_state=()):
     """Run policy in environment given initial time_step and policy_state.
@@ -71,6 +91,11 @@ class PyDriver(object):
     Returns:
       A tuple (final time_step, final policy_state).
     """
+    if hasattr(self._env, 'current_env_ids'):
+      return self._run_by_env_ids(time_step, policy_state)
+    if self._block_size:
+      return self._run_in_blocks(time_step, policy_state)
+
     num_steps = 0
     num_episodes = 0
     while num_steps < self._max_steps and num_episodes < self._max_episodes:
@@ -88,3 +113,120 @@ class PyDriver(object):
       policy_state = action_step.state
 
     return time_step, policy_state
+
+  def _run_in_blocks(self, time_step, policy_state):
+    """Runs writing block_size steps at a time into preallocated arrays.
+
+    Args:
+      time_step: The initial time_step.
+      policy_state: The initial policy_state.
+
+    Returns:
+      A tuple (final time_step, final policy_state).
+    """
+    if self._block is None:
+      outer_shape = (self._block_size,) + np.shape(time_step.step_type)
+      self._block = nest.map_structure(
+          lambda spec: np.zeros(outer_shape + spec.shape, spec.dtype),
+          self._policy.trajectory_spec())
+      self._block_nests = [
+          nest_utils.CompiledNest(s) for s in (
+              self._block.observation, self._block.action,
+              self._block.policy_info)]
+    block = self._block
+    observation_nest, action_nest, policy_info_nest = self._block_nests
+    # Flat arrays the fields of each step are written to.
+    observations = observation_nest.flatten(block.observation)
+    actions = action_nest.flatten(block.action)
+    policy_infos = policy_info_nest.flatten(block.policy_info)
+
+    num_steps = 0
+    num_episodes = 0
+    while num_steps < self._max_steps and num_episodes < self._max_episodes:
+      for t in range(self._block_size):
+        action_step = self._policy.action(time_step, policy_state)
+        next_time_step = self._env.step(action_step.action)
+
+        block.step_type[t] = time_step.step_type
+        _write_flat_arrays(
+            observations, t, observation_nest.flatten(time_step.observation))
+        _write_flat_arrays(actions, t, action_nest.flatten(action_step.action))
+        _write_flat_arrays(
+            policy_infos, t, policy_info_nest.flatten(action_step.info))
+        block.next_step_type[t] = next_time_step.step_type
+        block.reward[t] = next_time_step.reward
+        block.discount[t] = next_time_step.discount
+
+        time_step = next_time_step
+        policy_state = action_step.state
+
+      for observer in self._observers:
+        observer(block)
+
+      num_episodes += np.sum(block.is_last())
+      num_steps += np.sum(~block.is_boundary())
+
+    return time_step, policy_state
+
+  def _run_by_env_ids(self, time_step, policy_state):
+    """Runs in an environment whose batches hold varying environments.
+
+    Environments such as AsyncParallelPyEnvironment return each batch from a
+    different subset of environments, given by `env.current_env_ids()`. The
+    last time_step, action_step and policy_state of every environment are kept
+    so that each returned row is paired with the step of the same environment,
+    and observers receive trajectories whose rows follow
+    `env.current_env_ids()`.
+
+    Args:
+      time_step: The initial time_step, for `env.current_env_ids()`.
+      policy_state: The initial policy_state, for `env.current_env_ids()`.
+
+    Returns:
+      A tuple (final time_step, final policy_state).
+    """
+    env_ids = self._env.current_env_ids()
+    last_steps = None
+    steps_nest = None
+    flat_last_steps = None
+    num_steps = 0
+    num_episodes = 0
+    while num_steps < self._max_steps and num_episodes < self._max_episodes:
+      action_step = self._policy.action(time_step, policy_state)
+      if last_steps is None:
+        last_steps = nest.map_structure(
+            lambda a: np.zeros((self._env.num_envs,) + a.shape[1:], a.dtype),
+            _as_arrays((time_step, action_step)))
+        # Environments returned before the driver stepped them (e.g. pending
+        # resets) are paired with a LAST step, which makes a boundary.
+        last_steps[0].step_type[:] = ts.StepType.LAST
+        steps_nest = nest_utils.CompiledNest(last_steps)
+        flat_last_steps = steps_nest.flatten(last_steps)
+      _write_flat_arrays(flat_last_steps, env_ids,
+                         steps_nest.flatten((time_step, action_step)))
+      next_time_step = self._env.step(action_step.action)
+
+      env_ids = self._env.current_env_ids()
+      time_step, action_step = steps_nest.pack(
+          [a[env_ids] for a in flat_last_steps])
+      traj = trajectory.from_transition(time_step, action_step, next_time_step)
+      for observer in self._observers:
+        observer(traj)
+
+      num_episodes += np.sum(traj.is_last())
+      num_steps += np.sum(~traj.is_boundary())
+
+      time_step = next_time_step
+      policy_state = action_step.state
+
+    return time_step, policy_state
+
+
+def _as_arrays(nested):
+  return nest.map_structure(np.asarray, nested)
+
+
+def _write_flat_arrays(flat_arrays, index, flat_values):
+  """Writes the `flat_values` at `index` of the `flat_arrays`."""
+  for array, value in zip(flat_arrays, flat_values):
+    array[index] = value
@@ -19,6 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import copy
+import itertools
+
 from absl.testing import parameterized
 
 import numpy as np
@@ -218,6 +221,103 @@ class PyDriverTest(parameterized.TestCase, tf.test.TestCase):
       for t1_field, t2_field in zip(t1, t2):
         self.assertAllEqual(t1_field, t2_field)
 
+  def testBlocks(self):
+    env1 = driver_test_utils.PyEnvironmentMock(final_state=3)
+    env2 = driver_test_utils.PyEnvironmentMock(final_state=4)
+    env = batched_py_environment.BatchedPyEnvironment([env1, env2])
+    policy = driver_test_utils.PyPolicyMock(
+        env.time_step_spec(),
+        env.action_spec(),
+        initial_policy_state=np.array([1, 2]))
+    blocks = []
+    driver = py_driver.PyDriver(
+        env,
+        policy,
+        observers=[lambda block: blocks.append(copy.deepcopy(block))],
+        max_steps=4,
+        block_size=3)
+    time_step, _ = driver.run(env.reset(), policy.get_initial_state())
+
+    self.assertLen(blocks, 1)
+    self.assertAllEqual([[0, 0], [1, 1], [2, 1]], blocks[0].step_type)
+    self.assertAllEqual([[0, 0], [2, 1], [3, 3]], blocks[0].observation)
+    self.assertAllEqual([[2, 1], [1, 2], [2, 1]], blocks[0].action)
+    self.assertAllEqual([[1, 1], [2, 1], [0, 2]], blocks[0].next_step_type)
+    self.assertAllEqual([[1., 1.], [1., 1.], [0., 1.]], blocks[0].reward)
+    self.assertAllEqual([[1., 1.], [0., 1.], [1., 0.]], blocks[0].discount)
+    self.assertAllEqual([0, 4], time_step.observation)
+
+  def testBlocksRaisesWithEnvIds(self):
+    env = MockEnvIdsEnvironment([driver_test_utils.PyEnvironmentMock()], [[0]])
+    policy = driver_test_utils.PyPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    with self.assertRaises(ValueError):
+      py_driver.PyDriver(env, policy, observers=[], max_steps=1, block_size=2)
+
+  def testEnvironmentWithEnvIds(self):
+    envs = [driver_test_utils.PyEnvironmentMock(final_state=3)
+            for _ in range(3)]
+    env = MockEnvIdsEnvironment(envs, [[0, 1], [2, 0], [1, 2]])
+    policy = driver_test_utils.PyPolicyMock(
+        env.time_step_spec(),
+        env.action_spec(),
+        initial_policy_state=np.array([2, 2]))
+    replay_buffer_observer = MockReplayBufferObserver()
+    driver = py_driver.PyDriver(
+        env, policy, observers=[replay_buffer_observer], max_steps=6,
+        max_episodes=None)
+    driver.run(env.reset(), policy.get_initial_state())
+    trajectories = replay_buffer_observer.gather_all()
+
+    self.assertLen(trajectories, 4)
+    # Env ids [2, 0]: env 2 is returned before having been stepped, which
+    # makes a boundary.
+    self.assertAllEqual([2, 0], trajectories[0].step_type)
+    self.assertAllEqual([0, 1], trajectories[0].next_step_type)
+    # Env ids [0, 1]: each row is paired with the previous step of its env.
+    self.assertAllEqual([1, 1], trajectories[2].step_type)
+    self.assertAllEqual([1, 1], trajectories[2].observation)
+    self.assertAllEqual([2, 2], trajectories[2].action)
+    self.assertAllEqual([2, 2], trajectories[2].next_step_type)
+
+
+class MockEnvIdsEnvironment(batched_py_environment.BatchedPyEnvironment):
+  """Batched environment returning a scripted subset of envs at each step."""
+
+  def __init__(self, envs, env_ids_sequence):
+    super(MockEnvIdsEnvironment, self).__init__(envs)
+    self._batch_size = len(env_ids_sequence[0])
+    self._env_ids_sequence = itertools.cycle(
+        [np.array(ids) for ids in env_ids_sequence])
+    self._next_time_steps = {}
+    self._env_ids = None
+
+  @property
+  def batch_size(self):
+    return self._batch_size
+
+  @property
+  def num_envs(self):
+    return len(self.envs)
+
+  def current_env_ids(self):
+    return self._env_ids
+
+  def _next_batch(self):
+    self._env_ids = next(self._env_ids_sequence)
+    return batched_py_environment.stack_time_steps(
+        [self._next_time_steps.pop(env_id) for env_id in self._env_ids])
+
+  def reset(self):
+    self._next_time_steps = {
+        env_id: env.reset() for env_id, env in enumerate(self.envs)}
+    return self._next_batch()
+
+  def step(self, actions):
+    for env_id, action in zip(self._env_ids, actions):
+      self._next_time_steps[env_id] = self.envs[env_id].step(action)
+    return self._next_batch()
+
 
 if __name__ == '__main__':
   tf.test.main()
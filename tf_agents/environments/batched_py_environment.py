@@ -30,10 +30,16 @@ import numpy as np
 
 import tensorflow as tf
 from tf_agents.environments import py_environment
+from tf_agents.utils import nest_utils
 import gin.tf
 
 nest = tf.contrib.framework.nest
 
+# Number of preallocated time_step batches that `step` and `reset` alternate
+# between when reusing buffers, so that the previous time_step stays valid
+# while the next one is written.
+_NUM_TIME_STEP_BUFFERS = 2
+
 
 @gin.configurable
 class BatchedPyEnvironment(py_environment.Base):
@@ -41,9 +47,12 @@ class BatchedPyEnvironment(py_environment.Base):
 
   The environments should only access shared python variables using
   shared mutex locks (from the threading module).
+
+  Each environment writes its time_step in place into its row of the batch
+  returned by `step` and `reset`, so that no arrays are stacked.
   """
 
-  def __init__(self, envs):
+  def __init__(self, envs, reuse_time_step_buffers=False):
     """Batch together multiple (non-batched) py environments.
 
     The environments can be different but must use the same action and
@@ -51,6 +60,11 @@ class BatchedPyEnvironment(py_environment.Base):
 
     Args:
       envs: List python environments (must be non-batched).
+      reuse_time_step_buffers: Boolean, whether `step` and `reset` write into
+        preallocated batches instead of allocating a new batch at every call.
+        They alternate between two batches, so a returned time_step then stays
+        valid until the second following call to `step` or `reset`; copy it if
+        it needs to be kept longer.
 
     Raises:
       ValueError: If envs is not a list or tuple, or is zero length, or if
@@ -76,6 +90,13 @@ class BatchedPyEnvironment(py_environment.Base):
       raise ValueError(
           "All environments must have the same time_step_spec.  Saw: %s" %
           [env.time_step_spec() for env in self._envs])
+    self._action_nest = nest_utils.CompiledNest(self._action_spec)
+    self._time_step_nest = nest_utils.CompiledNest(self._time_step_spec)
+    self._reuse_time_step_buffers = reuse_time_step_buffers
+    if reuse_time_step_buffers:
+      self._time_step_batches = [
+          self._new_time_step_batch() for _ in range(_NUM_TIME_STEP_BUFFERS)]
+    self._time_step_buffer = 0
     # Create a multiprocessing threadpool for execution.
     self._pool = mp_threads.Pool(self._num_envs)
 
@@ -106,8 +127,10 @@ class BatchedPyEnvironment(py_environment.Base):
     Returns:
       Time step with batch dimension.
     """
-    time_steps = self._pool.map(lambda env: env.reset(), self._envs)
-    return stack_time_steps(time_steps)
+    batch = self._next_time_step_batch()
+    self._pool.map(lambda i: batch.write(i, self._envs[i].reset()),
+                   range(self._num_envs))
+    return batch.nested
 
   def step(self, actions):
     """Forward a batch of actions to the wrapped environments.
@@ -121,15 +144,28 @@ class BatchedPyEnvironment(py_environment.Base):
     Returns:
       Batch of observations, rewards, and done flags.
     """
-    unstacked_actions = unstack_actions(actions)
+    unstacked_actions = unstack_actions(actions, self._action_nest)
     if len(unstacked_actions) != self.batch_size:
       raise ValueError(
           "Primary dimension of action items does not match "
           "batch size: %d vs. %d" % (len(unstacked_actions), self.batch_size))
-    time_steps = self._pool.map(
-        lambda env_action: env_action[0].step(env_action[1]),
-        zip(self._envs, unstacked_actions))
-    return stack_time_steps(time_steps)
+    batch = self._next_time_step_batch()
+    self._pool.map(
+        lambda i: batch.write(i, self._envs[i].step(unstacked_actions[i])),
+        range(self._num_envs))
+    return batch.nested
+
+  def _new_time_step_batch(self):
+    return nest_utils.BatchedArrayNest(
+        self._time_step_spec, (self._num_envs,), self._time_step_nest)
+
+  def _next_time_step_batch(self):
+    """Returns the batch the next time_steps are written to."""
+    if not self._reuse_time_step_buffers:
+      return self._new_time_step_batch()
+    self._time_step_buffer = (
+        self._time_step_buffer + 1) % _NUM_TIME_STEP_BUFFERS
+    return self._time_step_batches[self._time_step_buffer]
 
   def close(self):
     """Send close messages to the external process and join them."""
@@ -139,13 +175,35 @@ class BatchedPyEnvironment(py_environment.Base):
 
 
 # TODO(ebrevdo,sguada): Factor these helper functions out into common utils.
-def stack_time_steps(time_steps):
-  """Given a list of TimeStep, combine to one with a batch dimension."""
+def stack_time_steps(time_steps, compiled_nest=None):
+  """Given a list of TimeStep, combine to one with a batch dimension.
+
+  Args:
+    time_steps: A list of TimeStep with the same structure.
+    compiled_nest: Optional `nest_utils.CompiledNest` of the time_step_spec,
+      used to stack the arrays without traversing the nests.
+
+  Returns:
+    A TimeStep with a batch dimension.
+  """
+  if compiled_nest is not None:
+    return compiled_nest.stack_arrays(time_steps)
   return fast_map_structure(lambda *arrays: np.stack(arrays), *time_steps)
 
 
-def unstack_actions(batched_actions):
-  """Returns a list of actions from potentially nested batch of actions."""
+def unstack_actions(batched_actions, compiled_nest=None):
+  """Returns a list of actions from potentially nested batch of actions.
+
+  Args:
+    batched_actions: A nest of actions with a batch dimension.
+    compiled_nest: Optional `nest_utils.CompiledNest` of the action_spec, used
+      to unstack the arrays without traversing the nests.
+
+  Returns:
+    A list of unbatched actions.
+  """
+  if compiled_nest is not None:
+    return compiled_nest.unstack_arrays(batched_actions)
   flattened_actions = nest.flatten(batched_actions)
   unstacked_actions = [
       nest.pack_sequence_as(batched_actions, actions)
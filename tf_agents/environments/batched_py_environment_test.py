@@ -42,12 +42,12 @@ class BatchedPyEnvironmentTest(tf.test.TestCase):
   def observation_spec(self):
     return array_spec.ArraySpec((3, 3), np.float32)
 
-  def _make_batched_py_environment(self, num_envs=3):
+  def _make_batched_py_environment(self, num_envs=3, **kwargs):
     self.time_step_spec = ts.time_step_spec(self.observation_spec)
     constructor = functools.partial(random_py_environment.RandomPyEnvironment,
                                     self.observation_spec, self.action_spec)
     return batched_py_environment.BatchedPyEnvironment(
-        envs=[constructor() for _ in range(num_envs)])
+        envs=[constructor() for _ in range(num_envs)], **kwargs)
 
   def test_close_no_hang_after_init(self):
     env = self._make_batched_py_environment()
@@ -86,6 +86,20 @@ class BatchedPyEnvironmentTest(tf.test.TestCase):
                         time_step2.observation.shape)
     env.close()
 
+  def test_step_reuse_time_step_buffers(self):
+    num_envs = 3
+    env = self._make_batched_py_environment(
+        num_envs=num_envs, reuse_time_step_buffers=True)
+    action = np.zeros((num_envs,) + self.action_spec.shape, np.float32)
+
+    time_steps = [env.reset(), env.step(action), env.step(action)]
+    self.assertEqual((num_envs,) + self.observation_spec.shape,
+                     time_steps[0].observation.shape)
+    # The batches alternate between two preallocated buffers.
+    self.assertIs(time_steps[0].observation, time_steps[2].observation)
+    self.assertIsNot(time_steps[1].observation, time_steps[2].observation)
+    env.close()
+
   def test_unstack_actions(self):
     num_envs = 5
     action_spec = self.action_spec
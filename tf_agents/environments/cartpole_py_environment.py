@@ -0,0 +1,90 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Vectorized CartPole implemented with NumPy.
+
+Follows the dynamics, rewards and termination of Gym's `CartPole-v0`, like
+`cartpole_tf_environment.CartPoleTFEnvironment`, and steps the whole batch with
+array operations.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from tf_agents.environments import cartpole_tf_environment as cartpole
+from tf_agents.environments import vectorized_py_environment
+from tf_agents.specs import array_spec
+
+import gin.tf
+
+
+@gin.configurable
+class CartPolePyEnvironment(vectorized_py_environment.VectorizedPyEnvironment):
+  """A batch of CartPole environments stepped with NumPy."""
+
+  def __init__(self, batch_size=1, max_episode_steps=200, seed=None):
+    """Initializes the environment.
+
+    Args:
+      batch_size: Number of environments stepped together.
+      max_episode_steps: Maximum number of steps per episode, 200 as in
+        `CartPole-v0`. None for no limit.
+      seed: Optional seed for the initial states.
+    """
+    super(CartPolePyEnvironment, self).__init__(
+        batch_size, max_episode_steps=max_episode_steps)
+    self._rng = np.random.RandomState(seed)
+    self._state = np.zeros((batch_size, 4), dtype=np.float64)
+
+  def observation_spec(self):
+    return array_spec.ArraySpec([4], np.float32, name='observation')
+
+  def action_spec(self):
+    return array_spec.BoundedArraySpec(
+        [], np.int64, minimum=0, maximum=1, name='action')
+
+  def _reset_batch(self, indices):
+    self._state[indices] = self._rng.uniform(
+        low=-0.05, high=0.05, size=(len(indices), 4))
+    return self._state[indices].astype(np.float32)
+
+  def _step_batch(self, actions):
+    x, x_dot, theta, theta_dot = self._state.T
+    force = np.where(actions == 1, cartpole.FORCE_MAGNITUDE,
+                     -cartpole.FORCE_MAGNITUDE)
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    temp = (force + cartpole.POLE_MASS_LENGTH * theta_dot**2 * sin_theta) / (
+        cartpole.TOTAL_MASS)
+    theta_acc = (cartpole.GRAVITY * sin_theta - cos_theta * temp) / (
+        cartpole.POLE_HALF_LENGTH *
+        (4.0 / 3.0 - cartpole.POLE_MASS * cos_theta**2 / cartpole.TOTAL_MASS))
+    x_acc = (temp - cartpole.POLE_MASS_LENGTH * theta_acc * cos_theta /
+             cartpole.TOTAL_MASS)
+
+    # Explicit Euler integration, as in Gym.
+    self._state = np.stack([
+        x + cartpole.TAU * x_dot,
+        x_dot + cartpole.TAU * x_acc,
+        theta + cartpole.TAU * theta_dot,
+        theta_dot + cartpole.TAU * theta_acc,
+    ], axis=1)
+    terminated = ((np.abs(self._state[:, 0]) > cartpole.X_THRESHOLD) |
+                  (np.abs(self._state[:, 2]) > cartpole.THETA_THRESHOLD))
+    reward = np.ones(self.batch_size, dtype=np.float32)
+    return self._state.astype(np.float32), reward, terminated
@@ -0,0 +1,65 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.environments.cartpole_py_environment."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest
+import numpy as np
+
+from tf_agents.environments import cartpole_py_environment
+from tf_agents.environments import time_step as ts
+
+
+class CartPolePyEnvironmentTest(absltest.TestCase):
+
+  def testInitialObservation(self):
+    env = cartpole_py_environment.CartPolePyEnvironment(batch_size=3, seed=0)
+    time_step = env.reset()
+    self.assertEqual((3, 4), time_step.observation.shape)
+    self.assertEqual(np.float32, time_step.observation.dtype)
+    self.assertTrue(np.all(np.abs(time_step.observation) <= 0.05))
+
+  def testPoleFallsWhenPushedOneWay(self):
+    env = cartpole_py_environment.CartPolePyEnvironment(seed=0)
+    env.reset()
+    for _ in range(30):
+      time_step = env.step(np.array([1]))
+      np.testing.assert_array_equal([1.], time_step.reward)
+      if time_step.is_last()[0]:
+        break
+    np.testing.assert_array_equal([ts.StepType.LAST], time_step.step_type)
+    np.testing.assert_array_equal([0.], time_step.discount)
+    # The pole falls to the left as the cart accelerates to the right.
+    self.assertLess(time_step.observation[0, 2], 0)
+
+    time_step = env.step(np.array([1]))
+    np.testing.assert_array_equal([ts.StepType.FIRST], time_step.step_type)
+    self.assertTrue(np.all(np.abs(time_step.observation) <= 0.05))
+
+  def testMaxEpisodeSteps(self):
+    env = cartpole_py_environment.CartPolePyEnvironment(
+        batch_size=2, max_episode_steps=1, seed=0)
+    env.reset()
+    time_step = env.step(np.array([0, 1]))
+    np.testing.assert_array_equal([ts.StepType.LAST] * 2, time_step.step_type)
+    np.testing.assert_array_equal([1., 1.], time_step.discount)
+
+
+if __name__ == '__main__':
+  absltest.main()
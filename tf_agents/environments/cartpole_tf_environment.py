@@ -0,0 +1,103 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""CartPole implemented with TensorFlow ops.
+
+Follows the dynamics, rewards and termination of Gym's `CartPole-v0`, with the
+cart position, cart velocity, pole angle and pole angular velocity as
+observations, and actions 0 and 1 pushing the cart left and right.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+
+import tensorflow as tf
+
+from tf_agents.environments import tf_native_environment
+from tf_agents.specs import tensor_spec
+
+import gin.tf
+
+GRAVITY = 9.8
+CART_MASS = 1.0
+POLE_MASS = 0.1
+TOTAL_MASS = CART_MASS + POLE_MASS
+POLE_HALF_LENGTH = 0.5
+POLE_MASS_LENGTH = POLE_MASS * POLE_HALF_LENGTH
+FORCE_MAGNITUDE = 10.0
+TAU = 0.02  # Seconds between state updates.
+THETA_THRESHOLD = 12 * 2 * math.pi / 360
+X_THRESHOLD = 2.4
+
+
+@gin.configurable
+class CartPoleTFEnvironment(tf_native_environment.TFNativeEnvironment):
+  """A batch of CartPole environments stepped in-graph."""
+
+  def __init__(self, batch_size=1, max_episode_steps=200, seed=None):
+    """Creates a CartPoleTFEnvironment.
+
+    Args:
+      batch_size: Number of environments stepped together.
+      max_episode_steps: Maximum number of steps per episode, 200 as in
+        `CartPole-v0`. None for no limit.
+      seed: Optional seed for the initial states.
+    """
+    self._seed = seed
+    observation_spec = tensor_spec.TensorSpec(
+        [4], tf.float32, name='observation')
+    action_spec = tensor_spec.BoundedTensorSpec(
+        [], tf.int64, minimum=0, maximum=1, name='action')
+    super(CartPoleTFEnvironment, self).__init__(
+        observation_spec, action_spec, batch_size=batch_size,
+        max_episode_steps=max_episode_steps, scope='cartpole')
+
+  def _reset_state(self, batch_size):
+    return tf.random_uniform(
+        [batch_size, 4], minval=-0.05, maxval=0.05, seed=self._seed)
+
+  def _observe(self, state):
+    return state
+
+  def _transition(self, state, action):
+    x, x_dot, theta, theta_dot = tf.unstack(state, axis=1)
+    force = tf.where(
+        tf.equal(action, 1),
+        tf.fill(tf.shape(x), FORCE_MAGNITUDE),
+        tf.fill(tf.shape(x), -FORCE_MAGNITUDE))
+    cos_theta = tf.cos(theta)
+    sin_theta = tf.sin(theta)
+    temp = (force + POLE_MASS_LENGTH * theta_dot**2 * sin_theta) / TOTAL_MASS
+    theta_acc = (GRAVITY * sin_theta - cos_theta * temp) / (
+        POLE_HALF_LENGTH *
+        (4.0 / 3.0 - POLE_MASS * cos_theta**2 / TOTAL_MASS))
+    x_acc = temp - POLE_MASS_LENGTH * theta_acc * cos_theta / TOTAL_MASS
+
+    # Explicit Euler integration, as in Gym.
+    next_state = tf.stack([
+        x + TAU * x_dot,
+        x_dot + TAU * x_acc,
+        theta + TAU * theta_dot,
+        theta_dot + TAU * theta_acc,
+    ], axis=1)
+    next_x = next_state[:, 0]
+    next_theta = next_state[:, 2]
+    terminated = ((tf.abs(next_x) > X_THRESHOLD) |
+                  (tf.abs(next_theta) > THETA_THRESHOLD))
+    reward = tf.ones_like(next_x)
+    return next_state, reward, terminated
@@ -0,0 +1,102 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.environments.cartpole_tf_environment."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.drivers import dynamic_step_driver
+from tf_agents.environments import batched_py_environment
+from tf_agents.environments import cartpole_tf_environment
+from tf_agents.environments import suite_gym
+from tf_agents.environments import tf_py_environment
+from tf_agents.environments import time_step as ts
+from tf_agents.policies import random_tf_policy
+
+
+class CartPoleTFEnvironmentTest(tf.test.TestCase):
+
+  def testInitialObservation(self):
+    env = cartpole_tf_environment.CartPoleTFEnvironment(batch_size=3)
+    self.evaluate(tf.global_variables_initializer())
+    time_step = self.evaluate(env.current_time_step())
+    self.assertEqual((3, 4), time_step.observation.shape)
+    self.assertTrue(np.all(np.abs(time_step.observation) <= 0.05))
+    self.assertAllEqual([ts.StepType.FIRST] * 3, time_step.step_type)
+
+  def testPoleFallsWhenPushedOneWay(self):
+    env = cartpole_tf_environment.CartPoleTFEnvironment()
+    step = env.step(tf.constant([1], tf.int64))
+    self.evaluate(tf.global_variables_initializer())
+    for _ in range(30):
+      time_step = self.evaluate(step)
+      self.assertAllEqual([1.], time_step.reward)
+      if time_step.is_last()[0]:
+        break
+    self.assertAllEqual([ts.StepType.LAST], time_step.step_type)
+    self.assertAllEqual([0.], time_step.discount)
+    # The pole falls to the left as the cart accelerates to the right.
+    self.assertLess(time_step.observation[0, 2], 0)
+
+  def testMaxEpisodeSteps(self):
+    env = cartpole_tf_environment.CartPoleTFEnvironment(max_episode_steps=1)
+    step = env.step(tf.constant([0], tf.int64))
+    self.evaluate(tf.global_variables_initializer())
+    time_step = self.evaluate(step)
+    self.assertAllEqual([ts.StepType.LAST], time_step.step_type)
+    self.assertAllEqual([1.], time_step.discount)
+
+
+class CartPoleTFEnvironmentBenchmark(tf.test.Benchmark):
+
+  def _benchmark_driver(self, env, name):
+    policy = random_tf_policy.RandomTFPolicy(env.time_step_spec(),
+                                             env.action_spec())
+    num_steps = 1000 * env.batch_size
+    driver = dynamic_step_driver.DynamicStepDriver(
+        env, policy, num_steps=num_steps)
+    run_driver = driver.run()
+    with tf.Session() as session:
+      session.run(tf.global_variables_initializer())
+      session.run(run_driver)
+      start_time = time.time()
+      session.run(run_driver)
+      wall_time = time.time() - start_time
+    self.report_benchmark(
+        iters=num_steps, wall_time=wall_time / num_steps, name=name,
+        extras={'steps_per_sec': num_steps / wall_time})
+
+  def benchmark_collect(self):
+    for batch_size in [1, 16, 256]:
+      with tf.Graph().as_default():
+        env = cartpole_tf_environment.CartPoleTFEnvironment(
+            batch_size=batch_size)
+        self._benchmark_driver(env, 'native_cartpole_bs_%d' % batch_size)
+      with tf.Graph().as_default():
+        env = tf_py_environment.TFPyEnvironment(
+            batched_py_environment.BatchedPyEnvironment(
+                [suite_gym.load('CartPole-v0') for _ in range(batch_size)]))
+        self._benchmark_driver(env, 'tf_py_cartpole_bs_%d' % batch_size)
+
+
+if __name__ == '__main__':
+  tf.test.main()
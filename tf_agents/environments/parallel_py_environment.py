@@ -20,17 +20,30 @@ from __future__ import division
 from __future__ import print_function
 
 import atexit
+import collections
+import functools
 import multiprocessing
+import os
+import shutil
 import sys
+import tempfile
 import traceback
 
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.environments import batched_py_environment
 from tf_agents.environments import py_environment
+from tf_agents.utils import nest_utils
 
 nest = tf.contrib.framework.nest
 
+try:
+  # Python 3 only.
+  from multiprocessing.connection import wait as _wait  # pylint: disable=g-import-not-at-top
+except ImportError:
+  _wait = None
+
 
 class ParallelPyEnvironment(py_environment.Base):
   """Batch together environments and simulate them in external processes.
@@ -39,9 +52,21 @@ class ParallelPyEnvironment(py_environment.Base):
   callables. This can be an environment class, or a function creating the
   environment and potentially wrapping it. The returned environment should not
   access global variables.
+
+  Each external process hosts `envs_per_worker` environments, stepped together
+  as a `BatchedPyEnvironment`, so that many cheap environments do not need one
+  process and one pipe round-trip each.
+
+  The time_steps received from the processes are written in place into the
+  rows of the returned batch, so that no arrays are stacked.
   """
 
-  def __init__(self, env_constructors, blocking=False, flatten=False):
+  def __init__(self,
+               env_constructors,
+               blocking=False,
+               flatten=False,
+               shared_memory=False,
+               envs_per_worker=1):
     """Batch together environments and simulate them in external processes.
 
     The environments can be different but must use the same action and
@@ -52,13 +77,39 @@ class ParallelPyEnvironment(py_environment.Base):
       blocking: Whether to step environments one after another.
       flatten: Boolean, whether to use flatten action and time_steps during
         communication to reduce overhead.
+      shared_memory: Boolean, whether to exchange actions and time_steps
+        through preallocated shared memory instead of pickling them through
+        the pipes. Each worker writes its time_step directly into its row of
+        the batch, and `step` and `reset` return views of the shared batch.
+        These views alternate between two buffers, so a returned time_step
+        stays valid until the second following call to `step` or `reset`;
+        copy it if it needs to be kept longer.
+      envs_per_worker: Number of environments created in each external
+        process. The environments of a process are stepped in a loop and
+        their time_steps are sent back in a single batched message. The last
+        process holds fewer environments if `envs_per_worker` does not divide
+        the number of environments.
 
     Raises:
-      ValueError: If the action or observation specs don't match.
+      ValueError: If the action or observation specs don't match, or if
+        envs_per_worker is smaller than 1.
     """
+    if envs_per_worker < 1:
+      raise ValueError(
+          'envs_per_worker must be at least 1, got: {}'.format(envs_per_worker))
+    self._num_envs = len(env_constructors)
+    self._envs_per_worker = envs_per_worker
+    # Range of the batch handled by each external process.
+    self._worker_bounds = [
+        (start, min(start + envs_per_worker, self._num_envs))
+        for start in range(0, self._num_envs, envs_per_worker)]
+    if envs_per_worker > 1:
+      env_constructors = [
+          functools.partial(_create_batched_environment,
+                            env_constructors[start:stop])
+          for start, stop in self._worker_bounds]
     self._envs = [ProcessPyEnvironment(ctor, flatten=flatten)
                   for ctor in env_constructors]
-    self._num_envs = len(env_constructors)
     self.start()
     self._action_spec = self._envs[0].action_spec()
     self._observation_spec = self._envs[0].observation_spec()
@@ -69,6 +120,32 @@ class ParallelPyEnvironment(py_environment.Base):
       raise ValueError('All environments must have the same time_step_spec.')
     self._blocking = blocking
     self._flatten = flatten
+    self._shared_memory = shared_memory
+    self._time_step_nest = nest_utils.CompiledNest(self._time_step_spec)
+    if self._shared_memory:
+      self._create_shared_memory()
+
+  def _create_shared_memory(self):
+    """Allocates the shared batch arrays and attaches them to the workers."""
+    # Prefer a RAM backed file system so the arrays never hit the disk.
+    shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    self._shared_memory_dir = tempfile.mkdtemp(
+        prefix='parallel_py_environment_', dir=shm_dir)
+    atexit.register(shutil.rmtree, self._shared_memory_dir, ignore_errors=True)
+    self._shared_actions, action_infos = _create_shared_arrays(
+        os.path.join(self._shared_memory_dir, 'action'),
+        self._action_spec, (self._num_envs,))
+    time_step_arrays, time_step_infos = _create_shared_arrays(
+        os.path.join(self._shared_memory_dir, 'time_step'),
+        self._time_step_spec, (_NUM_SHARED_SLOTS, self._num_envs))
+    self._shared_time_steps = [
+        nest.pack_sequence_as(self._time_step_spec,
+                              [array[slot] for array in time_step_arrays])
+        for slot in range(_NUM_SHARED_SLOTS)]
+    self._shared_slot = 0
+    for (start, stop), env in zip(self._worker_bounds, self._envs):
+      index = slice(start, stop) if self._envs_per_worker > 1 else start
+      env.attach_shared_memory(action_infos, time_step_infos, index)
 
   def start(self):
     tf.logging.info('Starting all processes.')
@@ -99,6 +176,8 @@ class ParallelPyEnvironment(py_environment.Base):
     Returns:
       Time step with batch dimension.
     """
+    if self._shared_memory:
+      return self._call_shared('reset')
     time_steps = [env.reset(self._blocking) for env in self._envs]
     if not self._blocking:
       time_steps = [promise() for promise in time_steps]
@@ -116,9 +195,17 @@ class ParallelPyEnvironment(py_environment.Base):
     Returns:
       Batch of observations, rewards, and done flags.
     """
+    if self._shared_memory:
+      for array, action in zip(self._shared_actions, nest.flatten(actions)):
+        array[:] = action
+      return self._call_shared('step')
+    if self._envs_per_worker > 1:
+      worker_actions = self._split_actions(actions)
+    else:
+      worker_actions = self._unstack_actions(actions)
     time_steps = [
         env.step(action, self._blocking)
-        for env, action in zip(self._envs, self._unstack_actions(actions))]
+        for env, action in zip(self._envs, worker_actions)]
     # When blocking is False we get promises that need to be called.
     if not self._blocking:
       time_steps = [promise() for promise in time_steps]
@@ -129,16 +216,37 @@ class ParallelPyEnvironment(py_environment.Base):
     tf.logging.info('Closing all processes.')
     for env in self._envs:
       env.close()
+    if self._shared_memory:
+      shutil.rmtree(self._shared_memory_dir, ignore_errors=True)
     tf.logging.info('All processes closed.')
 
+  def _call_shared(self, name):
+    """Runs `name` in all workers, which write into the next shared slot."""
+    self._shared_slot = (self._shared_slot + 1) % _NUM_SHARED_SLOTS
+    promises = []
+    for env in self._envs:
+      promise = env.call_shared(name, self._shared_slot)
+      if self._blocking:
+        promise()
+      else:
+        promises.append(promise)
+    for promise in promises:
+      promise()
+    return self._shared_time_steps[self._shared_slot]
+
   def _stack_time_steps(self, time_steps):
-    """Given a list of TimeStep, combine to one with a batch dimension."""
-    if self._flatten:
-      return fast_map_structure_flatten(lambda *arrays: np.stack(arrays),
-                                        self._time_step_spec,
-                                        *time_steps)
+    """Writes a list of TimeStep into the rows of a new time_step batch."""
+    batch = nest_utils.BatchedArrayNest(
+        self._time_step_spec, (self.batch_size,), self._time_step_nest)
+    # Workers hosting several environments already return batched time_steps.
+    if self._envs_per_worker > 1:
+      indices = [slice(start, stop) for start, stop in self._worker_bounds]
     else:
-      return fast_map_structure(lambda *arrays: np.stack(arrays), *time_steps)
+      indices = range(len(time_steps))
+    write = batch.write_flat if self._flatten else batch.write
+    for index, time_step in zip(indices, time_steps):
+      write(index, time_step)
+    return batch.nested
 
   def _unstack_actions(self, batched_actions):
     """Returns a list of actions from potentially nested batch of actions."""
@@ -150,8 +258,254 @@ class ParallelPyEnvironment(py_environment.Base):
                            for actions in zip(*flattened_actions)]
     return unstacked_actions
 
+  def _split_actions(self, batched_actions):
+    """Returns the slice of the batch of actions for each external process."""
+    flattened_actions = nest.flatten(batched_actions)
+    split_actions = []
+    for start, stop in self._worker_bounds:
+      actions = [action[start:stop] for action in flattened_actions]
+      if not self._flatten:
+        actions = nest.pack_sequence_as(batched_actions, actions)
+      split_actions.append(actions)
+    return split_actions
+
 
 # TODO(sguada) Move to utils.
+class AsyncParallelPyEnvironment(ParallelPyEnvironment):
+  """Steps environments in external processes and batches the first ready.
+
+  Instead of waiting for every environment, each batch is made of the first
+  `batch_size` environments to return a time_step, so that a slow episode reset
+  in one environment does not stall the others. The ids of the environments in
+  the last returned batch are available from `current_env_ids()`.
+
+  Besides the `py_environment.Base` interface, where `step(actions)` applies
+  the actions to the environments of the last returned batch, environments can
+  be driven explicitly with:
+
+    env.async_reset()
+    while True:
+      time_step = env.recv()
+      env_ids = env.current_env_ids()
+      env.send(policy(time_step), env_ids)
+
+  Consecutive batches contain different environments, so consumers have to pair
+  transitions by env id (e.g. PyDriver does so).
+  """
+
+  def __init__(self, env_constructors, batch_size=None, flatten=False):
+    """Creates an AsyncParallelPyEnvironment.
+
+    Args:
+      env_constructors: List of callables that create environments.
+      batch_size: Number of environments in each returned batch. Defaults to
+        the number of environments.
+      flatten: Boolean, whether to use flatten action and time_steps during
+        communication to reduce overhead.
+
+    Raises:
+      ValueError: If the action or observation specs don't match, or if
+        batch_size is not in [1, len(env_constructors)].
+    """
+    super(AsyncParallelPyEnvironment, self).__init__(
+        env_constructors, blocking=False, flatten=flatten)
+    self._async_batch_size = batch_size or self._num_envs
+    if not 0 < self._async_batch_size <= self._num_envs:
+      raise ValueError(
+          'batch_size must be in [1, {}], got: {}'.format(
+              self._num_envs, self._async_batch_size))
+    # Promises of the environments currently running, by env id.
+    self._running = {}
+    # Results received from the workers and not returned yet, in order.
+    self._ready = collections.OrderedDict()
+    self._env_ids = np.arange(self._async_batch_size, dtype=np.int32)
+
+  @property
+  def batch_size(self):
+    return self._async_batch_size
+
+  @property
+  def num_envs(self):
+    return self._num_envs
+
+  def current_env_ids(self):
+    """Returns the int32 ids of the environments in the last returned batch."""
+    return self._env_ids
+
+  def async_reset(self):
+    """Resets all the environments without waiting for the results.
+
+    Pending results are discarded.
+    """
+    for promise in self._running.values():
+      promise()
+    self._running.clear()
+    self._ready.clear()
+    for env_id, env in enumerate(self._envs):
+      self._running[env_id] = env.reset(blocking=False)
+
+  def send(self, actions, env_ids=None):
+    """Sends a batch of actions to the given environments without waiting.
+
+    Args:
+      actions: Batched action, possibly nested, one row per env id.
+      env_ids: Ids of the environments to step. Defaults to the ids of the
+        last returned batch.
+
+    Raises:
+      ValueError: If the number of actions and env_ids differ, or if one of
+        the environments still has a result that was not received.
+    """
+    env_ids = self._env_ids if env_ids is None else env_ids
+    unstacked_actions = list(self._unstack_actions(actions))
+    if len(unstacked_actions) != len(env_ids):
+      raise ValueError(
+          'Primary dimension of action items does not match the number of '
+          'env_ids: %d vs. %d' % (len(unstacked_actions), len(env_ids)))
+    for env_id, action in zip(env_ids, unstacked_actions):
+      env_id = int(env_id)
+      if env_id in self._running or env_id in self._ready:
+        raise ValueError(
+            'Environment {} has a pending result; call recv() before stepping '
+            'it again.'.format(env_id))
+      self._running[env_id] = self._envs[env_id].step(action, blocking=False)
+
+  def recv(self):
+    """Waits for the first `batch_size` environments to return a time_step.
+
+    Returns:
+      Time step with batch dimension, ordered as `current_env_ids()`.
+
+    Raises:
+      RuntimeError: If fewer than `batch_size` environments are running.
+    """
+    if len(self._running) + len(self._ready) < self._async_batch_size:
+      raise RuntimeError(
+          'Only {} environments are running, cannot return a batch of {}. '
+          'Call send() or async_reset() first.'.format(
+              len(self._running) + len(self._ready), self._async_batch_size))
+    while len(self._ready) < self._async_batch_size:
+      connections = {
+          self._envs[env_id].connection: env_id for env_id in self._running}
+      for connection in _wait_for_connections(list(connections)):
+        env_id = connections[connection]
+        self._ready[env_id] = self._running.pop(env_id)()
+
+    env_ids = list(self._ready)[:self._async_batch_size]
+    time_steps = [self._ready.pop(env_id) for env_id in env_ids]
+    self._env_ids = np.array(env_ids, dtype=np.int32)
+    return self._stack_time_steps(time_steps)
+
+  def reset(self):
+    """Resets all environments and returns the first ready batch.
+
+    Returns:
+      Time step with batch dimension.
+    """
+    self.async_reset()
+    return self.recv()
+
+  def step(self, actions):
+    """Steps the environments of the last batch, returns the next ready batch.
+
+    Args:
+      actions: Batched action, possibly nested, one row per env id of
+        `current_env_ids()`.
+
+    Returns:
+      Time step with batch dimension, ordered as `current_env_ids()`.
+    """
+    self.send(actions)
+    return self.recv()
+
+  def close(self):
+    """Waits for the running environments and closes all external process."""
+    for promise in self._running.values():
+      try:
+        promise()
+      except Exception:  # pylint: disable=broad-except
+        pass
+    self._running.clear()
+    super(AsyncParallelPyEnvironment, self).close()
+
+
+def _create_batched_environment(env_constructors):
+  """Creates the environments hosted by a single external process."""
+  return batched_py_environment.BatchedPyEnvironment(
+      [env_constructor() for env_constructor in env_constructors])
+
+
+def _wait_for_connections(connections):
+  """Blocks until some of the connections have data, and returns them."""
+  if _wait is not None:
+    return _wait(connections)
+  while True:
+    ready = [connection for connection in connections
+             if connection.poll(0.001)]
+    if ready:
+      return ready
+
+
+# Number of time_step buffers the workers alternate between in shared memory
+# mode, so that the previous time_step stays valid while the next one is
+# written.
+_NUM_SHARED_SLOTS = 2
+
+
+def _create_shared_arrays(prefix, specs, outer_dims):
+  """Creates arrays for a nest of specs, backed by memory mapped files.
+
+  Args:
+    prefix: Path prefix of the files backing the arrays.
+    specs: A nest of ArraySpecs.
+    outer_dims: Tuple of outer dimensions to add to each array.
+
+  Returns:
+    A tuple (arrays, infos) with the flat list of arrays and the list of
+    (path, dtype, shape) tuples needed to attach them in another process.
+  """
+  arrays = []
+  infos = []
+  for index, spec in enumerate(nest.flatten(specs)):
+    path = '{}_{}'.format(prefix, index)
+    shape = tuple(outer_dims) + tuple(spec.shape)
+    array = np.memmap(path, dtype=spec.dtype, mode='w+', shape=shape)
+    arrays.append(array.view(np.ndarray))
+    infos.append((path, spec.dtype, shape))
+  return arrays, infos
+
+
+def _attach_shared_arrays(infos):
+  """Opens the arrays created by _create_shared_arrays in another process."""
+  return [np.memmap(path, dtype=dtype, mode='r+', shape=shape).view(np.ndarray)
+          for path, dtype, shape in infos]
+
+
+def _flat_converters(action_spec, observation_spec=None):
+  """Returns functions converting flat actions and time_steps of a worker.
+
+  The structure checks are done once here, so that environments with plain
+  array actions and observations skip `nest` altogether on every step.
+
+  Args:
+    action_spec: The action spec of the environment.
+    observation_spec: Optional observation spec of the environment.
+
+  Returns:
+    A tuple (pack_action, flatten_time_step) of functions.
+  """
+  if nest.is_sequence(action_spec):
+    pack_action = functools.partial(nest.pack_sequence_as, action_spec)
+  else:
+    pack_action = lambda flat_action: flat_action[0]
+  if observation_spec is None or nest.is_sequence(observation_spec):
+    flatten_time_step = nest.flatten
+  else:
+    # The fields of a TimeStep are then already its flattened arrays.
+    flatten_time_step = list
+  return pack_action, flatten_time_step
+
+
 def fast_map_structure_flatten(func, structure, *flat_structure):
   entries = zip(*flat_structure)
   return nest.pack_sequence_as(structure, [func(*x) for x in entries])
@@ -175,6 +529,14 @@ class ProcessPyEnvironment(object):
   _RESULT = 4
   _EXCEPTION = 5
   _CLOSE = 6
+  _ATTACH = 7
+  _SHARED_CALL = 8
+  _STEP = 9
+  _RESET = 10
+  _ACCESS_MANY = 11
+
+  # Specs sent by the worker along with the ready message.
+  _SPEC_NAMES = ('observation_spec', 'action_spec', 'time_step_spec')
 
   def __init__(self, env_constructor, flatten=False):
     """Step environment in a separate process for lock free paralellism.
@@ -213,7 +575,16 @@ class ProcessPyEnvironment(object):
       self._conn.close()
       self._process.join(5)
       raise result
-    assert result is self._READY, result
+    message, specs = result
+    assert message == self._READY, result
+    self._observation_spec = specs.get('observation_spec')
+    self._action_spec = specs.get('action_spec')
+    self._time_step_spec = specs.get('time_step_spec')
+
+  @property
+  def connection(self):
+    """The pipe connection to the external process."""
+    return self._conn
 
   def observation_spec(self):
     if not self._observation_spec:
@@ -245,6 +616,18 @@ class ProcessPyEnvironment(object):
     self._conn.send((self._ACCESS, name))
     return self._receive()
 
+  def access(self, *names):
+    """Request several attributes from the environment in one round-trip.
+
+    Args:
+      *names: Attributes to access.
+
+    Returns:
+      Tuple with the values of the attributes.
+    """
+    self._conn.send((self._ACCESS_MANY, names))
+    return self._receive()
+
   def call(self, name, *args, **kwargs):
     """Asynchronously call a method of the external environment.
 
@@ -260,6 +643,36 @@ class ProcessPyEnvironment(object):
     self._conn.send((self._CALL, payload))
     return self._receive
 
+  def attach_shared_memory(self, action_infos, time_step_infos, index):
+    """Makes the worker exchange actions and time_steps via shared memory.
+
+    Args:
+      action_infos: List of (path, dtype, shape) describing the shared arrays
+        of batched actions, one per flattened action spec.
+      time_step_infos: List of (path, dtype, shape) describing the shared
+        arrays of time_steps, of shape [num_slots, batch_size, ...].
+      index: Row of this environment in the shared batch, or slice of rows if
+        the external process hosts several environments.
+    """
+    self._conn.send((self._ATTACH, (action_infos, time_step_infos, index)))
+    self._receive()
+
+  def call_shared(self, name, slot):
+    """Asynchronously call `step` or `reset` in shared memory mode.
+
+    The action is read from the shared action arrays and the resulting
+    time_step is written to the given slot of the shared time_step arrays.
+
+    Args:
+      name: Either 'step' or 'reset'.
+      slot: Index of the shared time_step buffer to write to.
+
+    Returns:
+      Promise object that blocks until the time_step has been written.
+    """
+    self._conn.send((self._SHARED_CALL, (name, slot)))
+    return self._receive
+
   def close(self):
     """Send a close message to the external process and join it."""
     try:
@@ -280,7 +693,8 @@ class ProcessPyEnvironment(object):
     Returns:
       time step when blocking, otherwise callable that returns the time step.
     """
-    promise = self.call('step', action)
+    self._conn.send((self._STEP, action))
+    promise = self._receive
     if blocking:
       return promise()
     else:
@@ -296,7 +710,8 @@ class ProcessPyEnvironment(object):
       New observation when blocking, otherwise callable that returns the new
       observation.
     """
-    promise = self.call('reset')
+    self._conn.send((self._RESET, None))
+    promise = self._receive
     if blocking:
       return promise()
     else:
@@ -336,30 +751,68 @@ class ProcessPyEnvironment(object):
     """
     try:
       env = env_constructor()
-      action_spec = env.action_spec()
-      conn.send(self._READY)  # Ready.
+      specs = {name: getattr(env, name)() for name in self._SPEC_NAMES
+               if hasattr(env, name)}
+      pack_action, flatten_time_step = _flat_converters(
+          specs['action_spec'], specs.get('observation_spec'))
+      shared_actions = None
+      shared_time_steps = None
+      shared_index = None
+      conn.send((self._READY, specs))  # Ready.
       while True:
         try:
-          # Only block for short times to have keyboard exceptions be raised.
-          if not conn.poll(0.1):
-            continue
+          # Block until the next message; keyboard interrupts and a closed
+          # pipe still end the loop.
           message, payload = conn.recv()
         except (EOFError, KeyboardInterrupt):
           break
+        if message == self._STEP:
+          action = pack_action(payload) if flatten else payload
+          result = env.step(action)
+          conn.send((self._RESULT,
+                     flatten_time_step(result) if flatten else result))
+          continue
+        if message == self._RESET:
+          result = env.reset()
+          conn.send((self._RESULT,
+                     flatten_time_step(result) if flatten else result))
+          continue
         if message == self._ACCESS:
           name = payload
           result = getattr(env, name)
           conn.send((self._RESULT, result))
           continue
+        if message == self._ACCESS_MANY:
+          result = tuple(getattr(env, name) for name in payload)
+          conn.send((self._RESULT, result))
+          continue
         if message == self._CALL:
           name, args, kwargs = payload
           if flatten and name == 'step':
-            args = [nest.pack_sequence_as(action_spec, args[0])]
+            args = [pack_action(args[0])]
           result = getattr(env, name)(*args, **kwargs)
           if flatten and name in ['step', 'reset']:
-            result = nest.flatten(result)
+            result = flatten_time_step(result)
           conn.send((self._RESULT, result))
           continue
+        if message == self._SHARED_CALL:
+          name, slot = payload
+          if name == 'step':
+            action = pack_action(
+                [np.copy(array[shared_index]) for array in shared_actions])
+            time_step = env.step(action)
+          else:
+            time_step = env.reset()
+          for array, value in zip(shared_time_steps, nest.flatten(time_step)):
+            array[slot, shared_index] = value
+          conn.send((self._RESULT, None))
+          continue
+        if message == self._ATTACH:
+          action_infos, time_step_infos, shared_index = payload
+          shared_actions = _attach_shared_arrays(action_infos)
+          shared_time_steps = _attach_shared_arrays(time_step_infos)
+          conn.send((self._RESULT, None))
+          continue
         if message == self._CLOSE:
           assert payload is None
           break
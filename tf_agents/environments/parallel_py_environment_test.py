@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import collections
 import functools
+import time
 
 import numpy as np
 import tensorflow as tf
@@ -33,7 +34,9 @@ from tf_agents.specs import array_spec
 
 class ParallelPyEnvironmentTest(tf.test.TestCase):
 
-  def _make_parallel_py_environment(self, constructor=None, num_envs=2):
+  def _make_parallel_py_environment(self, constructor=None, num_envs=2,
+                                    shared_memory=False, envs_per_worker=1,
+                                    flatten=False):
     self.observation_spec = array_spec.ArraySpec((3, 3), np.float32)
     self.time_step_spec = ts.time_step_spec(self.observation_spec)
     self.action_spec = array_spec.BoundedArraySpec(
@@ -43,7 +46,9 @@ class ParallelPyEnvironmentTest(tf.test.TestCase):
         self.observation_spec,
         self.action_spec)
     return parallel_py_environment.ParallelPyEnvironment(
-        env_constructors=[constructor] * num_envs, blocking=True)
+        env_constructors=[constructor] * num_envs, blocking=True,
+        flatten=flatten, shared_memory=shared_memory,
+        envs_per_worker=envs_per_worker)
 
   def test_close_no_hang_after_init(self):
     env = self._make_parallel_py_environment()
@@ -80,6 +85,76 @@ class ParallelPyEnvironmentTest(tf.test.TestCase):
                         time_step2.observation.shape)
     env.close()
 
+  def test_step_shared_memory(self):
+    num_envs = 3
+    env = self._make_parallel_py_environment(num_envs=num_envs)
+    shared_env = self._make_parallel_py_environment(num_envs=num_envs,
+                                                    shared_memory=True)
+    rng = np.random.RandomState()
+    action = np.array([array_spec.sample_bounded_spec(env.action_spec(), rng)
+                       for _ in range(num_envs)])
+
+    # Both environments are seeded the same way and must return the same data.
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllEqual, env.reset(), shared_env.reset())
+    time_step = env.step(action)
+    shared_time_step = shared_env.step(action)
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllEqual, time_step, shared_time_step)
+    self.assertEqual((num_envs, 3, 3), shared_time_step.observation.shape)
+
+    # The previous time_step is still valid after the next step.
+    expected_observation = np.copy(shared_time_step.observation)
+    shared_env.step(action)
+    self.assertAllEqual(expected_observation, shared_time_step.observation)
+    env.close()
+    shared_env.close()
+
+  def test_step_envs_per_worker(self):
+    num_envs = 5
+    env = self._make_parallel_py_environment(num_envs=num_envs)
+    multi_envs = [
+        self._make_parallel_py_environment(num_envs=num_envs,
+                                           envs_per_worker=2),
+        self._make_parallel_py_environment(num_envs=num_envs,
+                                           shared_memory=True,
+                                           envs_per_worker=2)]
+    rng = np.random.RandomState()
+    action = np.array([array_spec.sample_bounded_spec(env.action_spec(), rng)
+                       for _ in range(num_envs)])
+
+    # Workers hosting several environments must return the same batch.
+    time_steps = [env.reset(), env.step(action), env.step(action)]
+    for multi_env in multi_envs:
+      self.assertEqual(num_envs, multi_env.batch_size)
+      for i, time_step in enumerate(time_steps):
+        multi_time_step = multi_env.step(action) if i else multi_env.reset()
+        tf.contrib.framework.nest.map_structure(
+            self.assertAllEqual, time_step, multi_time_step)
+      multi_env.close()
+    env.close()
+
+  def test_step_flatten(self):
+    num_envs = 2
+    env = self._make_parallel_py_environment(num_envs=num_envs)
+    flat_env = self._make_parallel_py_environment(num_envs=num_envs,
+                                                  flatten=True)
+    rng = np.random.RandomState()
+    action = np.array([array_spec.sample_bounded_spec(env.action_spec(), rng)
+                       for _ in range(num_envs)])
+
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllEqual, env.reset(), flat_env.reset())
+    for _ in range(3):
+      tf.contrib.framework.nest.map_structure(
+          self.assertAllEqual, env.step(action), flat_env.step(action))
+    env.close()
+    flat_env.close()
+
+  def test_envs_per_worker_raises_if_invalid(self):
+    with self.assertRaises(ValueError):
+      self._make_parallel_py_environment(envs_per_worker=0)
+
   def test_unstack_actions(self):
     num_envs = 2
     env = self._make_parallel_py_environment(num_envs=num_envs)
@@ -117,6 +192,60 @@ class ParallelPyEnvironmentTest(tf.test.TestCase):
     env.close()
 
 
+class AsyncParallelPyEnvironmentTest(tf.test.TestCase):
+
+  def _make_async_parallel_py_environment(self, num_envs=3, batch_size=2):
+    observation_spec = array_spec.ArraySpec((3, 3), np.float32)
+    self.action_spec = array_spec.BoundedArraySpec(
+        [7], dtype=np.float32, minimum=-1.0, maximum=1.0)
+    constructor = functools.partial(
+        random_py_environment.RandomPyEnvironment,
+        observation_spec,
+        self.action_spec)
+    return parallel_py_environment.AsyncParallelPyEnvironment(
+        env_constructors=[constructor] * num_envs, batch_size=batch_size)
+
+  def _sample_actions(self, batch_size):
+    rng = np.random.RandomState()
+    return np.array([array_spec.sample_bounded_spec(self.action_spec, rng)
+                     for _ in range(batch_size)])
+
+  def test_reset_returns_partial_batch(self):
+    env = self._make_async_parallel_py_environment(num_envs=3, batch_size=2)
+    time_step = env.reset()
+    self.assertEqual(2, env.batch_size)
+    self.assertEqual((2, 3, 3), time_step.observation.shape)
+    env_ids = env.current_env_ids()
+    self.assertEqual((2,), env_ids.shape)
+    self.assertEqual(2, len(set(env_ids)))
+    env.close()
+
+  def test_step_uses_ready_environments(self):
+    env = self._make_async_parallel_py_environment(num_envs=3, batch_size=2)
+    env.reset()
+    seen_env_ids = set(env.current_env_ids())
+    for _ in range(5):
+      time_step = env.step(self._sample_actions(2))
+      self.assertEqual((2, 3, 3), time_step.observation.shape)
+      seen_env_ids.update(env.current_env_ids())
+    self.assertEqual({0, 1, 2}, seen_env_ids)
+    env.close()
+
+  def test_send_recv(self):
+    env = self._make_async_parallel_py_environment(num_envs=3, batch_size=3)
+    env.async_reset()
+    env.recv()
+    env.send(self._sample_actions(2), env_ids=[2, 0])
+    with self.assertRaises(ValueError):
+      env.send(self._sample_actions(1), env_ids=[2])
+    with self.assertRaises(RuntimeError):
+      env.recv()
+    env.send(self._sample_actions(1), env_ids=[1])
+    env.recv()
+    self.assertEqual({0, 1, 2}, set(env.current_env_ids()))
+    env.close()
+
+
 class ProcessPyEnvironmentTest(tf.test.TestCase):
 
   def test_close_no_hang_after_init(self):
@@ -144,6 +273,31 @@ class ProcessPyEnvironmentTest(tf.test.TestCase):
     env.step(array_spec.sample_bounded_spec(action_spec, rng))
     env.close()
 
+  def test_specs_are_fetched_at_start(self):
+    observation_spec = array_spec.ArraySpec((3, 3), np.float32)
+    action_spec = array_spec.BoundedArraySpec(
+        [1], np.float32, minimum=-1.0, maximum=1.0)
+    constructor = functools.partial(
+        random_py_environment.RandomPyEnvironment, observation_spec,
+        action_spec)
+    env = parallel_py_environment.ProcessPyEnvironment(constructor)
+    env.start()
+    # Close the pipe to make sure the specs don't need a round-trip.
+    env.close()
+    self.assertEqual(observation_spec, env.observation_spec())
+    self.assertEqual(action_spec, env.action_spec())
+    self.assertEqual(ts.time_step_spec(observation_spec), env.time_step_spec())
+
+  def test_access(self):
+    constructor = functools.partial(
+        random_py_environment.RandomPyEnvironment,
+        array_spec.ArraySpec((3, 3), np.float32),
+        array_spec.BoundedArraySpec([1], np.float32, minimum=-1.0, maximum=1.0))
+    env = parallel_py_environment.ProcessPyEnvironment(constructor)
+    env.start()
+    self.assertEqual((False, None), env.access('batched', 'batch_size'))
+    env.close()
+
   def test_reraise_exception_in_init(self):
     constructor = MockEnvironmentCrashInInit
     env = parallel_py_environment.ProcessPyEnvironment(constructor)
@@ -171,6 +325,34 @@ class ProcessPyEnvironmentTest(tf.test.TestCase):
       env.step(array_spec.sample_bounded_spec(action_spec, rng))
 
 
+class ParallelPyEnvironmentBenchmark(tf.test.Benchmark):
+
+  def benchmark_step_latency(self):
+    observation_spec = array_spec.ArraySpec((3, 3), np.float32)
+    action_spec = array_spec.BoundedArraySpec(
+        [7], np.float32, minimum=-1.0, maximum=1.0)
+    constructor = functools.partial(
+        random_py_environment.RandomPyEnvironment, observation_spec,
+        action_spec, episode_end_probability=0.0)
+    num_steps = 1000
+    for batch_size in [1, 4, 16, 64]:
+      for flatten in [False, True]:
+        env = parallel_py_environment.ParallelPyEnvironment(
+            [constructor] * batch_size, flatten=flatten)
+        actions = array_spec.sample_spec_nest(
+            action_spec, np.random.RandomState(), outer_dims=(batch_size,))
+        env.reset()
+        start_time = time.time()
+        for _ in range(num_steps):
+          env.step(actions)
+        wall_time = (time.time() - start_time) / num_steps
+        env.close()
+        self.report_benchmark(
+            iters=num_steps, wall_time=wall_time,
+            name='parallel_py_environment_step_bs_%d%s' % (
+                batch_size, '_flatten' if flatten else ''))
+
+
 class MockEnvironmentCrashInInit(object):
   """Raise an error when instantiated."""
 
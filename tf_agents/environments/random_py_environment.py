@@ -23,6 +23,7 @@ import tensorflow as tf
 
 from tf_agents.environments import py_environment
 from tf_agents.environments import time_step as ts
+from tf_agents.environments import vectorized_py_environment
 from tf_agents.specs import array_spec
 
 nest = tf.contrib.framework.nest
@@ -171,3 +172,85 @@ class RandomPyEnvironment(py_environment.Base):
           format(mode))
 
     return self._rng.randint(0, 256, size=self._render_size, dtype=np.uint8)
+
+
+class VectorizedRandomPyEnvironment(
+    vectorized_py_environment.VectorizedPyEnvironment):
+  """Vectorized version of `RandomPyEnvironment`.
+
+  Samples the observations of the whole batch at once, and ends the episode of
+  each batch element independently with `episode_end_probability`.
+  """
+
+  def __init__(self,
+               observation_spec,
+               action_spec=None,
+               batch_size=1,
+               episode_end_probability=0.1,
+               discount=1.0,
+               reward_fn=None,
+               seed=42,
+               min_duration=0,
+               max_duration=None):
+    """Initializes the environment.
+
+    Args:
+      observation_spec: An `ArraySpec`, or a nested dict, list or tuple of
+        `ArraySpec`s.
+      action_spec: An `ArraySpec`, or a nested dict, list or tuple of
+        `ArraySpec`s.
+      batch_size: Number of observations generated per call.
+      episode_end_probability: Probability an episode will end when the
+        environment is stepped.
+      discount: Discount to set in time_steps.
+      reward_fn: Callable that takes in step_type, action, an observation(s),
+        and returns a numpy array of rewards of shape [batch_size].
+      seed: Seed to use for rng used in observation generation.
+      min_duration: Number of steps at the beginning of the
+        episode during which the episode can not terminate.
+      max_duration: Optional number of steps after which the episode
+        terminates regarless of the termination probability.
+    """
+    super(VectorizedRandomPyEnvironment, self).__init__(
+        batch_size, discount=discount)
+    self._observation_spec = observation_spec
+    self._action_spec = action_spec or []
+    self._episode_end_probability = episode_end_probability
+    self._reward_fn = reward_fn
+    self._min_duration = min_duration
+    self._max_duration = max_duration
+    self._steps = np.zeros(batch_size, dtype=np.int64)
+    self._rng = np.random.RandomState(seed)
+
+  def _get_observation(self, size):
+    return array_spec.sample_spec_nest(self._observation_spec, self._rng,
+                                       (size,))
+
+  def _reset_batch(self, indices):
+    self._steps[indices] = 0
+    return self._get_observation(len(indices))
+
+  def _step_batch(self, actions):
+    if self._action_spec:
+      nest.assert_same_structure(self._action_spec, actions)
+
+    self._steps += 1
+    observation = self._get_observation(self.batch_size)
+    done = self._rng.uniform(size=self.batch_size) < (
+        self._episode_end_probability)
+    done &= self._steps >= self._min_duration
+    if self._max_duration:
+      done |= self._steps >= self._max_duration
+
+    if self._reward_fn is None:
+      reward = np.zeros(self.batch_size, dtype=np.float32)
+    else:
+      step_type = np.where(done, ts.StepType.LAST, ts.StepType.MID)
+      reward = self._reward_fn(step_type, actions, observation)
+    return observation, reward, done
+
+  def observation_spec(self):
+    return self._observation_spec
+
+  def action_spec(self):
+    return self._action_spec
@@ -172,5 +172,50 @@ class RandomPyEnvironmentTest(parameterized.TestCase, absltest.TestCase):
       env.step([0])
 
 
+class VectorizedRandomPyEnvironmentTest(absltest.TestCase):
+
+  def testEnvResetAutomatically(self):
+    obs_spec = array_spec.BoundedArraySpec((2, 3), np.int32, -10, 10)
+    env = random_py_environment.VectorizedRandomPyEnvironment(
+        obs_spec, batch_size=4, episode_end_probability=0.5)
+
+    time_step = env.step(np.zeros(4))
+    self.assertEqual((4, 2, 3), time_step.observation.shape)
+    self.assertTrue(np.all(time_step.is_first()))
+
+    for _ in range(20):
+      was_last = time_step.is_last()
+      time_step = env.step(np.zeros(4))
+      self.assertTrue(np.all(time_step.observation >= -10))
+      self.assertTrue(np.all(time_step.observation <= 10))
+      np.testing.assert_array_equal(was_last, time_step.is_first())
+      np.testing.assert_array_equal(time_step.is_last(),
+                                    time_step.discount == 0)
+
+  def testEnvMinAndMaxDuration(self):
+    obs_spec = array_spec.BoundedArraySpec((2, 3), np.int32, -10, 10)
+    env = random_py_environment.VectorizedRandomPyEnvironment(
+        obs_spec, batch_size=8, episode_end_probability=0.9, min_duration=2,
+        max_duration=4)
+    env.reset()
+    num_steps = np.zeros(8)
+    for _ in range(100):
+      time_step = env.step(np.zeros(8))
+      num_steps = np.where(time_step.is_first(), 0, num_steps + 1)
+      last_num_steps = num_steps[time_step.is_last()]
+      self.assertTrue(np.all(last_num_steps >= 2))
+      self.assertTrue(np.all(last_num_steps <= 4))
+
+  def testRewardFn(self):
+    obs_spec = array_spec.BoundedArraySpec((2, 3), np.int32, -10, 10)
+    env = random_py_environment.VectorizedRandomPyEnvironment(
+        obs_spec, batch_size=3, episode_end_probability=0.0,
+        reward_fn=lambda _, action, unused_obs: action * 2.0)
+    env.reset()
+    time_step = env.step(np.array([1, 2, 3]))
+    np.testing.assert_array_equal([2., 4., 6.], time_step.reward)
+    self.assertEqual(np.float32, time_step.reward.dtype)
+
+
 if __name__ == '__main__':
   absltest.main()
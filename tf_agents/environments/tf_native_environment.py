@@ -0,0 +1,183 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Base class for environments implemented entirely with TensorFlow ops.
+
+Unlike `TFPyEnvironment`, which wraps a Python environment with `tf.py_func`,
+a `TFNativeEnvironment` keeps the state of every batch element in variables and
+steps all of them with a few vectorized ops. Drivers can then collect
+experience fully in-graph, without returning to Python at every step.
+
+Subclasses implement the dynamics of a single task:
+
+  * `_reset_state(batch_size)` samples initial states.
+  * `_observe(state)` returns the observations of a state.
+  * `_transition(state, action)` returns the next state, the rewards and
+    whether the episodes terminated.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+import six
+import tensorflow as tf
+
+from tf_agents.environments import tf_environment
+from tf_agents.environments import time_step as ts
+
+nest = tf.contrib.framework.nest
+
+
+@six.add_metaclass(abc.ABCMeta)
+class TFNativeEnvironment(tf_environment.Base):
+  """Environment whose batched dynamics are computed with TensorFlow ops.
+
+  Each batch element restarts independently: stepping an element whose last
+  time_step was `LAST` ignores its action and returns a `FIRST` time_step from a
+  fresh initial state, as `BatchedPyEnvironment` does for Python environments.
+  Episodes that reach `max_episode_steps` end with a `LAST` time_step that keeps
+  a discount of 1.
+
+  The environment starts from initial states when its variables are
+  initialized, so `current_time_step()` is valid without a prior `reset()`.
+  """
+
+  def __init__(self, observation_spec, action_spec, batch_size=1,
+               max_episode_steps=None, scope='tf_native_environment'):
+    """Creates the state variables of the environment.
+
+    Args:
+      observation_spec: A nest of TensorSpec of a single observation.
+      action_spec: A nest of BoundedTensorSpec of a single action.
+      batch_size: Number of environments stepped together.
+      max_episode_steps: Optional maximum number of steps per episode.
+      scope: Variable scope for the state variables.
+    """
+    super(TFNativeEnvironment, self).__init__(
+        ts.time_step_spec(observation_spec), action_spec, batch_size)
+    self._max_episode_steps = max_episode_steps
+    with tf.variable_scope(None, default_name=scope):
+      initial_state = self._reset_state(batch_size)
+      self._state = nest.pack_sequence_as(initial_state, [
+          self._create_variable('state_%d' % i, t)
+          for i, t in enumerate(nest.flatten(initial_state))
+      ])
+      self._step_type = self._create_variable(
+          'step_type', tf.fill([batch_size], ts.StepType.FIRST))
+      self._reward = self._create_variable(
+          'reward', tf.zeros([batch_size], tf.float32))
+      self._discount = self._create_variable(
+          'discount', tf.ones([batch_size], tf.float32))
+      self._episode_steps = self._create_variable(
+          'episode_steps', tf.zeros([batch_size], tf.int64))
+
+  def _create_variable(self, name, initial_value):
+    return tf.get_variable(
+        name=name,
+        initializer=initial_value,
+        use_resource=True,
+        trainable=False)
+
+  @abc.abstractmethod
+  def _reset_state(self, batch_size):
+    """Returns a nest of initial state Tensors with outer dim [batch_size]."""
+
+  @abc.abstractmethod
+  def _observe(self, state):
+    """Returns the nest of observations of a batched state."""
+
+  @abc.abstractmethod
+  def _transition(self, state, action):
+    """Applies a batch of actions.
+
+    Args:
+      state: A nest of state Tensors with outer dim [batch_size].
+      action: A nest of action Tensors with outer dim [batch_size].
+
+    Returns:
+      A tuple `(next_state, reward, terminated)` where `reward` is a float32
+      Tensor and `terminated` a bool Tensor, both of shape [batch_size].
+    """
+
+  def current_time_step(self):
+    with tf.name_scope('current_time_step'):
+      return self._time_step(
+          nest.map_structure(lambda v: v.read_value(), self._state),
+          self._step_type.read_value(), self._reward.read_value(),
+          self._discount.read_value())
+
+  def reset(self):
+    with tf.name_scope('reset'):
+      state = self._reset_state(self.batch_size)
+      step_type = tf.fill([self.batch_size], ts.StepType.FIRST)
+      reward = tf.zeros([self.batch_size], tf.float32)
+      discount = tf.ones([self.batch_size], tf.float32)
+      episode_steps = tf.zeros([self.batch_size], tf.int64)
+      return self._assign(state, step_type, reward, discount, episode_steps)
+
+  def step(self, action):
+    with tf.name_scope('step', values=nest.flatten(action)):
+      # Reading after the action is computed orders consecutive steps.
+      with tf.control_dependencies(nest.flatten(action)):
+        state = nest.map_structure(lambda v: v.read_value(), self._state)
+        step_type = self._step_type.read_value()
+        episode_steps = self._episode_steps.read_value()
+
+      next_state, reward, terminated = self._transition(state, action)
+      episode_steps += 1
+      last = terminated
+      if self._max_episode_steps is not None:
+        last |= episode_steps >= self._max_episode_steps
+      next_step_type = tf.where(
+          last,
+          tf.fill([self.batch_size], ts.StepType.LAST),
+          tf.fill([self.batch_size], ts.StepType.MID))
+      discount = 1.0 - tf.to_float(terminated)
+
+      # Restart the environments whose previous time_step was LAST.
+      restart = tf.equal(step_type, ts.StepType.LAST)
+      reset_state = self._reset_state(self.batch_size)
+      next_state = nest.map_structure(
+          lambda r, n: tf.where(restart, r, n), reset_state, next_state)
+      next_step_type = tf.where(
+          restart, tf.fill([self.batch_size], ts.StepType.FIRST),
+          next_step_type)
+      reward = tf.where(restart, tf.zeros_like(reward), reward)
+      discount = tf.where(restart, tf.ones_like(discount), discount)
+      episode_steps = tf.where(restart, tf.zeros_like(episode_steps),
+                               episode_steps)
+      return self._assign(next_state, next_step_type, reward, discount,
+                          episode_steps)
+
+  def _assign(self, state, step_type, reward, discount, episode_steps):
+    """Stores the new time_step and returns it once stored."""
+    assign_ops = [
+        v.assign(t) for v, t in zip(nest.flatten(self._state),
+                                    nest.flatten(state))
+    ]
+    assign_ops.extend([
+        self._step_type.assign(step_type),
+        self._reward.assign(reward),
+        self._discount.assign(discount),
+        self._episode_steps.assign(episode_steps)])
+    with tf.control_dependencies(assign_ops):
+      state, step_type, reward, discount = nest.map_structure(
+          tf.identity, (state, step_type, reward, discount))
+    return self._time_step(state, step_type, reward, discount)
+
+  def _time_step(self, state, step_type, reward, discount):
+    return ts.TimeStep(step_type, reward, discount, self._observe(state))
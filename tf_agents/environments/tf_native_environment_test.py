@@ -0,0 +1,103 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.environments.tf_native_environment."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.environments import tf_native_environment
+from tf_agents.environments import time_step as ts
+from tf_agents.specs import tensor_spec
+
+
+class CountingEnvironment(tf_native_environment.TFNativeEnvironment):
+  """Observes the sum of actions taken, terminates once it reaches 3."""
+
+  def __init__(self, batch_size=1, max_episode_steps=None):
+    super(CountingEnvironment, self).__init__(
+        tensor_spec.TensorSpec([], tf.int64, name='observation'),
+        tensor_spec.BoundedTensorSpec(
+            [], tf.int64, minimum=0, maximum=3, name='action'),
+        batch_size=batch_size,
+        max_episode_steps=max_episode_steps)
+
+  def _reset_state(self, batch_size):
+    return tf.zeros([batch_size], tf.int64)
+
+  def _observe(self, state):
+    return state
+
+  def _transition(self, state, action):
+    next_state = state + action
+    return next_state, tf.to_float(action), next_state >= 3
+
+
+class TFNativeEnvironmentTest(tf.test.TestCase):
+
+  def testCurrentTimeStepIsFirst(self):
+    env = CountingEnvironment(batch_size=2)
+    self.evaluate(tf.global_variables_initializer())
+    time_step = self.evaluate(env.current_time_step())
+    self.assertAllEqual([ts.StepType.FIRST] * 2, time_step.step_type)
+    self.assertAllEqual([0, 0], time_step.observation)
+    self.assertAllEqual([1., 1.], time_step.discount)
+
+  def testStepRestartsEachEnvironmentIndependently(self):
+    env = CountingEnvironment(batch_size=2)
+    action = tf.placeholder(tf.int64, [2])
+    step = env.step(action)
+    self.evaluate(tf.global_variables_initializer())
+
+    with self.session() as session:
+      time_step = session.run(step, feed_dict={action: [1, 3]})
+      self.assertAllEqual([ts.StepType.MID, ts.StepType.LAST],
+                          time_step.step_type)
+      self.assertAllEqual([1, 3], time_step.observation)
+      self.assertAllEqual([1., 3.], time_step.reward)
+      self.assertAllEqual([1., 0.], time_step.discount)
+
+      time_step = session.run(step, feed_dict={action: [2, 2]})
+      self.assertAllEqual([ts.StepType.LAST, ts.StepType.FIRST],
+                          time_step.step_type)
+      self.assertAllEqual([3, 0], time_step.observation)
+      self.assertAllEqual([2., 0.], time_step.reward)
+      self.assertAllEqual([0., 1.], time_step.discount)
+
+  def testMaxEpisodeSteps(self):
+    env = CountingEnvironment(max_episode_steps=2)
+    step = env.step(tf.constant([0], tf.int64))
+    self.evaluate(tf.global_variables_initializer())
+    step_types = [self.evaluate(step).step_type[0] for _ in range(3)]
+    self.assertAllEqual(
+        [ts.StepType.MID, ts.StepType.LAST, ts.StepType.FIRST], step_types)
+    self.assertAllEqual([1.], self.evaluate(env.current_time_step().discount))
+
+  def testReset(self):
+    env = CountingEnvironment()
+    step = env.step(tf.constant([2], tf.int64))
+    reset = env.reset()
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(step)
+    time_step = self.evaluate(reset)
+    self.assertAllEqual([ts.StepType.FIRST], time_step.step_type)
+    self.assertAllEqual([0], time_step.observation)
+
+
+if __name__ == '__main__':
+  tf.test.main()
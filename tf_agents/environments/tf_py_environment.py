@@ -22,13 +22,16 @@ from __future__ import print_function
 import contextlib
 import threading
 
+import numpy as np
 import tensorflow as tf
 
 from tf_agents.environments import batched_py_environment
 from tf_agents.environments import py_environment
 from tf_agents.environments import tf_environment
 from tf_agents.environments import time_step as ts
+from tf_agents.environments import trajectory
 from tf_agents.specs import tensor_spec
+from tf_agents.utils import nest_utils
 
 import tensorflow.contrib.eager as tfe  # TF internal
 
@@ -48,6 +51,21 @@ def _check_not_called_concurrently(lock):
     lock.release()
 
 
+def _reset_first_rows(policy_state, initial_policy_state, is_first):
+  """Resets the policy state of the rows starting a new episode."""
+  is_first = np.asarray(is_first)
+  if not np.any(is_first):
+    return policy_state
+
+  def _reset(state, initial_state):
+    state = np.asarray(state)
+    mask = np.reshape(is_first, is_first.shape + (1,) * (
+        state.ndim - is_first.ndim))
+    return np.where(mask, initial_state, state)
+
+  return nest.map_structure(_reset, policy_state, initial_policy_state)
+
+
 class TFPyEnvironment(tf_environment.Base):
   """Exposes a Python environment as an in-graph TF environment.
 
@@ -92,8 +110,13 @@ class TFPyEnvironment(tf_environment.Base):
     self._time_step_dtypes = [
         s.dtype for s in nest.flatten(self.time_step_spec())
     ]
+    # Flattens time_steps and packs actions in the py_func calls.
+    self._time_step_nest = nest_utils.CompiledNest(self.time_step_spec())
+    self._action_nest = nest_utils.CompiledNest(self.action_spec())
 
     self._time_step = None
+    # Policy states kept by the rollout ops, cleared by reset().
+    self._rollout_policy_states = []
     self._lock = threading.Lock()
 
   @property
@@ -101,6 +124,17 @@ class TFPyEnvironment(tf_environment.Base):
     """Returns the underlying Python environment."""
     return self._env
 
+  @property
+  def provides_env_ids(self):
+    """Whether each batch comes from a varying subset of environments.
+
+    True for Python environments with `current_env_ids()`, e.g.
+    `AsyncParallelPyEnvironment`. The ids of the environments in a batch are
+    then available from `current_time_step_with_env_ids()` and
+    `step_with_env_ids()`.
+    """
+    return hasattr(self._env, 'current_env_ids')
+
   def current_time_step(self):
     """Returns the current ts.TimeStep.
 
@@ -113,24 +147,41 @@ class TFPyEnvironment(tf_environment.Base):
         observation: A Tensor, or a nested dict, list or tuple of Tensors
           corresponding to `observation_spec()`.
     """
+    return self._current_time_step(with_env_ids=False)
+
+  def current_time_step_with_env_ids(self):
+    """Returns the current ts.TimeStep and the ids of its environments.
+
+    The ids are returned by the same `tf.py_func` as the time_step, so they
+    always refer to its rows.
+
+    Returns:
+      A tuple (time_step, env_ids), with time_step as in `current_time_step()`
+      and env_ids an int32 Tensor of shape [batch_size].
+
+    Raises:
+      ValueError: If the Python environment does not provide env ids.
+    """
+    return self._current_time_step(with_env_ids=True)
+
+  def _current_time_step(self, with_env_ids):
+    """Returns the current time_step, and its env ids if with_env_ids."""
+    self._check_env_ids_provided(with_env_ids)
 
     def _current_time_step():
       with _check_not_called_concurrently(self._lock):
         if self._time_step is None:
           self._time_step = self._env.reset()
-        return nest.flatten(self._time_step)
+        return self._flatten_time_step(with_env_ids)
 
     with tf.name_scope('current_time_step'):
       outputs = tf.py_func(
           _current_time_step,
           [],  # No inputs.
-          self._time_step_dtypes,
+          self._output_dtypes(with_env_ids),
           stateful=True,
           name='current_time_step_py_func')
-      step_type, reward, discount = outputs[0:3]
-      flat_observations = outputs[3:]
-      return self._set_names_and_shapes(step_type, reward, discount,
-                                        *flat_observations)
+      return self._pack_outputs(outputs, with_env_ids)
 
   def reset(self):
     """Returns the current `TimeStep` after resetting the environment.
@@ -148,6 +199,8 @@ class TFPyEnvironment(tf_environment.Base):
     def _reset():
       with _check_not_called_concurrently(self._lock):
         self._time_step = self._env.reset()
+        for policy_state in self._rollout_policy_states:
+          del policy_state[:]
 
     with tf.name_scope('reset'):
       reset_op = tf.py_func(
@@ -179,13 +232,38 @@ class TFPyEnvironment(tf_environment.Base):
       ValueError: If any of the actions are scalars or their major axis is known
       and is not equal to `self.batch_size`.
     """
+    return self._step(actions, with_env_ids=False)
+
+  def step_with_env_ids(self, actions):
+    """Returns a TensorFlow op to step the environment and its env ids.
+
+    The ids are returned by the same `tf.py_func` that steps the environment,
+    so they always refer to the rows of the returned time_step.
+
+    Args:
+      actions: A Tensor, or a nested dict, list or tuple of Tensors
+        corresponding to `action_spec()`, for the environments of the previous
+        time_step.
+
+    Returns:
+      A tuple (time_step, env_ids), with time_step as in `step()` and env_ids
+      an int32 Tensor of shape [batch_size].
+
+    Raises:
+      ValueError: If the Python environment does not provide env ids, or as in
+        `step()`.
+    """
+    return self._step(actions, with_env_ids=True)
+
+  def _step(self, actions, with_env_ids):
+    """Returns the op stepping the environment, with env ids if with_env_ids."""
+    self._check_env_ids_provided(with_env_ids)
 
     def _step(*flattened_actions):
       with _check_not_called_concurrently(self._lock):
-        packed = nest.pack_sequence_as(
-            structure=self.action_spec(), flat_sequence=flattened_actions)
+        packed = self._action_nest.pack(flattened_actions)
         self._time_step = self._env.step(packed)
-        return nest.flatten(self._time_step)
+        return self._flatten_time_step(with_env_ids)
 
     with tf.name_scope('step', values=[actions]):
       flat_actions = [tf.identity(x) for x in nest.flatten(actions)]
@@ -200,14 +278,110 @@ class TFPyEnvironment(tf_environment.Base):
       outputs = tf.py_func(
           _step,
           flat_actions,
-          self._time_step_dtypes,
+          self._output_dtypes(with_env_ids),
           stateful=True,
           name='step_py_func')
-      step_type, reward, discount = outputs[0:3]
-      flat_observations = outputs[3:]
+      return self._pack_outputs(outputs, with_env_ids)
+
+  def _check_env_ids_provided(self, with_env_ids):
+    if with_env_ids and not self.provides_env_ids:
+      raise ValueError(
+          'The Python environment does not provide env ids: {}'.format(
+              self._env))
+
+  def _output_dtypes(self, with_env_ids):
+    """Returns the dtypes of the outputs of the time_step py_funcs."""
+    if with_env_ids:
+      return self._time_step_dtypes + [tf.int32]
+    return self._time_step_dtypes
+
+  def _flatten_time_step(self, with_env_ids):
+    """Flattens the last time_step, followed by its env ids if with_env_ids."""
+    flat_time_step = self._time_step_nest.flatten(self._time_step)
+    if with_env_ids:
+      flat_time_step.append(
+          np.asarray(self._env.current_env_ids(), dtype=np.int32))
+    return flat_time_step
+
+  def _pack_outputs(self, outputs, with_env_ids):
+    """Packs the outputs of a time_step py_func, see _flatten_time_step."""
+    if with_env_ids:
+      outputs, env_ids = outputs[:-1], outputs[-1]
+    step_type, reward, discount = outputs[0:3]
+    flat_observations = outputs[3:]
+    time_step = self._set_names_and_shapes(step_type, reward, discount,
+                                           *flat_observations)
+    if not with_env_ids:
+      return time_step
+    env_ids = tf.identity(env_ids, name='env_ids')
+    if not tfe.executing_eagerly():
+      env_ids.set_shape([self.batch_size])
+    return time_step, env_ids
+
+  def rollout(self, policy, num_steps):
+    """Returns a TensorFlow op that collects num_steps with a Python policy.
+
+    The environment and the policy are stepped num_steps times within a single
+    `tf.py_func` call, so that collecting from cheap environments is not
+    dominated by the cost of crossing between the graph and Python at every
+    step. The policy state is kept in Python between calls of the op, starting
+    from `policy.get_initial_state(batch_size)`. It is reset by `reset()`, and
+    the rows of environments starting a new episode are reset before each
+    step.
+
+    Args:
+      policy: A `py_policy.Base` whose `action()` receives the batched
+        time_steps of the environment.
+      num_steps: Number of steps to collect per call.
 
-      return self._set_names_and_shapes(step_type, reward, discount,
-                                        *flat_observations)
+    Returns:
+      A `Trajectory` of Tensors with outer dimensions [num_steps, batch_size]
+      following `policy.trajectory_spec()`. After the op has run,
+      `current_time_step()` returns the time_step following the last step.
+    """
+    trajectory_spec = policy.trajectory_spec()
+    trajectory_nest = nest_utils.CompiledNest(trajectory_spec)
+    flat_specs = trajectory_nest.flatten(trajectory_spec)
+    flat_dtypes = [tf.as_dtype(spec.dtype) for spec in flat_specs]
+    initial_policy_state = policy.get_initial_state(self.batch_size)
+    # Policy state of the previous call, in a list to be set by _rollout and
+    # cleared by reset().
+    policy_state = []
+    self._rollout_policy_states.append(policy_state)
+
+    def _rollout():
+      with _check_not_called_concurrently(self._lock):
+        if self._time_step is None:
+          self._time_step = self._env.reset()
+          del policy_state[:]
+        if not policy_state:
+          policy_state.append(nest.map_structure(np.copy, initial_policy_state))
+        # Each step is written in place into its row of the trajectories.
+        trajectories = nest_utils.BatchedArrayNest(
+            trajectory_spec, (num_steps, self.batch_size), trajectory_nest)
+        for t in range(num_steps):
+          policy_state[0] = _reset_first_rows(
+              policy_state[0], initial_policy_state,
+              self._time_step.is_first())
+          action_step = policy.action(self._time_step, policy_state[0])
+          next_time_step = self._env.step(action_step.action)
+          trajectories.write(t, trajectory.from_transition(
+              self._time_step, action_step, next_time_step))
+          self._time_step = next_time_step
+          policy_state[0] = action_step.state
+        return trajectories.flat_arrays
+
+    with tf.name_scope('rollout'):
+      outputs = tf.py_func(
+          _rollout,
+          [],  # No inputs.
+          flat_dtypes,
+          stateful=True,
+          name='rollout_py_func')
+      if not tfe.executing_eagerly():
+        for output, spec in zip(outputs, flat_specs):
+          output.set_shape([num_steps, self.batch_size] + list(spec.shape))
+      return nest.pack_sequence_as(trajectory_spec, outputs)
 
   def _set_names_and_shapes(self, step_type, reward, discount,
                             *flat_observations):
@@ -235,3 +409,76 @@ class TFPyEnvironment(tf_environment.Base):
                                          named_observations)
 
     return ts.TimeStep(step_type, reward, discount, observations)
+
+
+class PipelinedTFPyEnvironment(tf_environment.Base):
+  """Splits the batch of Python environments into two independently run halves.
+
+  Each half is a `TFPyEnvironment` with its own `tf.py_func` ops, so the ops
+  stepping one half do not depend on the ops stepping the other. Used with a
+  pipelined `DynamicStepDriver`, the policy computes the actions of one half
+  while the Python environments of the other half are stepped, overlapping
+  policy inference with environment stepping.
+
+  Used directly, it behaves like a `TFPyEnvironment` whose batch is the
+  concatenation of both halves.
+  """
+
+  def __init__(self, environments):
+    """Initializes a new `PipelinedTFPyEnvironment`.
+
+    Args:
+      environments: A pair of environments implementing `py_environment.Base`,
+        e.g. two `BatchedPyEnvironment`s or `ParallelPyEnvironment`s holding
+        half of the environments each. Both must have the same specs.
+
+    Raises:
+      ValueError: If `environments` is not a pair or the specs of both
+        environments differ.
+    """
+    if len(environments) != 2:
+      raise ValueError(
+          'Expected a pair of environments, got {}.'.format(len(environments)))
+    self._halves = tuple(
+        TFPyEnvironment(environment) for environment in environments)
+    first, second = self._halves
+    if (first.time_step_spec() != second.time_step_spec() or
+        first.action_spec() != second.action_spec()):
+      raise ValueError('Both environments must have the same specs.')
+    super(PipelinedTFPyEnvironment, self).__init__(
+        first.time_step_spec(), first.action_spec(),
+        first.batch_size + second.batch_size)
+
+  @property
+  def provides_env_ids(self):
+    """Whether either half returns batches from varying environments."""
+    return any(half.provides_env_ids for half in self._halves)
+
+  @property
+  def halves(self):
+    """Returns the pair of `TFPyEnvironment`s stepping each half."""
+    return self._halves
+
+  def split(self, tensors):
+    """Splits a nest of batched tensors into the batches of each half."""
+    sizes = [half.batch_size for half in self._halves]
+    splits = [tf.split(tensor, sizes) for tensor in nest.flatten(tensors)]
+    return tuple(
+        nest.pack_sequence_as(tensors, [split[i] for split in splits])
+        for i in range(2))
+
+  def concat(self, first, second):
+    """Concatenates two nests of batched tensors, one from each half."""
+    return nest.map_structure(lambda x, y: tf.concat([x, y], axis=0),
+                              first, second)
+
+  def current_time_step(self):
+    return self.concat(*[half.current_time_step() for half in self._halves])
+
+  def reset(self):
+    return self.concat(*[half.reset() for half in self._halves])
+
+  def step(self, actions):
+    return self.concat(*[
+        half.step(half_actions)
+        for half, half_actions in zip(self._halves, self.split(actions))])
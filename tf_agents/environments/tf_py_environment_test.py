@@ -29,6 +29,8 @@ from tf_agents.environments import batched_py_environment
 from tf_agents.environments import py_environment
 from tf_agents.environments import tf_py_environment
 from tf_agents.environments import time_step as ts
+from tf_agents.policies import policy_step
+from tf_agents.policies import py_policy
 
 nest = tf.contrib.framework.nest
 
@@ -79,6 +81,25 @@ class PYEnvironmentMock(py_environment.Base):
     return specs.ArraySpec([], np.int64, name='observation')
 
 
+class EnvIdsPyEnvironmentMock(batched_py_environment.BatchedPyEnvironment):
+  """Batched environments that report their ids in reverse order."""
+
+  def current_env_ids(self):
+    return np.arange(self.batch_size)[::-1]
+
+
+class CountingPyPolicy(py_policy.Base):
+  """Returns the number of actions taken so far as the action."""
+
+  def __init__(self, time_step_spec, action_spec):
+    super(CountingPyPolicy, self).__init__(
+        time_step_spec, action_spec,
+        policy_state_spec=specs.ArraySpec([], np.int32))
+
+  def _action(self, time_step, policy_state):
+    return policy_step.PolicyStep(policy_state + 1, policy_state + 1, ())
+
+
 class TFPYEnvironmentTest(tf.test.TestCase, parameterized.TestCase):
 
   def testPyenv(self):
@@ -283,6 +304,56 @@ class TFPYEnvironmentTest(tf.test.TestCase, parameterized.TestCase):
 
     self.assertEqual(np.array([0]), observation)
 
+  def testStepWithEnvIds(self):
+    py_env = EnvIdsPyEnvironmentMock([PYEnvironmentMock(), PYEnvironmentMock()])
+    tf_env = tf_py_environment.TFPyEnvironment(py_env)
+    self.assertTrue(tf_env.provides_env_ids)
+    time_step, env_ids = tf_env.current_time_step_with_env_ids()
+    self.assertEqual([2], env_ids.shape.as_list())
+    time_step, env_ids = self.evaluate([time_step, env_ids])
+    self.assertAllEqual([ts.StepType.FIRST] * 2, time_step.step_type)
+    self.assertAllEqual([1, 0], env_ids)
+
+    next_time_step, env_ids = tf_env.step_with_env_ids(tf.constant([1, 2]))
+    next_time_step, env_ids = self.evaluate([next_time_step, env_ids])
+    self.assertAllEqual([ts.StepType.MID] * 2, next_time_step.step_type)
+    self.assertAllEqual([1, 0], env_ids)
+
+  def testStepWithEnvIdsRaisesWithoutEnvIds(self):
+    tf_env = tf_py_environment.TFPyEnvironment(PYEnvironmentMock())
+    self.assertFalse(tf_env.provides_env_ids)
+    with self.assertRaisesRegexp(ValueError, 'does not provide env ids'):
+      tf_env.step_with_env_ids(tf.constant([1]))
+
+  def testRollout(self):
+    py_env = PYEnvironmentMock()
+    tf_env = tf_py_environment.TFPyEnvironment(py_env)
+    policy = CountingPyPolicy(
+        tf_env.pyenv.time_step_spec(), tf_env.pyenv.action_spec())
+    traj = tf_env.rollout(policy, num_steps=4)
+    self.assertEqual([4, 1], traj.action.shape.as_list())
+
+    traj = self.evaluate(traj)
+    self.assertAllEqual([[0], [1], [2], [0]], traj.observation)
+    # The policy state is reset when the second episode starts.
+    self.assertAllEqual([[1], [2], [3], [1]], traj.action)
+    self.assertAllEqual([[ts.StepType.FIRST], [ts.StepType.MID],
+                         [ts.StepType.LAST], [ts.StepType.FIRST]],
+                        traj.step_type)
+    self.assertAllEqual([[0.], [1.], [0.], [0.]], traj.reward)
+    self.assertEqual([1, 2, 3, 1], py_env.actions_taken)
+    self.assertEqual([1], self.evaluate(tf_env.current_time_step().observation))
+
+  def testRolloutPolicyStateResetOnReset(self):
+    py_env = PYEnvironmentMock()
+    tf_env = tf_py_environment.TFPyEnvironment(py_env)
+    policy = CountingPyPolicy(
+        tf_env.pyenv.time_step_spec(), tf_env.pyenv.action_spec())
+    traj = tf_env.rollout(policy, num_steps=2)
+    self.assertAllEqual([[1], [2]], self.evaluate(traj).action)
+    self.evaluate(tf_env.reset())
+    self.assertAllEqual([[1], [2]], self.evaluate(traj).action)
+
 
 if __name__ == '__main__':
   tf.test.main()
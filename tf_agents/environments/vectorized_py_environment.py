@@ -0,0 +1,134 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Base class for Python environments that step a whole batch with NumPy.
+
+`BatchedPyEnvironment` steps a list of unbatched environments, one call per
+environment, and stacks their time_steps. For lightweight environments the
+dispatch and stacking cost more than the environment step itself. A
+`VectorizedPyEnvironment` instead implements the dynamics of all batch elements
+with array operations on `[batch_size, ...]` arrays.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+import numpy as np
+import six
+import tensorflow as tf
+
+from tf_agents.environments import py_environment
+from tf_agents.environments import time_step as ts
+
+nest = tf.contrib.framework.nest
+
+
+@six.add_metaclass(abc.ABCMeta)
+class VectorizedPyEnvironment(py_environment.Base):
+  """A batched Python environment whose subclasses step all elements at once.
+
+  Subclasses implement `_reset_batch(indices)` and `_step_batch(actions)`. Each
+  batch element restarts independently: the action of an element whose last
+  time_step was `LAST` is ignored and the element gets a `FIRST` time_step from
+  `_reset_batch`. Episodes that reach `max_episode_steps` end with a `LAST`
+  time_step that keeps the discount of non-terminal steps.
+  """
+
+  def __init__(self, batch_size, discount=1.0, max_episode_steps=None):
+    """Initializes the environment.
+
+    Args:
+      batch_size: Number of environments stepped together.
+      discount: Discount of the time_steps that do not terminate an episode.
+      max_episode_steps: Optional maximum number of steps per episode.
+    """
+    self._batch_size = batch_size
+    self._discount = np.float32(discount)
+    self._max_episode_steps = max_episode_steps
+    self._step_type = None
+    self._episode_steps = np.zeros(batch_size, dtype=np.int64)
+
+  @property
+  def batched(self):
+    return True
+
+  @property
+  def batch_size(self):
+    return self._batch_size
+
+  @abc.abstractmethod
+  def _reset_batch(self, indices):
+    """Starts new episodes for the given batch elements.
+
+    Args:
+      indices: A sorted int64 array of the batch indices to reset.
+
+    Returns:
+      A nest of observations with outer dim [len(indices)].
+    """
+
+  @abc.abstractmethod
+  def _step_batch(self, actions):
+    """Steps all batch elements.
+
+    The elements about to be reset are stepped too; `_reset_batch` is called
+    for them afterwards and their results are discarded.
+
+    Args:
+      actions: A nest of actions with outer dim [batch_size].
+
+    Returns:
+      A tuple `(observation, reward, terminated)` of a nest of observations with
+      outer dim [batch_size], a float32 reward array of shape [batch_size] and
+      a bool array of shape [batch_size]. The arrays must not be views of the
+      environment state, they are overwritten when elements are reset.
+    """
+
+  def reset(self):
+    self._step_type = np.full(
+        self._batch_size, ts.StepType.FIRST, dtype=np.int32)
+    self._episode_steps[:] = 0
+    observation = self._reset_batch(np.arange(self._batch_size))
+    return ts.restart(observation, self._batch_size)
+
+  def step(self, action):
+    if self._step_type is None:
+      return self.reset()
+
+    restart = np.flatnonzero(self._step_type == ts.StepType.LAST)
+    observation, reward, terminated = self._step_batch(action)
+    self._episode_steps += 1
+    last = terminated
+    if self._max_episode_steps is not None:
+      last = last | (self._episode_steps >= self._max_episode_steps)
+    step_type = np.where(last, ts.StepType.LAST,
+                         ts.StepType.MID).astype(np.int32)
+    discount = np.where(terminated, np.float32(0),
+                        self._discount).astype(np.float32)
+    reward = np.asarray(reward, dtype=np.float32)
+
+    if restart.size:
+      for array, first in zip(
+          nest.flatten(observation), nest.flatten(self._reset_batch(restart))):
+        array[restart] = first
+      step_type[restart] = ts.StepType.FIRST
+      reward[restart] = 0
+      discount[restart] = 1
+      self._episode_steps[restart] = 0
+
+    self._step_type = step_type
+    return ts.TimeStep(step_type, reward, discount, observation)
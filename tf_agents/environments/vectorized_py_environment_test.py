@@ -0,0 +1,93 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.environments.vectorized_py_environment."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest
+import numpy as np
+
+from tf_agents.environments import time_step as ts
+from tf_agents.environments import vectorized_py_environment
+from tf_agents.specs import array_spec
+
+
+class CountingPyEnvironment(vectorized_py_environment.VectorizedPyEnvironment):
+  """Observes the sum of actions taken, terminates once it reaches 3."""
+
+  def __init__(self, batch_size, max_episode_steps=None):
+    super(CountingPyEnvironment, self).__init__(
+        batch_size, discount=0.5, max_episode_steps=max_episode_steps)
+    self._state = np.zeros(batch_size, dtype=np.int64)
+
+  def observation_spec(self):
+    return array_spec.ArraySpec([], np.int64)
+
+  def action_spec(self):
+    return array_spec.BoundedArraySpec([], np.int64, minimum=0, maximum=3)
+
+  def _reset_batch(self, indices):
+    self._state[indices] = 0
+    return self._state[indices]
+
+  def _step_batch(self, actions):
+    self._state += actions
+    return self._state.copy(), actions, self._state >= 3
+
+
+class VectorizedPyEnvironmentTest(absltest.TestCase):
+
+  def testFirstStepResets(self):
+    env = CountingPyEnvironment(batch_size=2)
+    time_step = env.step(np.array([3, 3]))
+    np.testing.assert_array_equal([ts.StepType.FIRST] * 2, time_step.step_type)
+    np.testing.assert_array_equal([0, 0], time_step.observation)
+
+  def testStepRestartsEachEnvironmentIndependently(self):
+    env = CountingPyEnvironment(batch_size=2)
+    env.reset()
+
+    time_step = env.step(np.array([1, 3]))
+    np.testing.assert_array_equal([ts.StepType.MID, ts.StepType.LAST],
+                                  time_step.step_type)
+    np.testing.assert_array_equal([1, 3], time_step.observation)
+    np.testing.assert_array_equal([1., 3.], time_step.reward)
+    np.testing.assert_array_equal([0.5, 0.], time_step.discount)
+
+    time_step = env.step(np.array([2, 2]))
+    np.testing.assert_array_equal([ts.StepType.LAST, ts.StepType.FIRST],
+                                  time_step.step_type)
+    np.testing.assert_array_equal([3, 0], time_step.observation)
+    np.testing.assert_array_equal([2., 0.], time_step.reward)
+    np.testing.assert_array_equal([0., 1.], time_step.discount)
+
+    time_step = env.step(np.array([1, 1]))
+    np.testing.assert_array_equal([ts.StepType.FIRST, ts.StepType.MID],
+                                  time_step.step_type)
+    np.testing.assert_array_equal([0, 1], time_step.observation)
+
+  def testMaxEpisodeSteps(self):
+    env = CountingPyEnvironment(batch_size=1, max_episode_steps=2)
+    env.reset()
+    step_types = [env.step(np.array([0])).step_type[0] for _ in range(3)]
+    np.testing.assert_array_equal(
+        [ts.StepType.MID, ts.StepType.LAST, ts.StepType.FIRST], step_types)
+
+
+if __name__ == '__main__':
+  absltest.main()
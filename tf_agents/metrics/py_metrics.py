@@ -64,8 +64,43 @@ class NumpyDeque(tf.contrib.checkpoint.NumpyState):
       self._start_index = np.mod(self._start_index + 1, self._maxlen)
 
   def extend(self, values):
-    for value in values:
-      self.add(value)
+    """Adds all the values, in order, with at most two slice assignments.
+
+    Args:
+      values: A 1-D array or a sequence of values to add.
+    """
+    values = np.asarray(values)
+    num_values = values.shape[0]
+    if not num_values:
+      return
+
+    if np.isinf(self._maxlen):
+      new_len = self._len + num_values
+      # Increase buffer size if necessary.
+      if new_len > self._buffer.shape[0]:
+        self._buffer.resize((max(self._buffer.shape[0] * 2, new_len),))
+      self._buffer[self._len:new_len] = values
+      self._len = new_len
+      return
+
+    maxlen = int(self._maxlen)
+    if num_values >= maxlen:
+      # Only the last maxlen values are kept.
+      self._buffer[:] = values[-maxlen:]
+      self._start_index = np.int64(0)
+      self._len = np.int64(maxlen)
+      return
+
+    insert_idx = int((self._start_index + self._len) % maxlen)
+    # Write up to the end of the buffer, then wrap around to its start.
+    num_before_wrap = min(num_values, maxlen - insert_idx)
+    self._buffer[insert_idx:insert_idx + num_before_wrap] = (
+        values[:num_before_wrap])
+    self._buffer[:num_values - num_before_wrap] = values[num_before_wrap:]
+
+    num_evicted = max(self._len + num_values - maxlen, 0)
+    self._len = np.int64(min(self._len + num_values, maxlen))
+    self._start_index = np.mod(self._start_index + num_evicted, self._maxlen)
 
   def __len__(self):
     return self._len
@@ -155,12 +190,15 @@ class AverageReturnMetric(StreamingMetric):
     """
     episode_return = self._np_state.episode_return
 
-    non_boundary = np.where(~trajectory.is_boundary())
-    episode_return[non_boundary] += trajectory.reward[non_boundary]
+    # Boundary trajectories have no reward, so the returns of all the envs
+    # are updated with a single masked add.
+    episode_return += np.where(trajectory.is_boundary(), 0.,
+                               trajectory.reward)
 
-    is_last = np.where(trajectory.is_last())
-    self.add_to_buffer(episode_return[is_last])
-    episode_return[is_last] = 0
+    is_last = trajectory.is_last()
+    if np.any(is_last):
+      self.add_to_buffer(episode_return[is_last])
+      episode_return[is_last] = 0
 
 
 class AverageEpisodeLengthMetric(StreamingMetric):
@@ -190,9 +228,12 @@ class AverageEpisodeLengthMetric(StreamingMetric):
     episode_steps = self._np_state.episode_steps
 
     # Each non-boundary trajectory (first, mid or last) represents a step.
-    episode_steps[np.where(~trajectory.is_boundary())] += 1
-    self.add_to_buffer(episode_steps[np.where(trajectory.is_last())])
-    episode_steps[np.where(trajectory.is_last())] = 0
+    episode_steps += ~trajectory.is_boundary()
+
+    is_last = trajectory.is_last()
+    if np.any(is_last):
+      self.add_to_buffer(episode_steps[is_last])
+      episode_steps[is_last] = 0
 
 
 class EnvironmentSteps(py_metric.PyStepMetric,
@@ -219,6 +219,46 @@ class NumpyDequeTest(tf.test.TestCase):
     buf.add(6)
     self.assertEqual(5, buf.mean())
 
+  def testExtend(self):
+    buf = py_metrics.NumpyDeque(maxlen=10, dtype=np.float64)
+    buf.extend([2, 3, 5, 6])
+    self.assertEqual(4, len(buf))
+    self.assertEqual(4, buf.mean())
+
+  def testExtendWrapsAround(self):
+    buf = py_metrics.NumpyDeque(maxlen=4, dtype=np.float64)
+    buf.extend([2, 3, 5])
+    buf.extend([6, 8, 9])
+    buf.add(10)
+    self.assertEqual(4, len(buf))
+    self.assertEqual(8.25, buf.mean())
+
+  def testExtendPastMaxLen(self):
+    buf = py_metrics.NumpyDeque(maxlen=4, dtype=np.float64)
+    buf.add(1)
+    buf.extend([2, 3, 5, 6, 8, 9])
+    self.assertEqual(4, len(buf))
+    self.assertEqual(7, buf.mean())
+
+  def testExtendMatchesAdd(self):
+    for maxlen in [1, 3, 10, np.inf]:
+      extended = py_metrics.NumpyDeque(maxlen=maxlen, dtype=np.float64)
+      added = py_metrics.NumpyDeque(maxlen=maxlen, dtype=np.float64)
+      for size in [2, 0, 5, 11, 1, 30]:
+        values = np.random.randn(size)
+        extended.extend(values)
+        for value in values:
+          added.add(value)
+        self.assertEqual(len(added), len(extended))
+        self.assertAllClose(added.mean(), extended.mean())
+
+  def testUnboundedExtend(self):
+    buf = py_metrics.NumpyDeque(maxlen=np.inf, dtype=np.float64)
+    buf.extend(range(51))
+    buf.extend(range(51, 101))
+    self.assertEqual(101, len(buf))
+    self.assertEqual(50, buf.mean())
+
 
 if __name__ == '__main__':
   tf.test.main()
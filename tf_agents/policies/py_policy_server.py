@@ -0,0 +1,225 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Serves a batched Python policy to many concurrent unbatched callers.
+
+Calling a batched policy such as `PyTFPolicy` once per actor thread pays the
+full `session.run` overhead for a batch of one. `BatchedPyPolicyServer` queues
+the `action()` requests made through its clients, coalesces up to
+`max_batch_size` of them into a single call to the wrapped policy and scatters
+the results back to the callers. Each client is a regular `py_policy.Base`, so
+it can be handed to a `PyDriver` running in its own thread.
+
+Example usage:
+
+  policy = py_tf_policy.PyTFPolicy(tf_policy, batch_size=num_actors)
+  server = py_policy_server.BatchedPyPolicyServer(
+      policy, max_batch_size=num_actors, batch_size=num_actors)
+  drivers = [py_driver.PyDriver(env, server.create_client(), observers)
+             for env in envs]
+
+There is no serving thread: the first caller to arrive waits up to
+`max_wait_secs` for the batch to fill, then runs it on behalf of every request
+in the batch. Batches taken by different callers can run concurrently.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+from tf_agents.policies import py_policy
+from tf_agents.utils import nest_utils
+
+
+class _Request(object):
+  """A pending `action()` request of a single caller."""
+
+  def __init__(self, time_step, policy_state):
+    self.time_step = time_step
+    self.policy_state = policy_state
+    self.deadline = None
+    self.taken = False
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+class BatchedPyPolicyServer(object):
+  """Coalesces `action()` calls from many clients into batched calls."""
+
+  def __init__(self, policy, max_batch_size, batch_size=None,
+               max_wait_secs=0.001):
+    """Initializes a new `BatchedPyPolicyServer`.
+
+    Args:
+      policy: A batched `py_policy.Base`, e.g. a `PyTFPolicy` created with a
+        `batch_size`. Its `action()` gets time_steps and policy states with an
+        outer batch dimension.
+      max_batch_size: The maximum number of requests coalesced into one call to
+        `policy.action()`.
+      batch_size: Optional fixed batch size expected by `policy`. Smaller
+        batches are padded by repeating their last request. If None, `policy`
+        is called with the number of coalesced requests.
+      max_wait_secs: Maximum time to wait for a batch to fill up before running
+        it with the requests received so far.
+
+    Raises:
+      ValueError: If `max_batch_size` is not positive or is larger than
+        `batch_size`.
+    """
+    if max_batch_size < 1:
+      raise ValueError('max_batch_size must be positive, got {}.'.format(
+          max_batch_size))
+    if batch_size is not None and max_batch_size > batch_size:
+      raise ValueError(
+          'max_batch_size ({}) cannot be larger than batch_size ({}).'.format(
+              max_batch_size, batch_size))
+    self._policy = policy
+    self._max_batch_size = max_batch_size
+    self._batch_size = batch_size
+    self._max_wait_secs = max_wait_secs
+    self._condition = threading.Condition()
+    self._pending = []
+    self._num_batches = 0
+    self._num_requests = 0
+    self._time_step_nest = nest_utils.CompiledNest(policy.time_step_spec())
+    # Compiled from the first policy state and action step.
+    self._policy_state_nest = None
+    self._action_step_nest = None
+
+  @property
+  def policy(self):
+    return self._policy
+
+  @property
+  def num_batches(self):
+    """Number of batched calls made to the wrapped policy."""
+    return self._num_batches
+
+  @property
+  def num_requests(self):
+    """Number of `action()` requests served."""
+    return self._num_requests
+
+  def create_client(self):
+    """Returns an unbatched `py_policy.Base` served by this server."""
+    return BatchedPyPolicyClient(self)
+
+  def initial_state(self):
+    """Returns the unbatched initial policy state of the wrapped policy."""
+    batched_state = self._policy.get_initial_state(self._batch_size or 1)
+    return nest_utils.unbatch_nested_array(batched_state)
+
+  def action(self, time_step, policy_state):
+    """Computes the action of a single unbatched request.
+
+    Blocks until the batch containing the request has been run.
+
+    Args:
+      time_step: An unbatched `TimeStep`.
+      policy_state: An unbatched policy state.
+
+    Returns:
+      An unbatched `PolicyStep`.
+    """
+    request = _Request(time_step, policy_state)
+    batch = None
+    with self._condition:
+      self._pending.append(request)
+      self._condition.notify_all()
+      while not request.taken:
+        if self._pending[0] is not request:
+          self._condition.wait()
+          continue
+        # The oldest pending request collects the next batch.
+        now = time.time()
+        if request.deadline is None:
+          request.deadline = now + self._max_wait_secs
+        if (len(self._pending) < self._max_batch_size and
+            now < request.deadline):
+          self._condition.wait(request.deadline - now)
+          continue
+        batch = self._pending[:self._max_batch_size]
+        self._pending = self._pending[self._max_batch_size:]
+        for taken_request in batch:
+          taken_request.taken = True
+        self._num_batches += 1
+        self._num_requests += len(batch)
+        # Wakes up the requests in the batch and the next collector, if any.
+        self._condition.notify_all()
+
+    if batch is not None:
+      self._run_batch(batch)
+    request.done.wait()
+    if request.error is not None:
+      raise request.error
+    return request.result
+
+  def _run_batch(self, batch):
+    requests = list(batch)
+    if self._batch_size is not None:
+      requests += [batch[-1]] * (self._batch_size - len(batch))
+    try:
+      if self._policy_state_nest is None:
+        self._policy_state_nest = nest_utils.CompiledNest(
+            batch[0].policy_state)
+      time_step = self._time_step_nest.stack_arrays(
+          [r.time_step for r in requests])
+      policy_state = self._policy_state_nest.stack_arrays(
+          [r.policy_state for r in requests])
+      action_step = self._policy.action(time_step, policy_state)
+      if self._action_step_nest is None:
+        self._action_step_nest = nest_utils.CompiledNest(action_step)
+      results = self._action_step_nest.unstack_arrays(action_step)
+      for request, result in zip(batch, results):
+        request.result = result
+    except Exception as e:  # pylint: disable=broad-except
+      for request in batch:
+        request.error = e
+    for request in batch:
+      request.done.set()
+
+
+class BatchedPyPolicyClient(py_policy.Base):
+  """Unbatched policy whose actions are computed by a `BatchedPyPolicyServer`.
+
+  Clients are cheap; create one per calling thread with
+  `BatchedPyPolicyServer.create_client()`.
+  """
+
+  def __init__(self, server):
+    """Initializes a new `BatchedPyPolicyClient`.
+
+    Args:
+      server: The `BatchedPyPolicyServer` computing the actions.
+    """
+    self._server = server
+    policy = server.policy
+    super(BatchedPyPolicyClient, self).__init__(
+        policy.time_step_spec(), policy.action_spec(),
+        policy_state_spec=policy.policy_state_spec())
+
+  def _get_initial_state(self, batch_size):
+    if batch_size is not None:
+      raise ValueError(
+          'BatchedPyPolicyClient only supports unbatched policy states, but '
+          'saw batch_size {}.'.format(batch_size))
+    return self._server.initial_state()
+
+  def _action(self, time_step, policy_state):
+    return self._server.action(time_step, policy_state)
@@ -0,0 +1,136 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.policies.py_policy_server."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.environments import time_step as ts
+from tf_agents.policies import policy_step
+from tf_agents.policies import py_policy
+from tf_agents.policies import py_policy_server
+from tf_agents.specs import array_spec
+
+
+class BatchedCountingPolicy(py_policy.Base):
+  """Doubles the observations and counts calls in the policy state."""
+
+  def __init__(self):
+    obs_spec = array_spec.ArraySpec((2,), np.float32)
+    action_spec = array_spec.BoundedArraySpec((2,), np.float32, -100, 100)
+    super(BatchedCountingPolicy, self).__init__(
+        ts.time_step_spec(obs_spec), action_spec,
+        policy_state_spec=array_spec.ArraySpec((), np.int32))
+    self.batch_sizes = []
+
+  def _action(self, time_step, policy_state):
+    self.batch_sizes.append(time_step.observation.shape[0])
+    if np.any(time_step.observation < 0):
+      raise ValueError('Negative observation.')
+    return policy_step.PolicyStep(
+        2 * time_step.observation, policy_state + 1, ())
+
+
+def _time_step(value):
+  return ts.transition(
+      np.array([value, value], dtype=np.float32), reward=np.float32(0))
+
+
+class BatchedPyPolicyServerTest(tf.test.TestCase):
+
+  def testSingleClient(self):
+    policy = BatchedCountingPolicy()
+    server = py_policy_server.BatchedPyPolicyServer(
+        policy, max_batch_size=4, max_wait_secs=0.)
+    client = server.create_client()
+    state = client.get_initial_state()
+    self.assertAllEqual(0, state)
+    action_step = client.action(_time_step(3.), state)
+    self.assertAllEqual([6., 6.], action_step.action)
+    self.assertAllEqual(1, action_step.state)
+    self.assertEqual([1], policy.batch_sizes)
+
+  def testPadsToBatchSize(self):
+    policy = BatchedCountingPolicy()
+    server = py_policy_server.BatchedPyPolicyServer(
+        policy, max_batch_size=2, batch_size=4, max_wait_secs=0.)
+    client = server.create_client()
+    action_step = client.action(_time_step(1.), client.get_initial_state())
+    self.assertAllEqual([2., 2.], action_step.action)
+    self.assertEqual([4], policy.batch_sizes)
+
+  def testCoalescesConcurrentClients(self):
+    num_clients = 8
+    num_steps = 20
+    policy = BatchedCountingPolicy()
+    server = py_policy_server.BatchedPyPolicyServer(
+        policy, max_batch_size=num_clients, max_wait_secs=1.)
+    results = [None] * num_clients
+
+    def run_client(index):
+      client = server.create_client()
+      state = client.get_initial_state()
+      actions = []
+      for _ in range(num_steps):
+        action_step = client.action(_time_step(float(index)), state)
+        state = action_step.state
+        actions.append(action_step.action)
+      results[index] = (state, actions)
+
+    threads = [threading.Thread(target=run_client, args=(i,))
+               for i in range(num_clients)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    for index, (state, actions) in enumerate(results):
+      self.assertAllEqual(num_steps, state)
+      for action in actions:
+        self.assertAllEqual([2. * index, 2. * index], action)
+    self.assertEqual(num_clients * num_steps, server.num_requests)
+    self.assertEqual(num_clients * num_steps, sum(policy.batch_sizes))
+    self.assertLess(server.num_batches, server.num_requests)
+    self.assertLessEqual(max(policy.batch_sizes), num_clients)
+
+  def testErrorIsRaisedInCaller(self):
+    policy = BatchedCountingPolicy()
+    server = py_policy_server.BatchedPyPolicyServer(
+        policy, max_batch_size=2, max_wait_secs=0.)
+    client = server.create_client()
+    with self.assertRaisesRegexp(ValueError, 'Negative observation'):
+      client.action(_time_step(-1.), client.get_initial_state())
+
+  def testRaisesIfMaxBatchSizeLargerThanBatchSize(self):
+    with self.assertRaises(ValueError):
+      py_policy_server.BatchedPyPolicyServer(
+          BatchedCountingPolicy(), max_batch_size=4, batch_size=2)
+
+  def testClientRaisesOnBatchedInitialState(self):
+    server = py_policy_server.BatchedPyPolicyServer(
+        BatchedCountingPolicy(), max_batch_size=2)
+    with self.assertRaises(ValueError):
+      server.create_client().get_initial_state(batch_size=2)
+
+
+if __name__ == '__main__':
+  tf.test.main()
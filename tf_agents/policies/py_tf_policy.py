@@ -18,6 +18,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
 import tensorflow as tf
 
 from tf_agents.policies import policy_step
@@ -78,6 +79,39 @@ class PyTFPolicy(py_policy.Base, session_utils.SessionUser):
     self._action_step = self._tf_policy.action(
         self._time_step, self._policy_state, seed=self._seed)
 
+    self._flat_time_step = nest.flatten(self._time_step)
+    self._flat_policy_state = nest.flatten(self._policy_state)
+    self._flat_action_step = nest.flatten(self._action_step)
+    self._time_step_structure_checked = False
+    self._session_callables = {}
+    self._session_callables_session = None
+
+  def _get_session_callable(self, with_policy_state):
+    """Returns a callable running the action step, or None if unsupported.
+
+    Callables are built once per session and feed signature, which avoids
+    parsing a `feed_dict` and the fetches on every `session.run`.
+
+    Args:
+      with_policy_state: Whether the callable is also fed the policy state.
+    """
+    session = self.session
+    if not hasattr(session, 'make_callable'):
+      # Session-like objects such as `tf.train.MonitoredSession`.
+      return None
+    if session is not self._session_callables_session:
+      self._session_callables = {}
+      self._session_callables_session = session
+    session_callable = self._session_callables.get(with_policy_state)
+    if session_callable is None:
+      feed_list = list(self._flat_time_step)
+      if with_policy_state:
+        feed_list += self._flat_policy_state
+      session_callable = session.make_callable(
+          self._flat_action_step, feed_list=feed_list)
+      self._session_callables[with_policy_state] = session_callable
+    return session_callable
+
   def _get_initial_state(self, batch_size):
     if batch_size != self._batch_size:
       raise ValueError(
@@ -87,22 +121,55 @@ class PyTFPolicy(py_policy.Base, session_utils.SessionUser):
     return self.session.run(self._tf_initial_state)
 
   def _action(self, time_step, policy_state):
-    if not self._batched:
-      # Since policy_state is given in a batched form from the policy and we
-      # simply have to send it back we do not need to worry about it. Only
-      # update time_step.
-      time_step = nest_utils.batch_nested_array(time_step)
+    if not self._time_step_structure_checked:
+      # The structure of time_step does not change between calls.
+      nest.assert_same_structure(self._time_step, time_step)
+      self._time_step_structure_checked = True
 
-    nest.assert_same_structure(self._time_step, time_step)
-    feed_dict = {self._time_step: time_step}
+    flat_policy_state = ()
     if policy_state is not None:
       # Flatten policy_state to handle specs that are not hashable due to lists.
-      for state_ph, state in zip(
-          nest.flatten(self._policy_state), nest.flatten(policy_state)):
-        feed_dict[state_ph] = state
+      flat_policy_state = nest.flatten(policy_state)
+    return self.flat_action(nest.flatten(time_step), flat_policy_state)
+
+  def flat_action(self, flat_time_step, flat_policy_state=()):
+    """Generates the next action given already flattened inputs.
+
+    Faster variant of `action()` for callers which keep their time_steps and
+    policy states flattened: no structure is checked nor flattened.
 
-    action_step = self.session.run(self._action_step, feed_dict)
-    action, state, info = action_step
+    Args:
+      flat_time_step: A list of arrays matching `nest.flatten` of
+        `time_step_spec()`, with an outer batch dimension if the policy is
+        batched.
+      flat_policy_state: A list of arrays matching `nest.flatten` of the
+        previous policy_state. Empty for stateless policies.
+
+    Returns:
+      A `PolicyStep` named tuple, as returned by `action()`.
+    """
+    if not self._batched:
+      # Since policy_state is given in a batched form from the policy and we
+      # simply have to send it back we do not need to worry about it. Only
+      # update time_step.
+      flat_time_step = [np.expand_dims(x, 0) for x in flat_time_step]
+
+    with_policy_state = bool(flat_policy_state)
+    flat_inputs = list(flat_time_step)
+    if with_policy_state:
+      flat_inputs += flat_policy_state
+    session_callable = self._get_session_callable(with_policy_state)
+    if session_callable is not None:
+      flat_action_step = session_callable(*flat_inputs)
+    else:
+      feeds = self._flat_time_step
+      if with_policy_state:
+        feeds = feeds + self._flat_policy_state
+      flat_action_step = self.session.run(
+          self._flat_action_step, dict(zip(feeds, flat_inputs)))
+
+    action, state, info = nest.pack_sequence_as(
+        self._action_step, flat_action_step)
 
     if not self._batched:
       action, info = nest_utils.unbatch_nested_array([action, info])
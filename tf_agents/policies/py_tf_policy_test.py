@@ -19,15 +19,20 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 from absl.testing import parameterized
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.agents.dqn import q_network
 from tf_agents.environments import time_step as ts
 from tf_agents.networks import network
+from tf_agents.policies import policy_step
 from tf_agents.policies import py_tf_policy
 from tf_agents.policies import q_policy
 from tf_agents.specs import tensor_spec
+from tf_agents.utils import nest_utils
 
 nest = tf.contrib.framework.nest
 
@@ -130,6 +135,96 @@ class PyTFPolicyTest(tf.test.TestCase, parameterized.TestCase):
         self.assertAllEqual(action_steps.action, [1] * batch_size)
         self.assertAllEqual(action_steps.state, np.zeros([5, 1]))
 
+  @parameterized.parameters([{'batch_size': None}, {'batch_size': 5}])
+  def testFlatAction(self, batch_size):
+    observation = np.array([1, 2], dtype=np.float32)
+    time_steps = ts.restart(observation)
+    if batch_size is not None:
+      time_steps = nest_utils.stack_nested_arrays([time_steps] * batch_size)
+    policy = py_tf_policy.PyTFPolicy(self._tf_policy, batch_size=batch_size)
+
+    with self.test_session():
+      policy_state = policy.get_initial_state(batch_size)
+      tf.global_variables_initializer().run()
+      action_steps = policy.action(time_steps, policy_state)
+      flat_action_steps = policy.flat_action(
+          nest.flatten(time_steps), nest.flatten(policy_state))
+      self.assertAllEqual(action_steps.action, flat_action_steps.action)
+      self.assertAllEqual(action_steps.state, flat_action_steps.state)
+
+  def testActionWithNewSession(self):
+    time_step = ts.restart(np.array([1, 2], dtype=np.float32))
+    policy = py_tf_policy.PyTFPolicy(self._tf_policy)
+    init_op = tf.global_variables_initializer()
+    for _ in range(2):
+      # A new session requires new session callables.
+      policy.session = tf.Session()
+      policy.session.run(init_op)
+      action_step = policy.action(time_step, policy.get_initial_state())
+      self.assertEqual(1, action_step.action)
+
+
+class PyTFPolicyBenchmark(tf.test.Benchmark):
+
+  def _benchmark_action(self, name, observation_spec, num_iters, **kwargs):
+    """Reports the per-action latency of the old and new action paths."""
+    tf.reset_default_graph()
+    action_spec = tensor_spec.BoundedTensorSpec([], tf.int32, 0, 5)
+    q_net = q_network.QNetwork(observation_spec, action_spec, **kwargs)
+    tf_policy = q_policy.QPolicy(
+        ts.time_step_spec(observation_spec), action_spec, q_network=q_net)
+    policy = py_tf_policy.PyTFPolicy(tf_policy)
+    time_step = ts.restart(
+        np.zeros(observation_spec.shape, dtype=np.float32))
+    action_step_op = policy._action_step  # pylint: disable=protected-access
+    time_step_ph = policy._time_step  # pylint: disable=protected-access
+
+    with tf.Session() as session:
+      session.run(tf.global_variables_initializer())
+      policy.session = session
+      policy_state = policy.get_initial_state()
+
+      def feed_dict_action():
+        # The feed_dict based implementation `action()` used to have.
+        batched_time_step = nest_utils.batch_nested_array(time_step)
+        nest.assert_same_structure(time_step_ph, batched_time_step)
+        action, state, info = session.run(action_step_op,
+                                          {time_step_ph: batched_time_step})
+        action, info = nest_utils.unbatch_nested_array([action, info])
+        return policy_step.PolicyStep(action, state, info)
+
+      flat_time_step = nest.flatten(time_step)
+      flat_policy_state = nest.flatten(policy_state)
+      for path, action_fn in [
+          ('feed_dict', feed_dict_action),
+          ('action', lambda: policy.action(time_step, policy_state)),
+          ('flat_action',
+           lambda: policy.flat_action(flat_time_step, flat_policy_state))]:
+        action_fn()
+        start_time = time.time()
+        for _ in range(num_iters):
+          action_fn()
+        self.report_benchmark(
+            iters=num_iters,
+            wall_time=(time.time() - start_time) / num_iters,
+            name='%s_%s' % (name, path))
+
+  def benchmark_atari_q_network_action(self):
+    # Float observations since the plain QNetwork does not cast its inputs.
+    self._benchmark_action(
+        'atari_q_network',
+        tensor_spec.TensorSpec([84, 84, 4], tf.float32),
+        num_iters=1000,
+        conv_layer_params=((32, (8, 8), 4), (64, (4, 4), 2), (64, (3, 3), 1)),
+        fc_layer_params=(512,))
+
+  def benchmark_small_q_network_action(self):
+    # A small network, where the per-call overhead dominates the latency.
+    self._benchmark_action(
+        'small_q_network',
+        tensor_spec.TensorSpec([4], tf.float32),
+        num_iters=5000,
+        fc_layer_params=(64,))
 
 if __name__ == '__main__':
   tf.test.main()
@@ -0,0 +1,82 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A policy that records the policy state used for each action in its info."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+from tf_agents.policies import policy_step
+from tf_agents.policies import tf_policy
+
+# Info emitted by a StateRecordingPolicy.
+#
+# Attributes:
+#   policy_state: The policy state given to the wrapped policy to compute the
+#     action, i.e. the state before processing the time step.
+#   info: The info emitted by the wrapped policy.
+RecordedStateInfo = collections.namedtuple('RecordedStateInfo',
+                                           ('policy_state', 'info'))
+
+
+class StateRecordingPolicy(tf_policy.Base):
+  """Wraps a policy and adds the policy state of each action to its info.
+
+  The trajectories collected with this policy, e.g. in a replay buffer, then
+  contain the recurrent state of the policy at every step, so that agents can
+  train recurrent networks on short sequences starting from the state stored
+  at their first step instead of from zeros.
+  """
+
+  def __init__(self, wrapped_policy):
+    """Builds a StateRecordingPolicy wrapping wrapped_policy.
+
+    Args:
+      wrapped_policy: A policy implementing the tf_policy.Base interface.
+    """
+    super(StateRecordingPolicy, self).__init__(
+        wrapped_policy.time_step_spec(),
+        wrapped_policy.action_spec(),
+        wrapped_policy.policy_state_spec(),
+        RecordedStateInfo(policy_state=wrapped_policy.policy_state_spec(),
+                          info=wrapped_policy.info_spec()))
+    self._wrapped_policy = wrapped_policy
+
+  @property
+  def wrapped_policy(self):
+    return self._wrapped_policy
+
+  def _variables(self):
+    return self._wrapped_policy.variables()
+
+  def _get_initial_state(self, batch_size):
+    return self._wrapped_policy.get_initial_state(batch_size)
+
+  def _action(self, time_step, policy_state, seed):
+    action_step = self._wrapped_policy.action(time_step, policy_state, seed)
+    return policy_step.PolicyStep(
+        action_step.action, action_step.state,
+        RecordedStateInfo(policy_state=policy_state, info=action_step.info))
+
+  def _distribution(self, time_step, policy_state):
+    distribution_step = self._wrapped_policy.distribution(
+        time_step, policy_state)
+    return policy_step.PolicyStep(
+        distribution_step.action, distribution_step.state,
+        RecordedStateInfo(policy_state=policy_state,
+                          info=distribution_step.info))
@@ -0,0 +1,107 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test for tf_agents.policies.state_recording_policy."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+import tensorflow_probability as tfp
+
+from tf_agents.environments import time_step as ts
+from tf_agents.policies import policy_step
+from tf_agents.policies import state_recording_policy
+from tf_agents.policies import tf_policy
+from tf_agents.specs import tensor_spec
+
+nest = tf.contrib.framework.nest
+
+
+class CountingPolicy(tf_policy.Base):
+  """A policy which counts the steps it has taken in its state."""
+
+  def __init__(self, time_step_spec, action_spec):
+    super(CountingPolicy, self).__init__(
+        time_step_spec, action_spec,
+        policy_state_spec=tensor_spec.TensorSpec([1], tf.int32),
+        info_spec=tensor_spec.TensorSpec([], tf.float32))
+
+  def _action(self, time_step, policy_state, seed):
+    batch_size = tf.shape(time_step.step_type)[0]
+    return policy_step.PolicyStep(
+        tf.zeros([batch_size], tf.int32), policy_state + 1,
+        tf.ones([batch_size], tf.float32))
+
+  def _distribution(self, time_step, policy_state):
+    batch_size = tf.shape(time_step.step_type)[0]
+    return policy_step.PolicyStep(
+        tfp.distributions.Deterministic(tf.zeros([batch_size], tf.int32)),
+        policy_state + 1, tf.ones([batch_size], tf.float32))
+
+  def _variables(self):
+    return []
+
+
+class StateRecordingPolicyTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(StateRecordingPolicyTest, self).setUp()
+    self._obs_spec = tensor_spec.TensorSpec([2], tf.float32)
+    self._time_step_spec = ts.time_step_spec(self._obs_spec)
+    self._action_spec = tensor_spec.BoundedTensorSpec((), tf.int32, 0, 1)
+    self._wrapped_policy = CountingPolicy(self._time_step_spec,
+                                          self._action_spec)
+
+  def testSpecs(self):
+    policy = state_recording_policy.StateRecordingPolicy(self._wrapped_policy)
+    self.assertEqual(policy.time_step_spec(), self._time_step_spec)
+    self.assertEqual(policy.action_spec(), self._action_spec)
+    self.assertEqual(policy.policy_state_spec(),
+                     self._wrapped_policy.policy_state_spec())
+    self.assertEqual(
+        policy.info_spec(),
+        state_recording_policy.RecordedStateInfo(
+            policy_state=self._wrapped_policy.policy_state_spec(),
+            info=self._wrapped_policy.info_spec()))
+
+  def testActionRecordsInputState(self):
+    policy = state_recording_policy.StateRecordingPolicy(self._wrapped_policy)
+    observations = tf.constant([[1, 2], [3, 4]], dtype=tf.float32)
+    time_step = ts.restart(observations, batch_size=2)
+    policy_state = tf.constant([[3], [5]], dtype=tf.int32)
+    action_step = policy.action(time_step, policy_state)
+    nest.assert_same_structure(policy.info_spec(), action_step.info)
+
+    action_step_ = self.evaluate(action_step)
+    self.assertAllEqual(action_step_.state, [[4], [6]])
+    self.assertAllEqual(action_step_.info.policy_state, [[3], [5]])
+    self.assertAllEqual(action_step_.info.info, [1., 1.])
+
+  def testDistributionRecordsInputState(self):
+    policy = state_recording_policy.StateRecordingPolicy(self._wrapped_policy)
+    observations = tf.constant([[1, 2], [3, 4]], dtype=tf.float32)
+    time_step = ts.restart(observations, batch_size=2)
+    policy_state = policy.get_initial_state(batch_size=2)
+    distribution_step = policy.distribution(time_step, policy_state)
+
+    info_, state_ = self.evaluate(
+        (distribution_step.info, distribution_step.state))
+    self.assertAllEqual(info_.policy_state, [[0], [0]])
+    self.assertAllEqual(state_, [[1], [1]])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -18,10 +18,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
 import numpy as np
 import tensorflow as tf
 
 from tf_agents.specs import array_spec
+from tf_agents.utils import nest_utils
 
 nest = tf.contrib.framework.nest
 
@@ -56,6 +59,7 @@ class NumpyStorage(tf.contrib.checkpoint.Checkpointable):
                        'array_spec.ArraySpec. Got: {}'.format(data_spec))
     self._data_spec = data_spec
     self._flat_specs = nest.flatten(data_spec)
+    self._compiled_spec = nest_utils.CompiledNest(data_spec)
     self._np_state = tf.contrib.checkpoint.NumpyState()
 
     self._buf_names = tf.contrib.checkpoint.NoDependency([])
@@ -79,14 +83,91 @@ class NumpyStorage(tf.contrib.checkpoint.Checkpointable):
     return array
 
   def get(self, idx):
-    """Get value stored at idx."""
+    """Get value stored at idx.
+
+    Args:
+      idx: An integer, or an integer numpy array of indices. When an array is
+        given, each flat buffer is read with a single fancy-indexing gather and
+        the returned arrays have `idx.shape` as outer dimensions.
+
+    Returns:
+      A nest of arrays matching the data_spec of this storage.
+    """
     encoded_item = []
     for buf_idx in range(len(self._flat_specs)):
       encoded_item.append(self._array(buf_idx)[idx])
-    return nest.pack_sequence_as(self._data_spec, encoded_item)
+    return self._compiled_spec.pack(encoded_item)
 
   def set(self, table_idx, value):
     """Set table_idx to value."""
-    for nest_idx, element in enumerate(nest.flatten(value)):
+    for nest_idx, element in enumerate(self._compiled_spec.flatten(value)):
       self._array(nest_idx)[table_idx] = element
 
+
+
+class MemmapNumpyStorage(NumpyStorage):
+  """A NumpyStorage whose arrays are memory mapped `.npy` files.
+
+  Each flat buffer is stored in `directory/bufferN.npy`, so the storage does not
+  need to fit in RAM, and checkpoints only save the (small) state of the replay
+  buffer instead of serializing every array. Creating a storage on a directory
+  that already contains the files reopens them without copying, so a replay
+  buffer can be restored instantly after a restart.
+
+  The files always hold the latest data: restoring an older checkpoint of the
+  replay buffer brings back its cursor, but rows written after that checkpoint
+  keep their newer content.
+  """
+
+  def __init__(self, data_spec, capacity, directory):
+    """Creates or reopens a MemmapNumpyStorage.
+
+    Args:
+      data_spec: An ArraySpec or a list/tuple/nest of ArraySpecs describing a
+        single item that can be stored in this table.
+      capacity: The maximum number of items that can be stored in the buffer.
+      directory: Local directory holding the memory mapped files. It is created
+        if needed.
+
+    Raises:
+      ValueError: If data_spec is not an instance or nest of ArraySpecs, or if
+        existing files in directory do not match the data_spec and capacity.
+    """
+    super(MemmapNumpyStorage, self).__init__(data_spec, capacity)
+    self._directory = directory
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    self._memmaps = tf.contrib.checkpoint.NoDependency([])
+    self._arrays = tf.contrib.checkpoint.NoDependency([])
+    for index, spec in enumerate(self._flat_specs):
+      memmap = self._open_memmap(index, spec)
+      self._memmaps.append(memmap)
+      self._arrays.append(memmap.view(np.ndarray))
+
+  @property
+  def directory(self):
+    return self._directory
+
+  def _open_memmap(self, index, spec):
+    """Opens the file of a flat buffer, creating it if it does not exist."""
+    path = os.path.join(self._directory,
+                        '{}.npy'.format(self._buf_names[index]))
+    shape = (self._capacity,) + spec.shape
+    if not os.path.exists(path):
+      return np.lib.format.open_memmap(path, mode='w+', dtype=spec.dtype,
+                                       shape=shape)
+    memmap = np.lib.format.open_memmap(path, mode='r+')
+    if memmap.shape != shape or memmap.dtype != spec.dtype:
+      raise ValueError(
+          'Existing file {} has shape {} and dtype {}, but shape {} and dtype '
+          '{} were expected.'.format(path, memmap.shape, memmap.dtype, shape,
+                                     spec.dtype))
+    return memmap
+
+  def _array(self, index):
+    return self._arrays[index]
+
+  def flush(self):
+    """Writes any pending changes of the arrays to disk."""
+    for memmap in self._memmaps:
+      memmap.flush()
@@ -23,25 +23,39 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import pickle
+import io
 import threading
 
 import numpy as np
 import tensorflow as tf
 
 from tf_agents.environments import trajectory
+from tf_agents.replay_buffers import numpy_storage
 from tf_agents.replay_buffers import py_uniform_replay_buffer
 from tf_agents.specs import array_spec
 
+nest = tf.contrib.framework.nest
+
 
 class FrameBuffer(tf.contrib.checkpoint.PythonStateWrapper):
   """Saves some frames in a memory efficient way.
 
+  Each distinct frame is stored once, in a slot of a contiguous slab of frames
+  that grows by doubling; slots of deleted frames are reused. Frames are
+  referred to by their slot, so a batch of observations is rebuilt with a
+  single gather from the slab.
+
   Thread safety: cannot add multiple frames in parallel.
   """
 
-  def __init__(self):
-    self._frames = {}
+  def __init__(self, initial_capacity=256):
+    """Creates a FrameBuffer.
+
+    Args:
+      initial_capacity: Number of frames the slab is first allocated for.
+    """
+    self._initial_capacity = initial_capacity
+    self.clear()
 
   def add_frame(self, frame):
     """Add a frame to the buffer.
@@ -50,48 +64,117 @@ class FrameBuffer(tf.contrib.checkpoint.PythonStateWrapper):
       frame: Numpy array.
 
     Returns:
-      A deduplicated frame.
+      The slot of the deduplicated frame.
     """
-    h = hash(frame.tostring())
-    if h in self._frames:
-      _, refcount = self._frames[h]
-      self._frames[h] = (frame, refcount + 1)
-      return h
-    self._frames[h] = (frame, 1)
-    return h
+    frame = np.ascontiguousarray(frame)
+    h = hash(frame.tobytes())
+    slot = self._slots.get(h)
+    # Compare the contents to guard against hash collisions.
+    if slot is not None and np.array_equal(self._slab[slot], frame):
+      self._refcounts[slot] += 1
+      return slot
+    slot = self._allocate_slot(frame)
+    self._slab[slot] = frame
+    self._refcounts[slot] = 1
+    self._hashes[slot] = h
+    self._slots.setdefault(h, slot)
+    return slot
+
+  def _allocate_slot(self, frame):
+    """Returns a free slot, allocating or growing the slab if needed."""
+    if self._free_slots:
+      return self._free_slots.pop()
+    if self._slab is None:
+      self._slab = np.empty((self._initial_capacity,) + frame.shape,
+                            dtype=frame.dtype)
+      self._refcounts = np.zeros(self._initial_capacity, dtype=np.int64)
+      self._hashes = np.zeros(self._initial_capacity, dtype=np.int64)
+    elif self._num_slots == len(self._slab):
+      self._slab = np.concatenate([self._slab, np.empty_like(self._slab)])
+      self._refcounts = np.concatenate(
+          [self._refcounts, np.zeros_like(self._refcounts)])
+      self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+    slot = self._num_slots
+    self._num_slots += 1
+    return slot
 
   def __len__(self):
-    return len(self._frames)
+    return self._num_slots - len(self._free_slots)
 
   def _serialize(self):
-    """Callback for `PythonStateWrapper` to serialize the dictionary."""
-    return pickle.dumps(self._frames)
+    """Callback for `PythonStateWrapper` to serialize the frames."""
+    stream = io.BytesIO()
+    if self._slab is None:
+      np.savez(stream)
+    else:
+      np.savez(stream, slab=self._slab[:self._num_slots],
+               refcounts=self._refcounts[:self._num_slots])
+    return stream.getvalue()
 
   def _deserialize(self, string_value):
-    """Callback for `PythonStateWrapper` to deserialize the array."""
-    self._frames = pickle.loads(string_value)
+    """Callback for `PythonStateWrapper` to deserialize the frames."""
+    self.clear()
+    arrays = np.load(io.BytesIO(string_value))
+    if 'slab' not in arrays:
+      return
+    self._slab = arrays['slab']
+    self._refcounts = arrays['refcounts']
+    self._num_slots = len(self._slab)
+    self._hashes = np.zeros(self._num_slots, dtype=np.int64)
+    # Hashes of bytes are salted per process, so they are recomputed.
+    for slot in range(self._num_slots):
+      if self._refcounts[slot] > 0:
+        h = hash(self._slab[slot].tobytes())
+        self._hashes[slot] = h
+        self._slots.setdefault(h, slot)
+      else:
+        self._free_slots.append(slot)
 
   def compress(self, observation, split_axis=-1):
     # e.g. When split_axis is -1, turns an array of size 84x84x4
-    # into a list of arrays of size 84x84x1.
-    frame_list = np.split(observation, observation.shape[split_axis],
-                          split_axis)
-    return np.array([self.add_frame(f) for f in frame_list])
+    # into the slots of 4 frames of size 84x84.
+    frames = np.moveaxis(observation, split_axis, 0)
+    return np.array([self.add_frame(f) for f in frames], dtype=np.int64)
 
   def decompress(self, observation, split_axis=-1):
-    frames = [self._frames[h][0] for h in observation]
-    return np.concatenate(frames, axis=split_axis)
+    """Rebuilds observations from an array of frame slots.
+
+    Args:
+      observation: Integer array of frame slots, of shape [..., num_frames].
+        Any leading dimensions are treated as batch dimensions.
+      split_axis: The axis of the observation along which frames are
+        concatenated.
+
+    Returns:
+      A numpy array with the leading dimensions of `observation`, followed by
+      the shape of the original (uncompressed) observation.
+    """
+    observation = np.asarray(observation)
+    # [outer_dims..., num_frames, frame_shape...]
+    frames = self._slab[observation]
+    num_outer_dims = observation.ndim - 1
+    axis = split_axis % (frames.ndim - num_outer_dims)
+    return np.moveaxis(frames, num_outer_dims, num_outer_dims + axis)
 
   def on_delete(self, observation, split_axis=-1):
-    for h in observation:
-      frame, refcount = self._frames[h]
-      if refcount > 1:
-        self._frames[h] = (frame, refcount - 1)
-      else:
-        del self._frames[h]
+    del split_axis  # Unused.
+    for slot in np.ravel(observation):
+      self._refcounts[slot] -= 1
+      if self._refcounts[slot] == 0:
+        h = int(self._hashes[slot])
+        if self._slots.get(h) == slot:
+          del self._slots[h]
+        self._free_slots.append(slot)
 
   def clear(self):
-    self._frames = {}
+    self._slab = None
+    self._refcounts = None
+    self._hashes = None
+    # Slot of the frame with a given hash.
+    self._slots = {}
+    self._free_slots = []
+    # Number of slots used so far, including the free ones.
+    self._num_slots = 0
 
 
 class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
@@ -108,12 +191,30 @@ class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
   trajectory.Trajectory instances.
   """
 
-  def __init__(self, data_spec, capacity, log_interval=None):
+  def __init__(self,
+               data_spec,
+               capacity,
+               log_interval=None,
+               storage_fn=numpy_storage.NumpyStorage):
+    """Creates a PyHashedReplayBuffer.
+
+    Args:
+      data_spec: The spec of a `Trajectory`.
+      capacity: The maximum number of items that can be stored in the buffer.
+      log_interval: Optional number of added items between logs of the number
+        of frames stored.
+      storage_fn: Function to create the storage of the encoded items
+        `storage_fn(data_spec, capacity)`. Only the frame hashes go to this
+        storage; the frames themselves are kept in memory.
+
+    Raises:
+      ValueError: If data_spec is not the spec of a `Trajectory`.
+    """
     if not isinstance(data_spec, trajectory.Trajectory):
       raise ValueError(
           'data_spec must be the spec of a trajectory: {}'.format(data_spec))
     super(PyHashedReplayBuffer, self).__init__(
-        data_spec, capacity)
+        data_spec, capacity, storage_fn=storage_fn)
 
     self._frame_buffer = FrameBuffer()
     self._lock_frame_buffer = threading.Lock()
@@ -148,6 +249,14 @@ class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
 
     return traj._replace(observation=observation)
 
+  def _encode_items(self, trajs):
+    flat_trajs = nest.flatten(trajs)
+    encoded = [
+        self._encode(nest.pack_sequence_as(trajs, [a[i] for a in flat_trajs]))
+        for i in range(len(trajs.step_type))
+    ]
+    return nest.map_structure(lambda *arrays: np.stack(arrays), *encoded)
+
   def _decode(self, encoded_trajectory):
     """Decodes a trajectory.
 
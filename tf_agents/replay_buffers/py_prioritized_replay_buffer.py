@@ -0,0 +1,150 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Prioritized replay buffer in Python.
+
+Items are sampled proportionally to their priority, stored in a sum-tree, see
+"Prioritized Experience Replay", Schaul et al., 2015
+  https://arxiv.org/abs/1511.05952
+
+New items are added with the largest priority seen so far. After training on a
+sample, priorities are typically refreshed from the per-sample losses, e.g.
+with a DqnAgent:
+
+  experience, buffer_info = replay_buffer.get_next(
+      sample_batch_size=64, num_steps=2)
+  loss_info = agent.train(experience)
+  replay_buffer.update_priorities(buffer_info.ids, loss_info.extra.td_loss)
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import sum_tree
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.specs import array_spec
+
+nest = tf.contrib.framework.nest
+
+
+class PyPrioritizedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
+  """A Python-based replay buffer that samples items by priority.
+
+  Writing and reading to this replay buffer is thread safe.
+
+  Unlike PyUniformReplayBuffer, get_next returns a 2-tuple of the sampled items
+  and a `BufferInfo(ids, probabilities)`, where ids are the storage indices of
+  the sampled items (or of the first item of each sub-episode) to be passed to
+  update_priorities.
+  """
+
+  def __init__(self, data_spec, capacity):
+    """Creates a PyPrioritizedReplayBuffer.
+
+    Args:
+      data_spec: An ArraySpec or a list/tuple/nest of ArraySpecs describing a
+        single item that can be stored in this buffer.
+      capacity: The maximum number of items that can be stored in the buffer.
+    """
+    super(PyPrioritizedReplayBuffer, self).__init__(data_spec, capacity)
+    self._sum_tree = sum_tree.SumTree(capacity)
+
+  def update_priorities(self, ids, priorities):
+    """Updates the priorities of previously sampled items.
+
+    Args:
+      ids: Integer array of ids, as returned in the BufferInfo of get_next.
+      priorities: Array of priorities with the same shape as ids, e.g. the
+        per-sample TD losses. Absolute values are used.
+    """
+    with self._lock:
+      self._sum_tree.set(ids, np.abs(priorities))
+
+  def _add_batch(self, items):
+    with self._lock:
+      idx = self._np_state.cur_id
+      super(PyPrioritizedReplayBuffer, self)._add_batch(items)
+      self._sum_tree.set(idx, self._sum_tree.max_priority)
+
+  def _add_batch_sequence(self, items):
+    num_items = min(len(nest.flatten(items)[0]), self._capacity)
+    with self._lock:
+      super(PyPrioritizedReplayBuffer, self)._add_batch_sequence(items)
+      ids = (self._np_state.cur_id - np.arange(1, num_items + 1)) % (
+          self._capacity)
+      self._sum_tree.set(ids, self._sum_tree.max_priority)
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    num_steps_value = num_steps if num_steps is not None else 1
+    with self._lock:
+      size = self._np_state.size
+      if size < num_steps_value or size <= 0:
+        raise ValueError('Read error: not enough items in the replay buffer.')
+
+      # Sub-episodes starting in the last num_steps - 1 items would wrap
+      # around the head of the circular buffer, so those items are not
+      # sampled and the probabilities are normalized over the valid starts.
+      exclude = (self._np_state.cur_id - np.arange(1, num_steps_value)) % (
+          self._capacity)
+      ids, probabilities = self._sum_tree.sample(
+          sample_batch_size, exclude=exclude)
+
+      item = self._read(ids, num_steps)
+
+    item = self._maybe_unstack_time_steps(item, sample_batch_size, num_steps,
+                                          time_stacked)
+    buffer_info = tf_uniform_replay_buffer.BufferInfo(
+        ids=ids, probabilities=probabilities.astype(np.float32))
+    return item, buffer_info
+
+  def _as_dataset(self, sample_batch_size=None, num_steps=None,
+                  num_parallel_calls=None):
+    if num_parallel_calls is not None:
+      raise NotImplementedError('PyPrioritizedReplayBuffer does not support '
+                                'num_parallel_calls (must be None).')
+
+    outer_dims = () if sample_batch_size is None else (sample_batch_size,)
+    data_spec = self._data_spec
+    if num_steps is not None:
+      data_spec = array_spec.add_outer_dims_nest(data_spec, (num_steps,))
+    if outer_dims:
+      data_spec = array_spec.add_outer_dims_nest(data_spec, outer_dims)
+    info_spec = tf_uniform_replay_buffer.BufferInfo(
+        ids=array_spec.ArraySpec(outer_dims, np.int64),
+        probabilities=array_spec.ArraySpec(outer_dims, np.float32))
+    sample_spec = (data_spec, info_spec)
+    shapes = tuple(s.shape for s in nest.flatten(sample_spec))
+    dtypes = tuple(s.dtype for s in nest.flatten(sample_spec))
+
+    def generator_fn():
+      while True:
+        sample = self._get_next(sample_batch_size=sample_batch_size,
+                                num_steps=num_steps, time_stacked=True)
+        yield tuple(nest.flatten(sample))
+
+    return tf.data.Dataset.from_generator(generator_fn, dtypes, shapes).map(
+        lambda *items: nest.pack_sequence_as(sample_spec, items))
+
+  def _clear(self):
+    with self._lock:
+      super(PyPrioritizedReplayBuffer, self)._clear()
+      self._sum_tree.clear()
@@ -18,6 +18,7 @@
 from __future__ import division
 from __future__ import unicode_literals
 
+import functools
 import os
 
 from absl.testing import parameterized
@@ -27,7 +28,9 @@ import tensorflow as tf
 from tf_agents.environments import time_step as ts
 from tf_agents.environments import trajectory
 from tf_agents.policies import policy_step
+from tf_agents.replay_buffers import numpy_storage
 from tf_agents.replay_buffers import py_hashed_replay_buffer
+from tf_agents.replay_buffers import py_prioritized_replay_buffer
 from tf_agents.replay_buffers import py_uniform_replay_buffer
 from tf_agents.specs import array_spec
 from tf_agents.utils import nest_utils
@@ -49,10 +52,42 @@ class FrameBufferTest(tf.test.TestCase):
     fb.on_delete([h])
     self.assertEqual(1, len(fb))
 
+  def testCompressDecompressBatch(self):
+    fb = py_hashed_replay_buffer.FrameBuffer(initial_capacity=2)
+    frames = np.random.randint(low=0, high=256, size=[6, 8, 8, 1],
+                               dtype=np.uint8)
+    observations = np.stack(
+        [np.concatenate(frames[i:i + 4], axis=-1) for i in range(3)])
+    slots = np.stack([fb.compress(o) for o in observations])
+    # Frames shared by the stacked observations are stored once.
+    self.assertEqual(6, len(fb))
+    self.assertAllEqual(observations, fb.decompress(slots))
+    self.assertAllEqual(observations[1], fb.decompress(slots[1]))
+
+    fb.on_delete(slots[0])
+    self.assertEqual(5, len(fb))
+    # The freed slot is reused.
+    new_frame = np.full([8, 8, 1], 7, dtype=np.uint8)
+    self.assertEqual(slots[0, 0], fb.compress(new_frame)[0])
+    self.assertAllEqual(observations[2], fb.decompress(slots[2]))
+
+  def testSerialize(self):
+    fb = py_hashed_replay_buffer.FrameBuffer()
+    observation = np.random.randint(low=0, high=256, size=[8, 8, 4],
+                                    dtype=np.uint8)
+    slots = fb.compress(observation)
+    restored_fb = py_hashed_replay_buffer.FrameBuffer()
+    restored_fb._deserialize(fb._serialize())
+    self.assertEqual(4, len(restored_fb))
+    self.assertAllEqual(observation, restored_fb.decompress(slots))
+    # Restored frames are deduplicated.
+    restored_fb.compress(observation)
+    self.assertEqual(4, len(restored_fb))
+
 
 class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
-  def _generate_replay_buffer(self, rb_cls):
+  def _generate_replay_buffer(self, rb_cls, sequence_length=None):
     stack_count = 4
     shape = (15, 15, stack_count)
     single_shape = (15, 15, 1)
@@ -83,10 +118,18 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
     self._transition_count = len(time_steps) - 1
     dummy_action = policy_step.PolicyStep(np.int32(0))
-    for k in range(self._transition_count):
-      self._replay_buffer.add_batch(nest_utils.batch_nested_array(
-          trajectory.from_transition(
-              time_steps[k], dummy_action, time_steps[k + 1])))
+    trajectories = [
+        nest_utils.batch_nested_array(trajectory.from_transition(
+            time_steps[k], dummy_action, time_steps[k + 1]))
+        for k in range(self._transition_count)
+    ]
+    if sequence_length is None:
+      for traj in trajectories:
+        self._replay_buffer.add_batch(traj)
+    else:
+      for k in range(0, self._transition_count, sequence_length):
+        self._replay_buffer.add_batch_sequence(
+            nest_utils.stack_nested_arrays(trajectories[k:k + sequence_length]))
 
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
@@ -111,6 +154,21 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
         self.assertAllEqual(traj.observation[:, :, 0] + 3,
                             traj.observation[:, :, 3])
 
+  @parameterized.named_parameters(
+      [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+  def testAddBatchSequence(self, rb_cls):
+    self._generate_replay_buffer(rb_cls=rb_cls)
+    expected = self._replay_buffer.gather_all()
+    # Sequences longer than the capacity only keep their last items.
+    for sequence_length in [5, 40]:
+      self._generate_replay_buffer(
+          rb_cls=rb_cls, sequence_length=sequence_length)
+      self.assertEqual(32, self._replay_buffer.size)
+      items = self._replay_buffer.gather_all()
+      for item_field, expected_field in zip(items, expected):
+        self.assertAllEqual(expected_field, item_field)
+
   def testSampleDoesNotCrossHead(self):
     np.random.seed(12345)
 
@@ -195,6 +253,29 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
       self.assertEqual(traj.observation.shape, (3, 15, 15, 4))
       self.assertEqual(traj.action.shape, (3,))
 
+  @parameterized.named_parameters(
+      [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+  def testGetNextBatchWithNumSteps(self, rb_cls):
+    self._generate_replay_buffer(rb_cls=rb_cls)
+
+    traj = self._replay_buffer.get_next(sample_batch_size=6, num_steps=3)
+    self.assertEqual(traj.observation.shape, (6, 3, 15, 15, 4))
+    self.assertEqual(traj.action.shape, (6, 3))
+    # Each sampled window holds consecutive items of the buffer.
+    first_frames = traj.observation[:, :, 0, 0, 0]
+    self.assertAllEqual(first_frames[:, 0] + 1, first_frames[:, 1])
+    self.assertAllEqual(first_frames[:, 1] + 1, first_frames[:, 2])
+    self.assertAllEqual(traj.observation[..., 0] + 3,
+                        traj.observation[..., 3])
+
+    steps = self._replay_buffer.get_next(
+        sample_batch_size=6, num_steps=3, time_stacked=False)
+    self.assertLen(steps, 3)
+    for step in steps:
+      self.assertEqual(step.observation.shape, (6, 15, 15, 4))
+    self.assertAllEqual(steps[0].observation + 1, steps[1].observation)
+
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
        ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
@@ -230,5 +311,172 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
                             traj.observation[:, :, 3])
 
 
+class PyUniformReplayBufferWithinEpisodesTest(tf.test.TestCase):
+
+  def _create_replay_buffer(self, capacity=10, num_items=23,
+                            sequence_length=None):
+    data_spec = trajectory.Trajectory(
+        step_type=array_spec.ArraySpec((), np.int32),
+        observation=array_spec.ArraySpec((), np.int32),
+        action=array_spec.ArraySpec((), np.int32),
+        policy_info=(),
+        next_step_type=array_spec.ArraySpec((), np.int32),
+        reward=array_spec.ArraySpec((), np.float32),
+        discount=array_spec.ArraySpec((), np.float32))
+    replay_buffer = py_uniform_replay_buffer.PyUniformReplayBuffer(
+        data_spec=data_spec, capacity=capacity, sample_within_episodes=True)
+    # Episodes of 3 steps, each followed by a boundary.
+    step_types = [ts.StepType.FIRST, ts.StepType.MID, ts.StepType.MID,
+                  ts.StepType.LAST]
+    items = []
+    for i in range(num_items):
+      items.append(trajectory.Trajectory(
+          step_type=np.array([step_types[i % 4]], dtype=np.int32),
+          observation=np.array([i], dtype=np.int32),
+          action=np.array([0], dtype=np.int32),
+          policy_info=(),
+          next_step_type=np.array([step_types[(i + 1) % 4]], dtype=np.int32),
+          reward=np.array([1.], dtype=np.float32),
+          discount=np.array([1.], dtype=np.float32)))
+    if sequence_length is None:
+      for item in items:
+        replay_buffer.add_batch(item)
+    else:
+      for i in range(0, num_items, sequence_length):
+        replay_buffer.add_batch_sequence(
+            nest_utils.stack_nested_arrays(items[i:i + sequence_length]))
+    return replay_buffer
+
+  def testSampleWithinEpisodes(self):
+    replay_buffer = self._create_replay_buffer()
+    items = replay_buffer.get_next(sample_batch_size=1000, num_steps=3)
+    self.assertEqual((1000, 3), items.observation.shape)
+    # Only the last step of a window can be a boundary.
+    self.assertFalse(np.any(items.step_type[:, :-1] == ts.StepType.LAST))
+    self.assertAllEqual(items.observation[:, 0] + 2, items.observation[:, 2])
+    # Items 13 to 22 are in the buffer and 15 and 19 are boundaries.
+    self.assertEqual({13, 16, 17, 20}, set(items.observation[:, 0]))
+
+  def testSampleWithinEpisodesAddedAsSequences(self):
+    replay_buffer = self._create_replay_buffer(sequence_length=6)
+    items = replay_buffer.get_next(sample_batch_size=1000, num_steps=3)
+    self.assertFalse(np.any(items.step_type[:, :-1] == ts.StepType.LAST))
+    self.assertEqual({13, 16, 17, 20}, set(items.observation[:, 0]))
+
+  def testSampleSingleWithinEpisodes(self):
+    replay_buffer = self._create_replay_buffer()
+    first, _, third = replay_buffer.get_next(num_steps=3, time_stacked=False)
+    self.assertIn(first.observation, [13, 16, 17, 20])
+    self.assertEqual(first.observation + 2, third.observation)
+
+  def testNoWindowWithinEpisodes(self):
+    replay_buffer = self._create_replay_buffer()
+    with self.assertRaises(ValueError):
+      replay_buffer.get_next(num_steps=5)
+
+  def testRequiresTrajectory(self):
+    with self.assertRaises(ValueError):
+      py_uniform_replay_buffer.PyUniformReplayBuffer(
+          data_spec=array_spec.ArraySpec((), np.int32), capacity=10,
+          sample_within_episodes=True)
+
+
+class MemmapNumpyStorageTest(tf.test.TestCase):
+
+  def testReplayBufferWithMemmapStorage(self):
+    directory = os.path.join(self.get_temp_dir(), 'replay_buffer')
+    data_spec = array_spec.ArraySpec((2,), np.int32)
+    storage_fn = functools.partial(numpy_storage.MemmapNumpyStorage,
+                                   directory=directory)
+    replay_buffer = py_uniform_replay_buffer.PyUniformReplayBuffer(
+        data_spec=data_spec, capacity=10, storage_fn=storage_fn)
+    for i in range(13):
+      replay_buffer.add_batch(np.array([[i, -i]], dtype=np.int32))
+    items = replay_buffer.get_next(sample_batch_size=20, num_steps=2)
+    self.assertAllEqual(items[:, 0, 0] + 1, items[:, 1, 0])
+    self.assertAllEqual(-items[:, :, 0], items[:, :, 1])
+
+    # A new storage on the same directory sees the items.
+    replay_buffer._storage.flush()
+    storage = numpy_storage.MemmapNumpyStorage(data_spec, 10, directory)
+    self.assertAllEqual([[10, -10], [11, -11], [12, -12]],
+                        storage.get(np.arange(3)))
+
+  def testReopenWithDifferentSpecRaises(self):
+    directory = os.path.join(self.get_temp_dir(), 'storage')
+    numpy_storage.MemmapNumpyStorage(
+        array_spec.ArraySpec((2,), np.int32), 10, directory)
+    with self.assertRaises(ValueError):
+      numpy_storage.MemmapNumpyStorage(
+          array_spec.ArraySpec((3,), np.int32), 10, directory)
+
+
+class PyPrioritizedReplayBufferTest(tf.test.TestCase):
+
+  def _create_replay_buffer(self, capacity=10, num_items=15):
+    replay_buffer = py_prioritized_replay_buffer.PyPrioritizedReplayBuffer(
+        data_spec=array_spec.ArraySpec((), np.int32), capacity=capacity)
+    for i in range(num_items):
+      replay_buffer.add_batch(np.array([i], dtype=np.int32))
+    return replay_buffer
+
+  def testAddBatchSequence(self):
+    replay_buffer = py_prioritized_replay_buffer.PyPrioritizedReplayBuffer(
+        data_spec=array_spec.ArraySpec((), np.int32), capacity=10)
+    replay_buffer.add_batch_sequence(np.arange(7, dtype=np.int32)[:, None])
+    replay_buffer.update_priorities(np.arange(7), np.zeros(7))
+    replay_buffer.add_batch_sequence(np.arange(7, 15, dtype=np.int32)[:, None])
+    item, buffer_info = replay_buffer.get_next(sample_batch_size=100)
+    self.assertTrue(np.all(item >= 7))
+    self.assertAllEqual(item % 10, buffer_info.ids)
+
+  def testSampleWithMaxPriority(self):
+    replay_buffer = self._create_replay_buffer()
+    item, buffer_info = replay_buffer.get_next(sample_batch_size=20)
+    self.assertEqual((20,), item.shape)
+    self.assertTrue(np.all(item >= 5))
+    self.assertAllEqual(item % 10, buffer_info.ids)
+    self.assertAllClose(np.full([20], 0.1), buffer_info.probabilities)
+
+  def testUpdatePriorities(self):
+    replay_buffer = self._create_replay_buffer()
+    replay_buffer.update_priorities(np.arange(10), np.zeros(10))
+    replay_buffer.update_priorities([3, 8], [1., 3.])
+    item, buffer_info = replay_buffer.get_next(sample_batch_size=2000)
+    self.assertTrue(set(item).issubset({13, 8}))
+    self.assertAllClose(np.where(item == 8, 0.75, 0.25),
+                        buffer_info.probabilities)
+    self.assertNear(0.75, np.mean(item == 8), err=0.05)
+
+  def testSampleDoesNotCrossHead(self):
+    replay_buffer = self._create_replay_buffer()
+    # A sub-episode starting at the newest item (14) would wrap around the
+    # head of the buffer, so it is never sampled despite its priority.
+    replay_buffer.update_priorities(np.arange(10), np.zeros(10))
+    replay_buffer.update_priorities([3, 4], [1., 3.])
+    item, buffer_info = replay_buffer.get_next(sample_batch_size=5,
+                                               num_steps=2)
+    self.assertAllEqual(np.tile([[13, 14]], [5, 1]), item)
+    self.assertAllEqual(np.full([5], 3), buffer_info.ids)
+    self.assertAllClose(np.ones([5]), buffer_info.probabilities)
+
+  def testSampleOnlyInvalidStartsRaises(self):
+    replay_buffer = self._create_replay_buffer()
+    replay_buffer.update_priorities(np.arange(10), np.zeros(10))
+    replay_buffer.update_priorities([4], [1.])
+    with self.assertRaises(ValueError):
+      replay_buffer.get_next(sample_batch_size=5, num_steps=2)
+
+  def testAsDataset(self):
+    replay_buffer = self._create_replay_buffer()
+    ds = replay_buffer.as_dataset(sample_batch_size=4, num_steps=3)
+    item, buffer_info = ds.make_one_shot_iterator().get_next()
+    with self.test_session() as sess:
+      item_, buffer_info_ = sess.run([item, buffer_info])
+      self.assertEqual((4, 3), item_.shape)
+      self.assertAllEqual(item_[:, 0] + 2, item_[:, 2])
+      self.assertEqual((4,), buffer_info_.ids.shape)
+
+
 if __name__ == '__main__':
   tf.test.main()
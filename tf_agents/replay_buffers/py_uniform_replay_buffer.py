@@ -32,6 +32,8 @@ import threading
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.environments import time_step as ts
+from tf_agents.environments import trajectory
 from tf_agents.replay_buffers import numpy_storage
 from tf_agents.replay_buffers import replay_buffer
 from tf_agents.specs import array_spec
@@ -39,6 +41,10 @@ from tf_agents.utils import nest_utils
 
 nest = tf.contrib.framework.nest
 
+# Number of times windows crossing an episode boundary are redrawn before
+# falling back to enumerating all the valid windows.
+_MAX_RESAMPLING_ROUNDS = 10
+
 
 class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
   """A Python-based replay buffer that supports uniform sampling.
@@ -48,21 +54,45 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
   This replay buffer can be subclassed to change the encoding used for the
   underlying storage by overriding _encoded_data_spec, _encode, _decode, and
   _on_delete.
+
+  Sampling is vectorized: all indices for a batch are drawn at once and read
+  from the storage with a single gather per flattened array, so _decode
+  receives items with the batch (and time) dimensions as outer dimensions.
   """
 
-  def __init__(self, data_spec, capacity):
+  def __init__(self,
+               data_spec,
+               capacity,
+               sample_within_episodes=False,
+               storage_fn=numpy_storage.NumpyStorage):
     """Creates a PyUniformReplayBuffer.
 
     Args:
       data_spec: An ArraySpec or a list/tuple/nest of ArraySpecs describing a
         single item that can be stored in this buffer.
       capacity: The maximum number of items that can be stored in the buffer.
+      sample_within_episodes: Boolean, whether sub-episodes sampled with
+        num_steps > 1 must lie within one episode, i.e. contain no boundary
+        trajectory before their last step. Requires data_spec to be a
+        `Trajectory`.
+      storage_fn: Function to create the storage of the encoded items
+        `storage_fn(data_spec, capacity)`, e.g. a `functools.partial` of
+        `numpy_storage.MemmapNumpyStorage` to keep the items on disk.
+
+    Raises:
+      ValueError: If sample_within_episodes is True and data_spec is not a
+        `Trajectory`.
     """
     super(PyUniformReplayBuffer, self).__init__(data_spec, capacity)
-
-    self._storage = numpy_storage.NumpyStorage(self._encoded_data_spec(),
-                                               capacity)
-    self._lock = threading.Lock()
+    if sample_within_episodes and not isinstance(data_spec,
+                                                 trajectory.Trajectory):
+      raise ValueError(
+          'sample_within_episodes requires a Trajectory data_spec, got: '
+          '{}'.format(data_spec))
+    self._sample_within_episodes = sample_within_episodes
+
+    self._storage = storage_fn(self._encoded_data_spec(), capacity)
+    self._lock = threading.RLock()
     self._np_state = tf.contrib.checkpoint.NumpyState()
 
     # Adding elements to the replay buffer is done in a circular way.
@@ -74,6 +104,12 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
     # Total number of items that went through the replay buffer.
     self._np_state.item_count = np.int64(0)
 
+    if self._sample_within_episodes:
+      # Number of boundaries added before each item. A window lies within one
+      # episode iff its first and last items have the same count.
+      self._np_state.boundary_count = np.int64(0)
+      self._np_state.boundaries_before = np.zeros(capacity, dtype=np.int64)
+
   def _encoded_data_spec(self):
     """Spec of data items after encoding using _encode."""
     return self._data_spec
@@ -82,8 +118,12 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
     """Encodes an item (before adding it to the buffer)."""
     return item
 
+  def _encode_items(self, items):
+    """Encodes items stacked along an extra outer dimension."""
+    return self._encode(items)
+
   def _decode(self, item):
-    """Decodes an item."""
+    """Decodes an item, or a batch of items with extra outer dimensions."""
     return item
 
   def _on_delete(self, encoded_item):
@@ -107,46 +147,158 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
         # If we are at capacity, we are deleting element cur_id.
         self._on_delete(self._storage.get(self._np_state.cur_id))
       self._storage.set(self._np_state.cur_id, self._encode(item))
+      if self._sample_within_episodes:
+        self._np_state.boundaries_before[self._np_state.cur_id] = (
+            self._np_state.boundary_count)
+        if item.step_type == ts.StepType.LAST:
+          self._np_state.boundary_count += 1
       self._np_state.size = np.minimum(self._np_state.size + 1,
                                        self._capacity)
       self._np_state.cur_id = (self._np_state.cur_id + 1) % self._capacity
       self._np_state.item_count += 1
 
+  def _add_batch_sequence(self, items):
+    outer_shape = nest_utils.get_outer_array_shape(items, self._data_spec)
+    if len(outer_shape) != 2 or outer_shape[1] != 1:
+      raise NotImplementedError('PyUniformReplayBuffer only supports a batch '
+                                'size of 1, but received `items` with outer '
+                                'shape {}.'.format(outer_shape))
+
+    num_items = outer_shape[0]
+    # Only the last `capacity` items would remain in the buffer.
+    num_skipped = max(num_items - self._capacity, 0)
+    items = nest.map_structure(lambda a: a[num_skipped:, 0], items)
+    with self._lock:
+      cur_id = (self._np_state.cur_id + num_skipped) % self._capacity
+      ids = (cur_id + np.arange(num_items - num_skipped)) % self._capacity
+      if self._np_state.size == self._capacity:
+        deleted_ids = ids
+      else:
+        # Until the buffer is full, items occupy ids [0, size).
+        deleted_ids = ids[ids < self._np_state.size]
+      if deleted_ids.size:
+        self._on_delete(self._storage.get(deleted_ids))
+      self._storage.set(ids, self._encode_items(items))
+      if self._sample_within_episodes:
+        is_last = items.step_type == ts.StepType.LAST
+        self._np_state.boundaries_before[ids] = (
+            self._np_state.boundary_count + np.cumsum(is_last) - is_last)
+        self._np_state.boundary_count += np.sum(is_last)
+      self._np_state.size = np.minimum(self._np_state.size + num_items,
+                                       self._capacity)
+      self._np_state.cur_id = (self._np_state.cur_id + num_items) % (
+          self._capacity)
+      self._np_state.item_count += num_items
+
   def _get_next(self,
                 sample_batch_size=None,
                 num_steps=None,
                 time_stacked=True):
     num_steps_value = num_steps if num_steps is not None else 1
-    def get_single():
-      """Gets a single item from the replay buffer."""
-      with self._lock:
-        if self._np_state.size <= 0:
-          raise ValueError('Read error: empty replay buffer')
-
-        idx = np.random.randint(self._np_state.size - num_steps_value + 1)
-        if self._np_state.size == self._capacity:
-          # If the buffer is full, add cur_id (head of circular buffer) so that
-          # we sample from the range [cur_id, cur_id + size - num_steps_value].
-          # We will modulo the size below.
-          idx += self._np_state.cur_id
-
-        if num_steps is not None:
-          # TODO(b/120242830): Try getting data from numpy in one shot rather
-          # than num_steps_value.
-          item = [self._decode(self._storage.get((idx + n) % self._capacity))
-                  for n in range(num_steps)]
-        else:
-          item = self._decode(self._storage.get(idx % self._capacity))
-
-      if num_steps is not None and time_stacked:
-        item = nest_utils.stack_nested_arrays(item)
-      return item
+    with self._lock:
+      if self._np_state.size <= 0:
+        raise ValueError('Read error: empty replay buffer')
 
-    if sample_batch_size is None:
-      return get_single()
-    else:
-      samples = [get_single() for _ in range(sample_batch_size)]
-      return nest_utils.stack_nested_arrays(samples)
+      # Draw all the start indices at once; idx is a scalar when
+      # sample_batch_size is None and an array of shape [sample_batch_size]
+      # otherwise.
+      idx = self._sample_start_ids(sample_batch_size, num_steps_value)
+      if self._sample_within_episodes and num_steps_value > 1:
+        idx = self._resample_cross_episode_windows(idx, sample_batch_size,
+                                                   num_steps_value)
+
+      item = self._read(idx, num_steps)
+
+    return self._maybe_unstack_time_steps(item, sample_batch_size, num_steps,
+                                          time_stacked)
+
+  def _sample_start_ids(self, sample_batch_size, num_steps):
+    """Draws (unwrapped) start indices of windows uniformly.
+
+    Must be called while holding self._lock.
+
+    Args:
+      sample_batch_size: Number of indices to draw, or None for a scalar.
+      num_steps: Length of the windows.
+
+    Returns:
+      An integer, or an integer array of shape [sample_batch_size].
+    """
+    idx = np.random.randint(self._np_state.size - num_steps + 1,
+                            size=sample_batch_size)
+    if self._np_state.size == self._capacity:
+      # If the buffer is full, add cur_id (head of circular buffer) so that
+      # we sample from the range [cur_id, cur_id + size - num_steps].
+      # We will modulo the size below.
+      idx += self._np_state.cur_id
+    return idx
+
+  def _crosses_episodes(self, idx, num_steps):
+    """Whether the windows starting at idx contain an episode boundary."""
+    boundaries_before = self._np_state.boundaries_before
+    return (boundaries_before[(idx + num_steps - 1) % self._capacity] !=
+            boundaries_before[idx % self._capacity])
+
+  def _resample_cross_episode_windows(self, idx, sample_batch_size,
+                                      num_steps):
+    """Redraws the windows that cross an episode boundary.
+
+    Must be called while holding self._lock.
+
+    Args:
+      idx: Start indices returned by _sample_start_ids.
+      sample_batch_size: Number of indices, or None for a scalar.
+      num_steps: Length of the windows.
+
+    Returns:
+      Start indices, with the same shape as idx, of windows within an episode.
+
+    Raises:
+      ValueError: If no window of num_steps lies within an episode.
+    """
+    idx = np.atleast_1d(idx)
+    for _ in range(_MAX_RESAMPLING_ROUNDS):
+      crosses = self._crosses_episodes(idx, num_steps)
+      if not np.any(crosses):
+        return idx if sample_batch_size is not None else idx[0]
+      idx[crosses] = self._sample_start_ids(np.sum(crosses), num_steps)
+
+    # Most of the windows cross a boundary, so draw among the valid ones.
+    start = self._np_state.cur_id if self.size == self._capacity else 0
+    valid_idx = start + np.arange(self._np_state.size - num_steps + 1)
+    valid_idx = valid_idx[~self._crosses_episodes(valid_idx, num_steps)]
+    if not valid_idx.size:
+      raise ValueError('Read error: no sub-episode of {} steps within an '
+                       'episode in the replay buffer'.format(num_steps))
+    return np.random.choice(valid_idx, size=sample_batch_size)
+
+  def _read(self, idx, num_steps=None):
+    """Reads and decodes the items, or sub-episodes, starting at idx.
+
+    Must be called while holding self._lock.
+
+    Args:
+      idx: An integer or integer array with the (unwrapped) start indices.
+      num_steps: (Optional.) Length of the sub-episodes to read.
+
+    Returns:
+      The decoded items, with the shape of `idx` and then num_steps (if not
+      None) as outer dimensions.
+    """
+    if num_steps is not None:
+      # Shape [num_steps] or [sample_batch_size, num_steps].
+      idx = np.expand_dims(idx, -1) + np.arange(num_steps)
+    # A single gather per flat buffer in the storage.
+    return self._decode(self._storage.get(idx % self._capacity))
+
+  def _maybe_unstack_time_steps(self, item, sample_batch_size, num_steps,
+                                time_stacked):
+    """Splits items on the time axis when time_stacked is False."""
+    if num_steps is None or time_stacked:
+      return item
+    time_axis = 0 if sample_batch_size is None else 1
+    return tuple(_take_nested_arrays(item, step, time_axis)
+                 for step in range(num_steps))
 
   def _as_dataset(self, sample_batch_size=None, num_steps=None,
                   num_parallel_calls=None):
@@ -165,12 +317,8 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
 
     def generator_fn():
       while True:
-        if sample_batch_size is not None:
-          batch = [self._get_next(num_steps=num_steps, time_stacked=False)
-                   for _ in range(sample_batch_size)]
-          item = nest_utils.stack_nested_arrays(batch)
-        else:
-          item = self._get_next(num_steps=num_steps, time_stacked=False)
+        item = self._get_next(sample_batch_size=sample_batch_size,
+                              num_steps=num_steps, time_stacked=False)
         yield tuple(nest.flatten(item))
 
     def time_stack(*structures):
@@ -186,12 +334,19 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
       return ds
 
   def _gather_all(self):
-    data = [self._decode(self._storage.get(idx))
-            for idx in range(self._capacity)]
-    stacked = nest_utils.stack_nested_arrays(data)
+    with self._lock:
+      stacked = self._decode(self._storage.get(np.arange(self._capacity)))
     batched = nest.map_structure(lambda t: np.expand_dims(t, 0), stacked)
     return batched
 
   def _clear(self):
     self._np_state.size = np.int64(0)
     self._np_state.cur_id = np.int64(0)
+    if self._sample_within_episodes:
+      self._np_state.boundary_count = np.int64(0)
+
+
+def _take_nested_arrays(nested_array, index, axis):
+  """Returns views of `index` along `axis` of every array in `nested_array`."""
+  index = (slice(None),) * axis + (index, Ellipsis)
+  return nest.map_structure(lambda a: a[index], nested_array)
@@ -66,6 +66,25 @@ class ReplayBuffer(tf.contrib.eager.Checkpointable):
     """
     return self._add_batch(items)
 
+  def add_batch_sequence(self, items):
+    """Adds a time-major sequence of batches of items to the replay buffer.
+
+    Equivalent to calling `add_batch` with `items[t]` for every t in order, for
+    buffers that can add the whole sequence at once.
+
+    Args:
+      items: An item or list/tuple/nest of items to be added to the replay
+        buffer. `items` must match the data_spec of this class, with
+        [num_steps, batch_size] dimensions added to the beginning of each
+        tensor/array.
+    Returns:
+      Adds `items` to the replay buffer.
+    Raises:
+      NotImplementedError: If the replay buffer does not support adding
+        sequences.
+    """
+    return self._add_batch_sequence(items)
+
   def get_next(self,
                sample_batch_size=None,
                num_steps=None,
@@ -168,6 +187,11 @@ class ReplayBuffer(tf.contrib.eager.Checkpointable):
   def _add_batch(self, items):
     """Adds a batch of items to the replay buffer."""
 
+  def _add_batch_sequence(self, items):
+    """Adds a time-major sequence of batches of items to the replay buffer."""
+    raise NotImplementedError('{} does not support add_batch_sequence.'.format(
+        type(self).__name__))
+
   @abc.abstractmethod
   def _get_next(self,
                 sample_batch_size=None,
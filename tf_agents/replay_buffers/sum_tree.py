@@ -0,0 +1,297 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Array-backed sum-trees used by the prioritized replay buffers.
+
+A sum-tree is a complete binary tree stored in a flat array where every leaf
+holds the priority of one item and every internal node holds the sum of its
+children. Node 1 is the root, the children of node i are nodes 2i and 2i + 1,
+and the leaf for item k is node `num_leaves + k`. Both updating a batch of
+priorities and sampling a batch of items proportionally to their priority take
+O(log N) vectorized steps.
+
+SumTree keeps the tree in a numpy array and TFSumTree keeps it in a
+tf.Variable.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+
+def _tree_depth(capacity):
+  """Returns the depth of a complete binary tree with >= capacity leaves."""
+  return int(np.ceil(np.log2(max(capacity, 1))))
+
+
+class SumTree(tf.contrib.checkpoint.Checkpointable):
+  """A sum-tree of priorities backed by a numpy array.
+
+  This class is not threadsafe.
+  """
+
+  def __init__(self, capacity):
+    """Creates a SumTree.
+
+    Args:
+      capacity: The number of items (leaves) in the tree.
+    """
+    self._capacity = capacity
+    self._depth = _tree_depth(capacity)
+    self._num_leaves = 2**self._depth
+    self._np_state = tf.contrib.checkpoint.NumpyState()
+    self._np_state.nodes = np.zeros(2 * self._num_leaves, dtype=np.float64)
+    self._np_state.max_priority = np.float64(1.0)
+
+  @property
+  def capacity(self):
+    return self._capacity
+
+  @property
+  def total(self):
+    """The sum of all the priorities in the tree."""
+    return self._np_state.nodes[1]
+
+  @property
+  def max_priority(self):
+    """The largest priority ever set in the tree, used for new items."""
+    return self._np_state.max_priority
+
+  def get(self, indices):
+    """Returns the priorities of the items at `indices`."""
+    return self._np_state.nodes[np.asarray(indices) + self._num_leaves]
+
+  def set(self, indices, priorities):
+    """Sets the priorities of a batch of items.
+
+    Args:
+      indices: An integer or integer array with the indices of the items.
+      priorities: A non-negative float or float array, broadcastable to the
+        shape of `indices`.
+
+    Raises:
+      ValueError: If any of the priorities is negative.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    priorities = np.broadcast_to(
+        np.asarray(priorities, dtype=np.float64), indices.shape)
+    if np.any(priorities < 0):
+      raise ValueError('Priorities must be non-negative, got: {}'.format(
+          priorities))
+    if not indices.size:
+      return
+
+    nodes = self._np_state.nodes
+    leaves = indices.ravel() + self._num_leaves
+    nodes[leaves] = priorities.ravel()
+    self._np_state.max_priority = np.maximum(self._np_state.max_priority,
+                                             np.max(priorities))
+
+    # Recompute the sums on the path from the updated leaves to the root, one
+    # level at a time.
+    parents = np.unique(leaves // 2)
+    for _ in range(self._depth):
+      nodes[parents] = nodes[2 * parents] + nodes[2 * parents + 1]
+      parents = np.unique(parents // 2)
+
+  def sample(self, sample_batch_size=None, exclude=None):
+    """Samples items proportionally to their priority.
+
+    Args:
+      sample_batch_size: (Optional.) Number of items to sample. If None, a
+        single index is sampled.
+      exclude: (Optional.) An integer array with the unique indices of items
+        that must not be sampled. They are treated as if their priority was
+        zero, without modifying the tree.
+
+    Returns:
+      A tuple (indices, probabilities) with the sampled indices and the
+      probability with which each of them was sampled.
+
+    Raises:
+      ValueError: If all the priorities in the tree (outside of `exclude`) are
+        zero.
+    """
+    nodes = self._np_state.nodes
+    if exclude is None:
+      exclude = np.zeros([0], dtype=np.int64)
+    excluded_leaves = np.asarray(exclude, dtype=np.int64).ravel() + (
+        self._num_leaves)
+    excluded = nodes[excluded_leaves]
+    total = nodes[1] - np.sum(excluded)
+    if total <= 0:
+      raise ValueError('Cannot sample from a SumTree with zero total priority.')
+
+    def mass(node, ancestors):
+      # Sum of the subtree at node minus the excluded priorities under it.
+      under = np.expand_dims(node, -1) == ancestors
+      return nodes[node] - np.sum(np.where(under, excluded, 0.), axis=-1)
+
+    values = np.random.uniform(0, total, size=sample_batch_size)
+    node = np.ones_like(values, dtype=np.int64)
+    for level in range(1, self._depth + 1):
+      ancestors = excluded_leaves >> (self._depth - level)
+      left = mass(2 * node, ancestors)
+      # Only go right when the right subtree has some mass, which guards
+      # against rounding errors sending a sample past the last leaf.
+      go_right = np.logical_and(values >= left,
+                                mass(2 * node + 1, ancestors) > 0)
+      values = np.where(go_right, values - left, values)
+      node = 2 * node + go_right
+    return node - self._num_leaves, nodes[node] / total
+
+  def clear(self):
+    self._np_state.nodes = np.zeros(2 * self._num_leaves, dtype=np.float64)
+    self._np_state.max_priority = np.float64(1.0)
+
+
+class TFSumTree(tf.contrib.checkpoint.Checkpointable):
+  """A sum-tree of priorities stored in a tf.Variable.
+
+  In graph mode, methods return ops that read or update the tree when
+  executed. This class is not threadsafe.
+  """
+
+  def __init__(self, capacity, scope='SumTree'):
+    """Creates a TFSumTree.
+
+    Args:
+      capacity: The number of items (leaves) in the tree, a python integer.
+      scope: Variable scope for the variables of the tree.
+    """
+    self._capacity = capacity
+    self._depth = _tree_depth(capacity)
+    self._num_leaves = 2**self._depth
+    with tf.variable_scope(scope):
+      self._nodes = tf.get_variable(
+          name='nodes',
+          shape=[2 * self._num_leaves],
+          dtype=tf.float64,
+          initializer=tf.zeros_initializer,
+          trainable=False,
+          use_resource=True)
+      self._max_priority = tf.get_variable(
+          name='max_priority',
+          shape=[],
+          dtype=tf.float64,
+          initializer=tf.constant_initializer(1.0, dtype=tf.float64),
+          trainable=False,
+          use_resource=True)
+
+  def variables(self):
+    return [self._nodes, self._max_priority]
+
+  @property
+  def capacity(self):
+    return self._capacity
+
+  def total(self):
+    """Returns the sum of all the priorities in the tree."""
+    return self._nodes.sparse_read(1)
+
+  def max_priority(self):
+    """Returns the largest priority ever set in the tree."""
+    return self._max_priority.value()
+
+  def get(self, indices):
+    """Returns the priorities of the items at `indices`."""
+    return self._nodes.sparse_read(tf.to_int64(indices) + self._num_leaves)
+
+  def set(self, indices, priorities):
+    """Returns an op that sets the priorities of a batch of items.
+
+    Args:
+      indices: An int Tensor with the indices of the items.
+      priorities: A float Tensor with the same number of elements as indices.
+
+    Returns:
+      An op that updates the leaves and their ancestors.
+    """
+    leaves = tf.reshape(tf.to_int64(indices), [-1]) + self._num_leaves
+    priorities = tf.reshape(tf.cast(priorities, tf.float64), [-1])
+    update = tf.scatter_update(self._nodes, leaves, priorities)
+    update_max = self._max_priority.assign(
+        tf.maximum(self._max_priority, tf.reduce_max(priorities)))
+
+    # Recompute the sums on the path from the updated leaves to the root, one
+    # level at a time. Sibling leaves share parents, which are then written
+    # several times with the same value.
+    parents = leaves // 2
+    for _ in range(self._depth):
+      with tf.control_dependencies([update]):
+        sums = (self._nodes.sparse_read(2 * parents) +
+                self._nodes.sparse_read(2 * parents + 1))
+        update = tf.scatter_update(self._nodes, parents, sums)
+      parents //= 2
+    return tf.group(update, update_max)
+
+  def sample(self, sample_batch_size=None, exclude=None):
+    """Samples items proportionally to their priority.
+
+    Args:
+      sample_batch_size: (Optional.) Number of items to sample. If None, a
+        single index is sampled.
+      exclude: (Optional.) An int Tensor with the unique indices of items that
+        must not be sampled. They are treated as if their priority was zero,
+        without modifying the tree.
+
+    Returns:
+      A tuple (indices, probabilities) of int64 and float32 Tensors, with the
+      sampled indices and the probability with which each of them was sampled.
+
+    Raises:
+      tf.errors.InvalidArgumentError: When evaluated, if all the priorities in
+        the tree (outside of `exclude`) are zero.
+    """
+    shape = () if sample_batch_size is None else (sample_batch_size,)
+    if exclude is None:
+      exclude = tf.zeros([0], dtype=tf.int64)
+    excluded_leaves = tf.reshape(tf.to_int64(exclude), [-1]) + self._num_leaves
+    excluded = self._nodes.sparse_read(excluded_leaves)
+    total = self.total() - tf.reduce_sum(excluded)
+    assert_positive = tf.assert_positive(
+        total,
+        message='Cannot sample from a TFSumTree with zero total priority.')
+    with tf.control_dependencies([assert_positive]):
+      total = tf.identity(total)
+
+    def mass(node, ancestors):
+      # Sum of the subtree at node minus the excluded priorities under it.
+      under = tf.equal(tf.expand_dims(node, -1), ancestors)
+      return self._nodes.sparse_read(node) - tf.reduce_sum(
+          tf.to_double(under) * excluded, axis=-1)
+
+    values = tf.random_uniform(shape, dtype=tf.float64) * total
+    node = tf.ones(shape, dtype=tf.int64)
+    for level in range(1, self._depth + 1):
+      ancestors = excluded_leaves // 2**(self._depth - level)
+      left = mass(2 * node, ancestors)
+      right = mass(2 * node + 1, ancestors)
+      # Only go right when the right subtree has some mass, which guards
+      # against rounding errors sending a sample past the last leaf.
+      go_right = tf.logical_and(values >= left, right > 0)
+      values = tf.where(go_right, values - left, values)
+      node = 2 * node + tf.to_int64(go_right)
+    probabilities = tf.to_float(self._nodes.sparse_read(node) / total)
+    return node - self._num_leaves, probabilities
+
+  def clear(self):
+    """Returns an op that resets all the priorities."""
+    return tf.group(
+        self._nodes.assign(tf.zeros_like(self._nodes)),
+        self._max_priority.assign(tf.constant(1.0, dtype=tf.float64)))
@@ -0,0 +1,106 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.sum_tree."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.replay_buffers import sum_tree
+
+
+class SumTreeTest(tf.test.TestCase):
+
+  def testSetUpdatesTotal(self):
+    tree = sum_tree.SumTree(capacity=5)
+    tree.set(np.arange(5), [1., 2., 3., 4., 5.])
+    self.assertAllClose(15., tree.total)
+    tree.set([0, 4], [0., 1.])
+    self.assertAllClose(10., tree.total)
+    self.assertAllClose([0., 2., 3., 4., 1.], tree.get(np.arange(5)))
+    self.assertAllClose(5., tree.max_priority)
+
+  def testSetNegativePriorityRaises(self):
+    tree = sum_tree.SumTree(capacity=4)
+    with self.assertRaises(ValueError):
+      tree.set([1], [-1.])
+
+  def testSampleProportionalToPriority(self):
+    np.random.seed(1234)
+    tree = sum_tree.SumTree(capacity=6)
+    priorities = np.array([1., 0., 2., 3., 0., 4.])
+    tree.set(np.arange(6), priorities)
+    indices, probabilities = tree.sample(20000)
+    self.assertAllClose(priorities[indices] / 10., probabilities)
+    frequencies = np.bincount(indices, minlength=6) / 20000.
+    self.assertAllClose(priorities / 10., frequencies, atol=0.02)
+
+  def testSampleEmptyRaises(self):
+    tree = sum_tree.SumTree(capacity=3)
+    with self.assertRaises(ValueError):
+      tree.sample(4)
+
+
+class TFSumTreeTest(tf.test.TestCase):
+
+  def testSetUpdatesTotal(self):
+    tree = sum_tree.TFSumTree(capacity=5)
+    set_op = tree.set(tf.range(5), tf.constant([1., 2., 3., 4., 5.]))
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(set_op)
+    self.assertAllClose(15., self.evaluate(tree.total()))
+    self.evaluate(tree.set([0, 4], tf.constant([0., 1.])))
+    self.assertAllClose(10., self.evaluate(tree.total()))
+    self.assertAllClose([0., 2., 3., 4., 1.],
+                        self.evaluate(tree.get(tf.range(5))))
+    self.assertAllClose(5., self.evaluate(tree.max_priority()))
+
+  def testSampleProportionalToPriority(self):
+    tree = sum_tree.TFSumTree(capacity=6)
+    priorities = np.array([1., 0., 2., 3., 0., 4.], dtype=np.float32)
+    set_op = tree.set(tf.range(6), priorities)
+    sample = tree.sample(20000)
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(set_op)
+    indices, probabilities = self.evaluate(sample)
+    self.assertAllClose(priorities[indices] / 10., probabilities)
+    frequencies = np.bincount(indices, minlength=6) / 20000.
+    self.assertAllClose(priorities / 10., frequencies, atol=0.02)
+
+  def testSampleEmptyRaises(self):
+    tree = sum_tree.TFSumTree(capacity=3)
+    sample = tree.sample(4)
+    self.evaluate(tf.global_variables_initializer())
+    with self.assertRaisesRegexp(tf.errors.InvalidArgumentError,
+                                 'zero total priority'):
+      self.evaluate(sample)
+
+  def testClear(self):
+    tree = sum_tree.TFSumTree(capacity=4)
+    set_op = tree.set(tf.range(4), tf.ones([4]))
+    clear_op = tree.clear()
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(set_op)
+    self.assertAllClose(4., self.evaluate(tree.total()))
+    self.evaluate(clear_op)
+    self.assertAllClose(0., self.evaluate(tree.total()))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,203 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A batched replay buffer of nests of Tensors sampled by priority.
+
+Items are stored as in TFUniformReplayBuffer, with each element of an added
+batch going to its own segment of the table, but they are sampled
+proportionally to a priority kept in a TFSumTree, see
+"Prioritized Experience Replay", Schaul et al., 2015
+  https://arxiv.org/abs/1511.05952
+
+New items are added with the largest priority seen so far. The ids returned in
+the BufferInfo are the rows of the sampled items (or of the first item of each
+sub-episode) in the table, as in PyPrioritizedReplayBuffer, which can be used
+to refresh their priorities, e.g. from the per-sample TD losses of a
+DqnAgent:
+
+  (experience, buffer_info) = replay_buffer.get_next(
+      sample_batch_size=64, num_steps=2)
+  loss_info = agent.train(experience)
+  update_op = replay_buffer.update_priorities(
+      buffer_info.ids, loss_info.extra.td_loss)
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.replay_buffers import sum_tree
+from tf_agents.replay_buffers import table
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+import gin.tf
+
+nest = tf.contrib.framework.nest
+
+
+@gin.configurable
+class TFPrioritizedReplayBuffer(tf_uniform_replay_buffer.TFUniformReplayBuffer):
+  """A TFPrioritizedReplayBuffer with batched adds and prioritized sampling."""
+
+  def __init__(self,
+               data_spec,
+               batch_size,
+               max_length=1000,
+               scope='TFPrioritizedReplayBuffer',
+               device='cpu:*',
+               table_fn=table.Table):
+    """Creates a TFPrioritizedReplayBuffer.
+
+    Args:
+      data_spec: A TensorSpec or a list/tuple/nest of TensorSpecs describing a
+        single item that can be stored in this buffer.
+      batch_size: Batch dimension of tensors when adding to buffer.
+      max_length: The maximum number of items that can be stored in a single
+        batch segment of the buffer.
+      scope: Scope prefix for variables and ops created by this class.
+      device: A TensorFlow device to place the Variables and ops.
+      table_fn: Function to create tables `table_fn(data_spec, capacity)` that
+        can read/write nested tensors.
+    """
+    super(TFPrioritizedReplayBuffer, self).__init__(
+        data_spec,
+        batch_size,
+        max_length=max_length,
+        scope=scope,
+        device=device,
+        table_fn=table_fn)
+    with tf.device(self._device), tf.variable_scope(self._scope):
+      self._sum_tree = sum_tree.TFSumTree(self._capacity_value)
+
+  def update_priorities(self, ids, priorities):
+    """Returns an op that updates the priorities of sampled items.
+
+    Args:
+      ids: An int64 Tensor of ids, as returned in the BufferInfo of get_next.
+      priorities: A float Tensor of priorities with the same number of
+        elements as ids, e.g. the per-sample TD losses. Absolute values are
+        used.
+
+    Returns:
+      An op that updates the priorities.
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('update_priorities'):
+        return self._sum_tree.set(ids, tf.abs(priorities))
+
+  # Methods defined in ReplayBuffer base class
+
+  def _add_batch(self, items):
+    """Adds a batch of items to the replay buffer.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+      items to be added to the replay buffer. Each element of `items` must match
+      the data_spec of this class. Should be shape [batch_size, data_spec, ...]
+    Returns:
+      An op that adds `items` to the replay buffer, with max priority.
+    """
+    nest.assert_same_structure(items, self._data_spec)
+
+    with tf.device(self._device), tf.name_scope(self._scope):
+      id_ = self._increment_last_id()
+      write_rows = self._get_rows_for_id(id_)
+      write_id_op = self._id_table.write(write_rows, id_)
+      write_data_op = self._data_table.write(write_rows, items)
+      with tf.control_dependencies([write_id_op, write_data_op]):
+        priorities = tf.fill([self._batch_size],
+                             self._sum_tree.max_priority())
+        return self._sum_tree.set(write_rows, priorities)
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    """Returns an item or batch of items sampled by priority from the buffer.
+
+    Sub-episodes that would start in the last num_steps - 1 items of a batch
+    segment are never sampled, and the probabilities are normalized over the
+    valid starts.
+
+    Args:
+      sample_batch_size: (Optional.) An optional batch_size to specify the
+        number of items to return. See get_next() documentation.
+      num_steps: (Optional.)  Optional way to specify that sub-episodes are
+        desired. See get_next() documentation.
+      time_stacked: Bool, when true and num_steps > 1 get_next on the buffer
+        would return the items stack on the time dimension. The outputs would be
+        [B, T, ..] if sample_batch_size is given or [T, ..] otherwise.
+    Returns:
+      A 2 tuple, containing:
+        - An item, sequence of items, or batch thereof sampled from the buffer.
+        - BufferInfo NamedTuple, containing:
+          - The rows of the sampled items (or of the first item of each
+            sub-episode) in the table, shaped like sample_batch_size.
+          - The sampling probability of each item (or sub-episode).
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('get_next'):
+        last_id = self._get_last_id()
+        min_val, max_val = self._valid_range_ids(
+            last_id, self._max_length, num_steps)
+        assert_nonempty = tf.assert_greater(
+            max_val,
+            min_val,
+            message='TFPrioritizedReplayBuffer is empty. Make sure to add '
+            'items before sampling the buffer.')
+        # The rows of the ids in [max_val, last_id] in every batch segment
+        # start sub-episodes that would wrap around the head of the segment.
+        excluded_rows = self._get_rows(
+            tf.expand_dims(tf.range(max_val, last_id + 1), 0),
+            tf.expand_dims(self._batch_offsets, 1))
+        with tf.control_dependencies([assert_nonempty]):
+          rows, probabilities = self._sum_tree.sample(
+              sample_batch_size, exclude=excluded_rows)
+
+        ids = self._id_table.read(rows)
+        batch_offsets = rows - tf.mod(rows, self._max_length)
+
+        if num_steps is None:
+          data = self._data_table.read(rows)
+        else:
+          step_ids = tf.expand_dims(ids, -1) + tf.range(
+              num_steps, dtype=tf.int64)
+          step_rows = (tf.expand_dims(batch_offsets, -1) +
+                       tf.mod(step_ids, self._max_length))
+          if time_stacked:
+            data = self._data_table.read(step_rows)
+          else:
+            data = tuple(
+                self._data_table.read(step_rows[..., step])
+                for step in range(num_steps))
+
+        buffer_info = tf_uniform_replay_buffer.BufferInfo(
+            ids=rows, probabilities=probabilities)
+    return data, buffer_info
+
+  def _clear(self, clear_all_variables=False):
+    """Return op that resets the contents and priorities of replay buffer.
+
+    Args:
+      clear_all_variables: boolean indicating if all variables should be
+        cleared. See TFUniformReplayBuffer.clear().
+
+    Returns:
+      op that clears or unlinks the replay buffer contents.
+    """
+    return tf.group(
+        super(TFPrioritizedReplayBuffer, self)._clear(clear_all_variables),
+        self._sum_tree.clear())
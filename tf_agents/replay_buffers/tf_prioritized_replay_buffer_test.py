@@ -0,0 +1,116 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_prioritized_replay_buffer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import tf_prioritized_replay_buffer
+
+
+class TFPrioritizedReplayBufferTest(tf.test.TestCase):
+
+  def _create_replay_buffer(self, batch_size=2, max_length=5):
+    spec = specs.TensorSpec([], tf.int64, 'value')
+    replay_buffer = tf_prioritized_replay_buffer.TFPrioritizedReplayBuffer(
+        spec, batch_size=batch_size, max_length=max_length)
+    value = tf.placeholder(tf.int64, [batch_size])
+    add_op = replay_buffer.add_batch(value)
+    return replay_buffer, value, add_op
+
+  def testSampleAfterAdd(self):
+    replay_buffer, value, add_op = self._create_replay_buffer()
+    sample, buffer_info = replay_buffer.get_next(sample_batch_size=8)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for i in range(3):
+        sess.run(add_op, {value: [i, 10 + i]})
+      sample_, buffer_info_ = sess.run([sample, buffer_info])
+      self.assertTrue(
+          set(sample_).issubset({0, 1, 2, 10, 11, 12}), sample_)
+      # All items have the same (max) priority.
+      self.assertAllClose(np.full([8], 1. / 6), buffer_info_.probabilities)
+
+  def testGetNextEmpty(self):
+    replay_buffer, _, _ = self._create_replay_buffer()
+    sample, _ = replay_buffer.get_next()
+    self.evaluate(tf.global_variables_initializer())
+    with self.assertRaisesRegexp(
+        tf.errors.InvalidArgumentError, 'TFPrioritizedReplayBuffer is empty.'):
+      self.evaluate(sample)
+
+  def testUpdatePriorities(self):
+    replay_buffer, value, add_op = self._create_replay_buffer()
+    sample, buffer_info = replay_buffer.get_next(sample_batch_size=100)
+    ids = tf.placeholder(tf.int64, [None])
+    priorities = tf.placeholder(tf.float32, [None])
+    update_op = replay_buffer.update_priorities(ids, priorities)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for i in range(3):
+        sess.run(add_op, {value: [i, 10 + i]})
+      _, buffer_info_ = sess.run([sample, buffer_info])
+      # Only keep the item with value 11 (row 6) with a non-zero priority.
+      sess.run(update_op, {ids: buffer_info_.ids,
+                           priorities: np.zeros(buffer_info_.ids.shape)})
+      sess.run(update_op, {ids: [0, 1, 2, 5, 7], priorities: np.zeros([5])})
+      sess.run(update_op, {ids: [6], priorities: [3.]})
+      sample_, buffer_info_ = sess.run([sample, buffer_info])
+      self.assertAllEqual(np.full([100], 11), sample_)
+      self.assertAllEqual(np.full([100], 6), buffer_info_.ids)
+      self.assertAllClose(np.ones([100]), buffer_info_.probabilities)
+
+  def testMultiStepSamplingStaysValid(self):
+    replay_buffer, value, add_op = self._create_replay_buffer()
+    sample, _ = replay_buffer.get_next(sample_batch_size=100, num_steps=2)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for i in range(7):
+        sess.run(add_op, {value: [i, 10 + i]})
+      sample_ = sess.run(sample)
+      self.assertEqual((100, 2), sample_.shape)
+      # Sub-episodes never wrap around the head of each batch segment.
+      self.assertAllEqual(sample_[:, 0] + 1, sample_[:, 1])
+
+  def testMultiStepSamplingExcludesInvalidStarts(self):
+    replay_buffer, value, add_op = self._create_replay_buffer()
+    sample, buffer_info = replay_buffer.get_next(
+        sample_batch_size=100, num_steps=2)
+    ids = tf.placeholder(tf.int64, [None])
+    priorities = tf.placeholder(tf.float32, [None])
+    update_op = replay_buffer.update_priorities(ids, priorities)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for i in range(3):
+        sess.run(add_op, {value: [i, 10 + i]})
+      # The newest items (2 and 12, rows 2 and 7) cannot start a sub-episode,
+      # so only the item with value 1 (row 1) can be sampled.
+      sess.run(update_op, {ids: [0, 5, 6], priorities: np.zeros([3])})
+      sess.run(update_op, {ids: [1, 2, 7], priorities: [1., 5., 5.]})
+      sample_, buffer_info_ = sess.run([sample, buffer_info])
+      self.assertAllEqual(np.tile([[1, 2]], [100, 1]), sample_)
+      # The ids are the rows of the first step of each sub-episode.
+      self.assertAllEqual(np.full([100], 1), buffer_info_.ids)
+      self.assertAllClose(np.ones([100]), buffer_info_.probabilities)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -32,6 +32,8 @@ import collections
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.environments import time_step as ts
+from tf_agents.environments import trajectory
 from tf_agents.replay_buffers import replay_buffer
 from tf_agents.replay_buffers import table
 from tf_agents.specs import tensor_spec
@@ -41,6 +43,9 @@ from tensorflow.python.data.util import nest as data_nest  # TF internal
 
 nest = tf.contrib.framework.nest
 
+# Number of times windows crossing an episode boundary are redrawn before
+# falling back to enumerating all the valid windows.
+_MAX_RESAMPLING_ROUNDS = 10
 
 BufferInfo = collections.namedtuple('BufferInfo',
                                     ['ids', 'probabilities'])
@@ -57,7 +62,8 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
                max_length=1000,
                scope='TFUniformReplayBuffer',
                device='cpu:*',
-               table_fn=table.Table):
+               table_fn=table.Table,
+               sample_within_episodes=False):
     """Creates a TFUniformReplayBuffer.
 
     Args:
@@ -70,10 +76,21 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
       device: A TensorFlow device to place the Variables and ops.
       table_fn: Function to create tables `table_fn(data_spec, capacity)` that
         can read/write nested tensors.
+      sample_within_episodes: Boolean, whether sub-episodes sampled with
+        num_steps > 1 must lie within one episode, i.e. contain no boundary
+        trajectory before their last step. Requires data_spec to be a
+        `Trajectory`.
 
     Raises:
-      ValueError: If batch_size does not evenly divide capacity.
+      ValueError: If batch_size does not evenly divide capacity, or if
+        sample_within_episodes is True and data_spec is not a `Trajectory`.
     """
+    if sample_within_episodes and not isinstance(data_spec,
+                                                 trajectory.Trajectory):
+      raise ValueError(
+          'sample_within_episodes requires a Trajectory data_spec, got: '
+          '{}'.format(data_spec))
+    self._sample_within_episodes = sample_within_episodes
     self._batch_size = batch_size
     self._max_length = max_length
     capacity = self._batch_size * self._max_length
@@ -100,6 +117,24 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
           use_resource=True,
           trainable=False)
       self._last_id_cs = tf.contrib.framework.CriticalSection(name='last_id')
+      if self._sample_within_episodes:
+        # Number of boundaries added to each batch segment, and before each
+        # row. A window lies within one episode iff its first and last rows
+        # have the same count.
+        self._boundary_counts = tf.get_variable(
+            name='boundary_counts',
+            shape=[self._batch_size],
+            dtype=tf.int64,
+            initializer=tf.zeros_initializer(),
+            use_resource=True,
+            trainable=False)
+        self._boundaries_before = tf.get_variable(
+            name='boundaries_before',
+            shape=[capacity],
+            dtype=tf.int64,
+            initializer=tf.zeros_initializer(),
+            use_resource=True,
+            trainable=False)
 
   def variables(self):
     # TODO(sguada) - make this Eager-compatible. Don't rely on scopes.
@@ -138,7 +173,14 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
       write_rows = self._get_rows_for_id(id_)
       write_id_op = self._id_table.write(write_rows, id_)
       write_data_op = self._data_table.write(write_rows, items)
-      return tf.group(write_id_op, write_data_op)
+      if not self._sample_within_episodes:
+        return tf.group(write_id_op, write_data_op)
+      write_boundaries_op = tf.scatter_update(
+          self._boundaries_before, write_rows, self._boundary_counts.value())
+      with tf.control_dependencies([write_boundaries_op]):
+        count_boundaries_op = self._boundary_counts.assign_add(
+            tf.to_int64(tf.equal(items.step_type, ts.StepType.LAST)))
+      return tf.group(write_id_op, write_data_op, count_boundaries_op)
 
   def _get_next(self,
                 sample_batch_size=None,
@@ -180,17 +222,13 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
             message='TFUniformReplayBuffer is empty. Make sure to add items '
             'before sampling the buffer.')
         with tf.control_dependencies([assert_nonempty]):
-          ids = tf.random_uniform(
-              rows_shape, minval=min_val, maxval=max_val, dtype=tf.int64)
-
-        # Move each id sample to a random batch.
-        batch_offsets = tf.random_uniform(
-            rows_shape, minval=0, maxval=self._batch_size, dtype=tf.int64)
-        batch_offsets *= self._max_length
-        ids += batch_offsets
+          ids, batch_offsets = self._sample_ids(rows_shape, min_val, max_val)
+        if self._sample_within_episodes and num_steps is not None:
+          ids, batch_offsets = self._resample_cross_episode_windows(
+              ids, batch_offsets, rows_shape, min_val, max_val, num_steps)
 
         if num_steps is None:
-          rows_to_get = tf.mod(ids, self._capacity)
+          rows_to_get = self._get_rows(ids, batch_offsets)
           data = self._data_table.read(rows_to_get)
           data_ids = self._id_table.read(rows_to_get)
         else:
@@ -200,17 +238,19 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
               step_range = tf.reshape(step_range, [1, num_steps])
               step_range = tf.tile(step_range, [sample_batch_size, 1])
               ids = tf.tile(tf.expand_dims(ids, -1), [1, num_steps])
+              batch_offsets = tf.tile(
+                  tf.expand_dims(batch_offsets, -1), [1, num_steps])
             else:
               step_range = tf.reshape(step_range, [num_steps])
 
-            rows_to_get = tf.mod(step_range + ids, self._capacity)
+            rows_to_get = self._get_rows(step_range + ids, batch_offsets)
             data = self._data_table.read(rows_to_get)
             data_ids = self._id_table.read(rows_to_get)
           else:
             data = []
             data_ids = []
             for step in range(num_steps):
-              steps_to_get = tf.mod(ids + step, self._capacity)
+              steps_to_get = self._get_rows(ids + step, batch_offsets)
               items = self._data_table.read(steps_to_get)
               data.append(items)
               data_ids.append(self._id_table.read(steps_to_get))
@@ -226,6 +266,152 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
                                  probabilities=probabilities)
     return data, buffer_info
 
+  def get_next_n_step(self, sample_batch_size=None, n_step=1, gamma=1.0):
+    """Samples n-step transitions uniformly from a buffer of Trajectories.
+
+    Each sampled transition starting at step t is collapsed into a pair of
+    trajectories `(trajectory_t, trajectory_{t+m})`, where m <= n_step is the
+    number of steps until the end of the episode. The `reward` of the first
+    trajectory holds the discounted return
+
+      sum_{k<m} gamma^k * discount_t * ... * discount_{t+k-1} * reward_{t+k}
+
+    its `discount` holds `gamma^(m-1) * discount_t * ... * discount_{t+m-1}`
+    and its `next_step_type` the step type reached after m steps. Agents that
+    compute `reward + gamma * discount * V(next observation)` from
+    `trajectory.to_transition` therefore train on n-step targets unchanged,
+    as long as they use the same `gamma`.
+
+    The reward, discount and step types of the n_step window are read with one
+    gather per slot, and the other slots are only read for steps t and t+m.
+    Transitions starting in the last n_step items of a batch segment are not
+    sampled until more items are added.
+
+    Args:
+      sample_batch_size: (Optional.) An optional batch_size to specify the
+        number of transitions to return.
+      n_step: Maximum number of steps to accumulate rewards over.
+      gamma: Discount factor applied to future rewards.
+    Returns:
+      A 2 tuple, containing:
+        - A `Trajectory` with time dimension 2, of shape [B, 2, ...] if
+          sample_batch_size is given or [2, ...] otherwise.
+        - BufferInfo NamedTuple, containing:
+          - The ids of the first items.
+          - The sampling probability of each transition.
+    Raises:
+      ValueError: If the data_spec is not a `Trajectory` or if n_step < 1.
+    """
+    if not isinstance(self._data_spec, trajectory.Trajectory):
+      raise ValueError(
+          'n-step sampling requires a Trajectory data_spec, got: {}'.format(
+              self._data_spec))
+    if n_step < 1:
+      raise ValueError('n_step must be at least 1, got: {}'.format(n_step))
+
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('get_next_n_step'):
+        min_val, max_val = self._valid_range_ids(
+            self._get_last_id(), self._max_length, n_step + 1)
+        rows_shape = (sample_batch_size or 1,)
+        assert_nonempty = tf.assert_greater(
+            max_val,
+            min_val,
+            message='TFUniformReplayBuffer does not contain {} steps. Make '
+            'sure to add items before sampling the buffer.'.format(n_step + 1))
+        with tf.control_dependencies([assert_nonempty]):
+          ids, batch_offsets = self._sample_ids(rows_shape, min_val, max_val)
+
+        # Rows of the n_step + 1 steps following each id, shape [B, n + 1].
+        step_range = tf.range(n_step + 1, dtype=tf.int64)
+        window_rows = self._get_rows(tf.expand_dims(ids, 1) + step_range,
+                                     tf.expand_dims(batch_offsets, 1))
+        slots = self._data_table.slots
+        step_type, next_step_type, reward, discount = self._data_table.read(
+            window_rows[:, :n_step],
+            slots=(slots.step_type, slots.next_step_type, slots.reward,
+                   slots.discount))
+
+        # Steps following the end of an episode, or a boundary, are masked.
+        episode_ends = tf.logical_or(
+            tf.equal(next_step_type, ts.StepType.LAST),
+            tf.equal(step_type, ts.StepType.LAST))
+        valid = tf.equal(
+            tf.cumsum(tf.to_int32(episode_ends), axis=1, exclusive=True), 0)
+        num_valid = tf.reduce_sum(tf.to_int64(valid), axis=1)
+
+        discount = tf.cast(discount, reward.dtype)
+        reward_weights = tf.cumprod(gamma * discount, axis=1, exclusive=True)
+        n_step_reward = tf.reduce_sum(
+            tf.where(valid, reward_weights * reward, tf.zeros_like(reward)),
+            axis=1)
+        n_step_discount = tf.pow(
+            tf.cast(gamma, reward.dtype), tf.cast(num_valid - 1, reward.dtype))
+        n_step_discount *= tf.reduce_prod(
+            tf.where(valid, discount, tf.ones_like(discount)), axis=1)
+        last_step = tf.one_hot(
+            num_valid - 1, n_step, dtype=next_step_type.dtype)
+        n_step_next_step_type = tf.reduce_sum(next_step_type * last_step, 1)
+
+        # Only the first and the bootstrap steps are read in full.
+        next_rows = tf.reduce_sum(
+            window_rows * tf.one_hot(num_valid, n_step + 1, dtype=tf.int64), 1)
+        rows_to_get = tf.stack([window_rows[:, 0], next_rows], axis=1)
+        data = self._data_table.read(rows_to_get)
+        data_ids = self._id_table.read(window_rows[:, 0])
+
+        def replace_first(values, first_values):
+          first_values = tf.cast(first_values, values.dtype)
+          return tf.concat(
+              [tf.expand_dims(first_values, 1), values[:, 1:]], axis=1)
+
+        data = data._replace(
+            next_step_type=replace_first(data.next_step_type,
+                                         n_step_next_step_type),
+            reward=replace_first(data.reward, n_step_reward),
+            discount=replace_first(data.discount, n_step_discount))
+
+        if sample_batch_size is None:
+          data = nest.map_structure(lambda t: tf.squeeze(t, [0]), data)
+          data_ids = tf.squeeze(data_ids, [0])
+          rows_shape = ()
+        num_ids = max_val - min_val
+        probability = tf.cond(
+            tf.equal(num_ids, 0), lambda: 0.,
+            lambda: 1. / tf.to_float(num_ids * self._batch_size))
+        probabilities = tf.fill(rows_shape, probability)
+
+        buffer_info = BufferInfo(ids=data_ids,
+                                 probabilities=probabilities)
+    return data, buffer_info
+
+  def as_n_step_dataset(self,
+                        sample_batch_size=None,
+                        n_step=1,
+                        gamma=1.0,
+                        num_parallel_calls=None):
+    """Creates a dataset of n-step transitions sampled from the buffer.
+
+    Args:
+      sample_batch_size: (Optional.) An optional batch_size to specify the
+        number of transitions to return. See get_next_n_step() documentation.
+      n_step: Maximum number of steps to accumulate rewards over.
+      gamma: Discount factor applied to future rewards.
+      num_parallel_calls: (Optional.) Number elements to process in parallel.
+    Returns:
+      A dataset of type tf.data.Dataset, elements of which are 2-tuples of:
+        - A `Trajectory` of shape [B, 2, ...] or [2, ...], see
+          get_next_n_step().
+        - Auxiliary info for the items (i.e. ids, probs).
+    """
+
+    def get_next(_):
+      return self.get_next_n_step(sample_batch_size, n_step, gamma)
+
+    return tf.data.experimental.Counter().map(
+        get_next,
+        num_parallel_calls=num_parallel_calls)
+
   @gin.configurable(
       'tf_agents.tf_uniform_replay_buffer.TFUniformReplayBuffer.as_dataset')
   def as_dataset(self,
@@ -345,6 +531,88 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer,
 
     return tf.cond(last_id < max_length, non_full, full)
 
+  def _sample_ids(self, rows_shape, min_val, max_val):
+    """Draws ids in [min_val, max_val) and the offsets of random segments."""
+    ids = tf.random_uniform(
+        rows_shape, minval=min_val, maxval=max_val, dtype=tf.int64)
+    batch_offsets = tf.random_uniform(
+        rows_shape, minval=0, maxval=self._batch_size, dtype=tf.int64)
+    return ids, batch_offsets * self._max_length
+
+  def _get_rows(self, ids, batch_offsets):
+    """Returns the rows of the given ids in the given batch segments."""
+    return batch_offsets + tf.mod(ids, self._max_length)
+
+  def _crosses_episodes(self, ids, batch_offsets, num_steps):
+    """Whether the windows starting at ids contain an episode boundary."""
+    first_rows = self._get_rows(ids, batch_offsets)
+    last_rows = self._get_rows(ids + num_steps - 1, batch_offsets)
+    return tf.not_equal(self._boundaries_before.sparse_read(first_rows),
+                        self._boundaries_before.sparse_read(last_rows))
+
+  def _resample_cross_episode_windows(self, ids, batch_offsets, rows_shape,
+                                      min_val, max_val, num_steps):
+    """Redraws the windows that cross an episode boundary.
+
+    Args:
+      ids: Sampled ids of the first step of the windows.
+      batch_offsets: Offsets of the batch segments of the windows.
+      rows_shape: Shape of ids.
+      min_val: Smallest valid id.
+      max_val: Upper bound (exclusive) of the valid ids.
+      num_steps: Length of the windows.
+
+    Returns:
+      A tuple (ids, batch_offsets) of windows within an episode.
+    """
+    with tf.name_scope('resample_cross_episode_windows'):
+
+      def crosses_any(unused_round, ids, batch_offsets):
+        return tf.reduce_any(
+            self._crosses_episodes(ids, batch_offsets, num_steps))
+
+      def resample(round_, ids, batch_offsets):
+        crosses = self._crosses_episodes(ids, batch_offsets, num_steps)
+        new_ids, new_batch_offsets = self._sample_ids(rows_shape, min_val,
+                                                      max_val)
+        return (round_ + 1, tf.where(crosses, new_ids, ids),
+                tf.where(crosses, new_batch_offsets, batch_offsets))
+
+      _, ids, batch_offsets = tf.while_loop(
+          lambda round_, ids, batch_offsets: tf.logical_and(
+              round_ < _MAX_RESAMPLING_ROUNDS,
+              crosses_any(round_, ids, batch_offsets)),
+          resample, (tf.constant(0), ids, batch_offsets),
+          back_prop=False)
+
+      def sample_valid_windows():
+        """Draws among all the windows within an episode."""
+        all_ids = tf.tile(tf.expand_dims(tf.range(min_val, max_val), 0),
+                          [self._batch_size, 1])
+        all_batch_offsets = tf.tile(
+            tf.expand_dims(self._batch_offsets, 1),
+            [1, tf.size(all_ids) // self._batch_size])
+        all_ids = tf.reshape(all_ids, [-1])
+        all_batch_offsets = tf.reshape(all_batch_offsets, [-1])
+        valid = tf.where(tf.logical_not(
+            self._crosses_episodes(all_ids, all_batch_offsets, num_steps)))
+        valid = tf.squeeze(valid, 1)
+        assert_valid = tf.assert_greater(
+            tf.size(valid, out_type=tf.int64), tf.constant(0, tf.int64),
+            message='TFUniformReplayBuffer has no sub-episode of {} steps '
+            'within an episode.'.format(num_steps))
+        with tf.control_dependencies([assert_valid]):
+          choice = tf.random_uniform(
+              rows_shape, maxval=tf.size(valid, out_type=tf.int64),
+              dtype=tf.int64)
+        choice = tf.gather(valid, choice)
+        return (tf.gather(all_ids, choice),
+                tf.gather(all_batch_offsets, choice))
+
+      return tf.cond(
+          crosses_any(None, ids, batch_offsets),
+          sample_valid_windows, lambda: (ids, batch_offsets))
+
   def _increment_last_id(self, increment=1):
     """Increments the last_id in a thread safe manner.
 
@@ -23,6 +23,7 @@ import numpy as np
 import tensorflow as tf
 
 from tf_agents import specs
+from tf_agents.environments import trajectory
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
 from tf_agents.utils import test_utils
 
@@ -265,6 +266,136 @@ class TFUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
         steps_ = sess.run(steps)
         self.assertAllEqual((steps_[:, 0] + 1) % 10, steps_[:, 1])
 
+  def _trajectory_spec(self):
+    return trajectory.Trajectory(
+        step_type=specs.TensorSpec([], tf.int32, 'step_type'),
+        observation=specs.TensorSpec([], tf.float32, 'observation'),
+        action=specs.TensorSpec([], tf.int32, 'action'),
+        policy_info=(),
+        next_step_type=specs.TensorSpec([], tf.int32, 'next_step_type'),
+        reward=specs.TensorSpec([], tf.float32, 'reward'),
+        discount=specs.TensorSpec([], tf.float32, 'discount'))
+
+  def _add_items(self, sess, add_op, items_ph, items):
+    """Adds the items one at a time, with a batch_size of 1."""
+    for t in range(len(items.step_type)):
+      feed_dict = dict(zip(nest.flatten(items_ph),
+                           [[value[t]] for value in nest.flatten(items)]))
+      sess.run(add_op, feed_dict=feed_dict)
+
+  def testNStepSampling(self):
+    spec = self._trajectory_spec()
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=1, max_length=20)
+
+    # A terminated episode and a truncated one, followed by their boundaries,
+    # and the start of a third episode.
+    step_type = np.array([0, 1, 1, 2, 0, 1, 1, 2, 0, 1], dtype=np.int32)
+    next_step_type = np.append(step_type[1:], 1).astype(np.int32)
+    reward = np.arange(1, 11, dtype=np.float32)
+    reward[step_type == 2] = 0.
+    discount = np.ones(10, dtype=np.float32)
+    discount[2] = 0.
+    items = trajectory.Trajectory(
+        step_type=step_type,
+        observation=np.arange(10, dtype=np.float32),
+        action=np.arange(10, dtype=np.int32),
+        policy_info=(),
+        next_step_type=next_step_type,
+        reward=reward,
+        discount=discount)
+
+    items_ph = nest.map_structure(
+        lambda spec: tf.placeholder(spec.dtype, [1]), spec)
+    add_op = replay_buffer.add_batch(items_ph)
+    n_step = 3
+    gamma = 0.9
+    experience, _ = replay_buffer.get_next_n_step(
+        sample_batch_size=50, n_step=n_step, gamma=gamma)
+    self.assertEqual([50, 2], experience.reward.shape.as_list())
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self._add_items(sess, add_op, items_ph, items)
+      experience_ = sess.run(experience)
+
+    for i, t in enumerate(experience_.observation[:, 0].astype(np.int64)):
+      expected_reward = 0.
+      weight = 1.
+      for k in range(n_step):
+        expected_reward += weight * reward[t + k]
+        weight *= gamma * discount[t + k]
+        if next_step_type[t + k] == 2 or step_type[t + k] == 2:
+          break
+      m = k + 1
+      self.assertEqual(t + m, experience_.observation[i, 1])
+      self.assertAllClose(expected_reward, experience_.reward[i, 0])
+      self.assertAllClose(gamma**(m - 1) * np.prod(discount[t:t + m]),
+                          experience_.discount[i, 0])
+      self.assertEqual(next_step_type[t + m - 1],
+                       experience_.next_step_type[i, 0])
+      self.assertEqual(reward[t + m], experience_.reward[i, 1])
+
+  def testNStepSamplingRequiresTrajectory(self):
+    spec = specs.TensorSpec([], tf.int32, 'action')
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=1)
+    with self.assertRaises(ValueError):
+      replay_buffer.get_next_n_step(n_step=2)
+
+  def testMultiStepSamplingDoesNotCrossSegments(self):
+    spec = specs.TensorSpec([], tf.int32, 'action')
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=2, max_length=10)
+
+    step = tf.Variable(0).count_up_to(14)
+    add_op = replay_buffer.add_batch(tf.stack([step, 100 + step]))
+    steps, _ = replay_buffer.get_next(sample_batch_size=100, num_steps=3)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for _ in range(14):
+        sess.run(add_op)
+      steps_ = sess.run(steps)
+      self.assertAllEqual(steps_[:, 0] + 2, steps_[:, 2])
+
+  @parameterized.named_parameters(
+      ('SampleBatch', 200),
+      ('NoSampleBatch', None),
+  )
+  def testSampleWithinEpisodes(self, sample_batch_size):
+    spec = self._trajectory_spec()
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=1, max_length=10, sample_within_episodes=True)
+
+    # Episodes of 3 steps, each followed by a boundary.
+    num_items = 23
+    step_type = np.tile(np.array([0, 1, 1, 2], dtype=np.int32), 6)
+    items = trajectory.Trajectory(
+        step_type=step_type[:num_items],
+        observation=np.arange(num_items, dtype=np.float32),
+        action=np.zeros(num_items, dtype=np.int32),
+        policy_info=(),
+        next_step_type=step_type[1:num_items + 1],
+        reward=np.ones(num_items, dtype=np.float32),
+        discount=np.ones(num_items, dtype=np.float32))
+
+    items_ph = nest.map_structure(
+        lambda spec: tf.placeholder(spec.dtype, [1]), spec)
+    add_op = replay_buffer.add_batch(items_ph)
+    experience, _ = replay_buffer.get_next(
+        sample_batch_size=sample_batch_size, num_steps=3)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self._add_items(sess, add_op, items_ph, items)
+      experience_ = sess.run(experience)
+
+    observation = np.reshape(experience_.observation, [-1, 3])
+    # Items 13 to 22 are in the buffer and 15 and 19 are boundaries.
+    self.assertTrue(set(observation[:, 0]).issubset({13, 16, 17, 20}))
+    self.assertAllEqual(observation[:, 0] + 2, observation[:, 2])
+    self.assertFalse(np.any(
+        np.reshape(experience_.step_type, [-1, 3])[:, :-1] == 2))
+
   @parameterized.named_parameters(
       ('BatchSizeOne', 1),
       ('BatchSizeFive', 5),
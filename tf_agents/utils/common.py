@@ -23,6 +23,7 @@ import tensorflow as tf
 
 from tf_agents.environments import time_step as ts
 from tf_agents.utils import nest_utils
+from tf_agents.utils import value_ops
 
 from tensorflow.python.eager import context  # TF internal
 
@@ -641,22 +642,13 @@ def compute_returns(rewards, discounts):
                  if (not rewards.shape.is_fully_defined() or
                      not discounts.shape.is_fully_defined())
                  else tf.no_op())
-  with tf.control_dependencies([check_shape]):
-    # Reverse the rewards and discounting for accumulation.
-    rewards, discounts = tf.reverse(rewards, [0]), tf.reverse(discounts, [0])
-
-  def discounted_accumulate_rewards(next_step_return, reward_and_discount):
-    reward, discount = reward_and_discount
-    return next_step_return * discount + reward
-
   # Cumulatively sum discounted reward R_t.
   #   R_t = r_t + discount * (r_t+1 + discount * (r_t+2 * discount( ...
   # As discount is 0 for terminal states, ends of episode will not include
   #   reward from subsequent timesteps.
-  returns = tf.scan(discounted_accumulate_rewards,
-                    [rewards, discounts],
-                    initializer=tf.constant(0, dtype=discounts.dtype))
-  returns = tf.reverse(returns, [0])
+  with tf.control_dependencies([check_shape]):
+    returns = value_ops.reverse_linear_recurrence(
+        discounts, rewards, tf.zeros_like(rewards[0]))
   return returns
 
 
@@ -19,8 +19,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+try:
+  from collections import abc as collections_abc  # pylint: disable=g-import-not-at-top
+except ImportError:  # Python 2.
+  import collections as collections_abc  # pylint: disable=g-import-not-at-top
 
 import numpy as np
+import six
 import tensorflow as tf
 nest = tf.contrib.framework.nest
 
@@ -411,18 +416,14 @@ def unstack_nested_arrays(nested_array):
       shape [batch_size, ...].
   Returns:
     A list of length batch_size where each item in the list is a nest
-      having the same structure as `nested_array`.
+      having the same structure as `nested_array`. Its arrays are views of the
+      rows of the arrays in `nested_array`.
   """
-  def _unstack(array):
-    if array.shape[0] == 1:
-      arrays = [array]
-    else:
-      arrays = np.split(array, array.shape[0])
-    return [np.reshape(a, a.shape[1:]) for a in arrays]
-  unstacked_arrays_zipped = zip(
-      *[_unstack(array) for array in nest.flatten(nested_array)])
-  return [nest.pack_sequence_as(nested_array, zipped)
-          for zipped in unstacked_arrays_zipped]
+  flat_arrays = nest.flatten(nested_array)
+  batch_size = flat_arrays[0].shape[0]
+  return [nest.pack_sequence_as(nested_array,
+                                [array[i, ...] for array in flat_arrays])
+          for i in range(batch_size)]
 
 
 def stack_nested_arrays(nested_arrays):
@@ -447,3 +448,195 @@ def get_outer_array_shape(nested_array, spec):
   first_spec = nest.flatten(spec)[0]
   num_outer_dims = len(first_array.shape) - len(first_spec.shape)
   return first_array.shape[:num_outer_dims]
+
+
+def _is_namedtuple(structure):
+  return isinstance(structure, tuple) and hasattr(structure, '_fields')
+
+
+class CompiledNest(object):
+  """Flattens and packs nests with a fixed structure without traversing them.
+
+  `nest.flatten` and `nest.pack_sequence_as` walk the structure on every call.
+  When the structure is fixed, e.g. by a spec, `CompiledNest` generates once
+  a `flatten` function made of a single list of item accesses, and a `pack`
+  function made of a single expression calling the nest constructors (e.g. the
+  namedtuple classes), both following the `nest` flattening order.
+
+  Example usage:
+
+    trajectory_nest = nest_utils.CompiledNest(policy.trajectory_spec())
+    flat_arrays = trajectory_nest.flatten(traj)
+    traj = trajectory_nest.pack(flat_arrays)
+
+  No structure checks are done: the nests given to `flatten` and `map_structure`
+  must have the structure the `CompiledNest` was created with.
+  """
+
+  def __init__(self, structure):
+    """Initializes a new `CompiledNest`.
+
+    Args:
+      structure: A nest, e.g. of specs or arrays, whose structure is compiled.
+        The values of its leaves are ignored.
+    """
+    self._structure = structure
+    self._namespace = {}
+    self._num_leaves = 0
+    flat_accessors = []
+    pack_expression = self._compile(structure, 'nested', flat_accessors)
+    self._namespace['__name__'] = 'compiled_nest'
+    six.exec_('def flatten(nested):\n'
+              '  return [%s]\n'
+              'def pack(flat):\n'
+              '  return %s\n' % (', '.join(flat_accessors), pack_expression),
+              self._namespace)
+    self.flatten = self._namespace['flatten']
+    self.pack = self._namespace['pack']
+
+  def _bind(self, value):
+    """Makes `value` accessible from the generated code and returns its name."""
+    name = '_v%d' % len(self._namespace)
+    self._namespace[name] = value
+    return name
+
+  def _compile(self, structure, accessor, flat_accessors):
+    """Appends the leaf accessors of `structure` and returns its packer."""
+    if not nest.is_sequence(structure):
+      flat_accessors.append(accessor)
+      self._num_leaves += 1
+      return 'flat[%d]' % (self._num_leaves - 1)
+
+    if isinstance(structure, collections_abc.Mapping):
+      # Leaves are flattened in sorted key order, but the packed mapping keeps
+      # the key order of `structure`.
+      values = {}
+      for key in sorted(structure):
+        key_name = self._bind(key)
+        values[key] = (key_name, self._compile(
+            structure[key], '%s[%s]' % (accessor, key_name), flat_accessors))
+      items = [values[key] for key in structure]
+      if type(structure) is dict:  # pylint: disable=unidiomatic-typecheck
+        return '{%s}' % ', '.join('%s: %s' % item for item in items)
+      return '%s([%s])' % (self._bind(type(structure)), ', '.join(
+          '(%s, %s)' % item for item in items))
+
+    packers = [
+        self._compile(value, '%s[%d]' % (accessor, i), flat_accessors)
+        for i, value in enumerate(structure)]
+    if _is_namedtuple(structure):
+      return '%s(%s)' % (self._bind(type(structure)), ', '.join(packers))
+    if type(structure) is tuple:  # pylint: disable=unidiomatic-typecheck
+      return '(%s)' % ''.join(packer + ', ' for packer in packers)
+    if type(structure) is list:  # pylint: disable=unidiomatic-typecheck
+      return '[%s]' % ', '.join(packers)
+    return '%s([%s])' % (self._bind(type(structure)), ', '.join(packers))
+
+  @property
+  def structure(self):
+    return self._structure
+
+  @property
+  def num_leaves(self):
+    return self._num_leaves
+
+  def map_structure(self, func, *structures):
+    """Like `nest.map_structure`, for nests with the compiled structure."""
+    flat_structures = [self.flatten(s) for s in structures]
+    return self.pack([func(*x) for x in zip(*flat_structures)])
+
+  def stack_arrays(self, nested_arrays):
+    """Like `stack_nested_arrays`, for nests with the compiled structure."""
+    return self.map_structure(lambda *arrays: np.stack(arrays), *nested_arrays)
+
+  def unstack_arrays(self, nested_array):
+    """Like `unstack_nested_arrays`, for a nest with the compiled structure."""
+    return [self.pack(arrays) for arrays in zip(*self.flatten(nested_array))]
+
+
+class BatchedArrayNest(object):
+  """A preallocated batch of arrays following a nest of `ArraySpec`s.
+
+  The batch is stored as a structure of arrays: one array of shape
+  `outer_dims + spec.shape` per spec. Producers write their items in place
+  into rows of the batch, and consumers read rows as views, so that batching
+  items does not stack or split arrays.
+
+  Example usage:
+
+    batch = nest_utils.BatchedArrayNest(env.time_step_spec(), (num_envs,))
+    for i, env in enumerate(envs):
+      batch.write(i, env.step(actions[i]))
+    batched_time_step = batch.nested
+  """
+
+  def __init__(self, spec, outer_dims, compiled_nest=None):
+    """Allocates a new `BatchedArrayNest`.
+
+    Args:
+      spec: An `ArraySpec`, or a nest of `ArraySpec`s.
+      outer_dims: A list or tuple of outer dimensions, e.g. `(batch_size,)`.
+      compiled_nest: Optional `CompiledNest` of `spec`, to share it between
+        batches.
+    """
+    self._spec = spec
+    self._outer_dims = tuple(outer_dims)
+    self._compiled_nest = compiled_nest or CompiledNest(spec)
+    self._flat_arrays = [
+        np.zeros(self._outer_dims + tuple(s.shape), dtype=s.dtype)
+        for s in self._compiled_nest.flatten(spec)]
+    self._nested = self._compiled_nest.pack(self._flat_arrays)
+
+  @property
+  def spec(self):
+    return self._spec
+
+  @property
+  def outer_dims(self):
+    return self._outer_dims
+
+  @property
+  def compiled_nest(self):
+    return self._compiled_nest
+
+  @property
+  def flat_arrays(self):
+    """Returns the flat list of arrays holding the batch."""
+    return self._flat_arrays
+
+  @property
+  def nested(self):
+    """Returns the nest of arrays holding the batch."""
+    return self._nested
+
+  def write(self, index, nested_value):
+    """Copies a nest of values into the rows at `index` of the batch.
+
+    Args:
+      index: Index of the rows in the outer dimensions, e.g. an integer or a
+        slice.
+      nested_value: A nest following `spec`, with shapes broadcastable to the
+        indexed rows.
+    """
+    self.write_flat(index, self._compiled_nest.flatten(nested_value))
+
+  def write_flat(self, index, flat_values):
+    """Like `write`, for values already flattened following `spec`."""
+    for array, value in zip(self._flat_arrays, flat_values):
+      array[index] = value
+
+  def read(self, index):
+    """Returns a nest of views of the rows at `index` of the batch.
+
+    Args:
+      index: An integer index in the outer dimensions. Indexing with slices or
+        tuples of integers and slices also returns views.
+
+    Returns:
+      A nest following `spec`. The views reflect later writes to the batch.
+    """
+    if not isinstance(index, tuple):
+      index = (index,)
+    index += (Ellipsis,)
+    return self._compiled_nest.pack(
+        [array[index] for array in self._flat_arrays])
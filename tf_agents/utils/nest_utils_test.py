@@ -19,9 +19,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import time
 
 import numpy as np
 import tensorflow as tf
+from tf_agents.environments import time_step as ts
+from tf_agents.environments import trajectory
 from tf_agents.specs import array_spec
 from tf_agents.specs import tensor_spec
 from tf_agents.utils import nest_utils
@@ -607,5 +611,165 @@ class NestedArraysTest(tf.test.TestCase):
     self.assertEqual((batch_size, 1), outer_dims)
 
 
+def _trajectory_spec():
+  """Returns a Trajectory spec with nested observations and policy info."""
+  observation_spec = {
+      'pixels': array_spec.ArraySpec((84, 84, 4), np.uint8),
+      'position': (array_spec.ArraySpec((3,), np.float32),
+                   array_spec.ArraySpec((4,), np.float32)),
+  }
+  time_step_spec = ts.time_step_spec(observation_spec)
+  action_spec = array_spec.BoundedArraySpec((), np.int64, 0, 5)
+  policy_info_spec = collections.OrderedDict([
+      ('log_probability', array_spec.ArraySpec((), np.float32)),
+      ('logits', array_spec.ArraySpec((6,), np.float32)),
+  ])
+  return trajectory.Trajectory(
+      step_type=time_step_spec.step_type,
+      observation=observation_spec,
+      action=action_spec,
+      policy_info=policy_info_spec,
+      next_step_type=time_step_spec.step_type,
+      reward=time_step_spec.reward,
+      discount=time_step_spec.discount)
+
+
+class CompiledNestTest(tf.test.TestCase):
+
+  def testFlattenAndPackMatchNest(self):
+    spec = _trajectory_spec()
+    compiled_nest = nest_utils.CompiledNest(spec)
+    values = list(range(len(nest.flatten(spec))))
+    packed = compiled_nest.pack(values)
+
+    self.assertEqual(len(values), compiled_nest.num_leaves)
+    self.assertEqual(nest.pack_sequence_as(spec, values), packed)
+    self.assertIsInstance(packed, trajectory.Trajectory)
+    self.assertIsInstance(packed.policy_info, collections.OrderedDict)
+    self.assertEqual(['log_probability', 'logits'],
+                     list(packed.policy_info.keys()))
+    self.assertEqual(values, compiled_nest.flatten(packed))
+    self.assertEqual(nest.flatten(spec), compiled_nest.flatten(spec))
+
+  def testMixedStructures(self):
+    structure = [{'b': (1, 2), 'a': [3]}, (), 4]
+    compiled_nest = nest_utils.CompiledNest(structure)
+    self.assertEqual(nest.flatten(structure),
+                     compiled_nest.flatten(structure))
+    self.assertEqual(nest.pack_sequence_as(structure, ['x', 'y', 'z', 'w']),
+                     compiled_nest.pack(['x', 'y', 'z', 'w']))
+
+  def testSingleLeaf(self):
+    compiled_nest = nest_utils.CompiledNest(array_spec.ArraySpec((), np.int32))
+    self.assertEqual([5], compiled_nest.flatten(5))
+    self.assertEqual(5, compiled_nest.pack([5]))
+    self.assertEqual(1, compiled_nest.num_leaves)
+
+  def testStackAndUnstackArrays(self):
+    spec = _trajectory_spec()
+    compiled_nest = nest_utils.CompiledNest(spec)
+    items = [array_spec.sample_spec_nest(spec, np.random.RandomState(i))
+             for i in range(3)]
+
+    stacked = compiled_nest.stack_arrays(items)
+    expected = nest_utils.stack_nested_arrays(items)
+    nest.map_structure(self.assertAllEqual, expected, stacked)
+
+    unstacked = compiled_nest.unstack_arrays(stacked)
+    self.assertEqual(3, len(unstacked))
+    for item, unstacked_item in zip(items, unstacked):
+      nest.map_structure(self.assertAllEqual, item, unstacked_item)
+
+
+class BatchedArrayNestTest(tf.test.TestCase):
+
+  def testWriteAndRead(self):
+    spec = _trajectory_spec()
+    batch = nest_utils.BatchedArrayNest(spec, (3,))
+    items = [array_spec.sample_spec_nest(spec, np.random.RandomState(i))
+             for i in range(3)]
+    for i, item in enumerate(items):
+      batch.write(i, item)
+
+    expected = nest_utils.stack_nested_arrays(items)
+    nest.map_structure(self.assertAllEqual, expected, batch.nested)
+    for i, item in enumerate(items):
+      nest.map_structure(self.assertAllEqual, item, batch.read(i))
+
+  def testReadReturnsViews(self):
+    spec = {'a': array_spec.ArraySpec((2,), np.float32),
+            'b': array_spec.ArraySpec((), np.int32)}
+    batch = nest_utils.BatchedArrayNest(spec, (2, 3))
+    row = batch.read((1, 2))
+    self.assertEqual((2,), row['a'].shape)
+    self.assertEqual((), row['b'].shape)
+
+    batch.write_flat((1, 2), [np.array([1., 2.]), 7])
+    self.assertAllEqual([1., 2.], row['a'])
+    self.assertEqual(7, row['b'])
+    self.assertEqual(np.float32, batch.nested['a'].dtype)
+    self.assertEqual((2, 3, 2), batch.nested['a'].shape)
+
+  def testWriteSlice(self):
+    spec = array_spec.ArraySpec((2,), np.int64)
+    batch = nest_utils.BatchedArrayNest(spec, (4,))
+    batch.write(slice(1, 3), np.array([[1, 2], [3, 4]]))
+    self.assertAllEqual([[0, 0], [1, 2], [3, 4], [0, 0]], batch.nested)
+
+
+class CompiledNestBenchmark(tf.test.Benchmark):
+
+  def _report(self, name, fn, num_iters=10000):
+    start_time = time.time()
+    for _ in range(num_iters):
+      fn()
+    self.report_benchmark(
+        iters=num_iters,
+        wall_time=(time.time() - start_time) / num_iters,
+        name=name)
+
+  def benchmark_trajectory_flatten_and_pack(self):
+    spec = _trajectory_spec()
+    compiled_nest = nest_utils.CompiledNest(spec)
+    item = array_spec.sample_spec_nest(spec, np.random.RandomState(0))
+    flat_item = nest.flatten(item)
+
+    self._report('nest_flatten', lambda: nest.flatten(item))
+    self._report('compiled_flatten', lambda: compiled_nest.flatten(item))
+    self._report('nest_pack_sequence_as',
+                 lambda: nest.pack_sequence_as(spec, flat_item))
+    self._report('compiled_pack', lambda: compiled_nest.pack(flat_item))
+
+  def benchmark_trajectory_stack_and_unstack(self):
+    spec = _trajectory_spec()
+    compiled_nest = nest_utils.CompiledNest(spec)
+    items = [array_spec.sample_spec_nest(spec, np.random.RandomState(i))
+             for i in range(8)]
+    stacked = nest_utils.stack_nested_arrays(items)
+
+    self._report('stack_nested_arrays',
+                 lambda: nest_utils.stack_nested_arrays(items), 1000)
+    self._report('compiled_stack_arrays',
+                 lambda: compiled_nest.stack_arrays(items), 1000)
+    self._report('unstack_nested_arrays',
+                 lambda: nest_utils.unstack_nested_arrays(stacked), 1000)
+    self._report('compiled_unstack_arrays',
+                 lambda: compiled_nest.unstack_arrays(stacked), 1000)
+
+
+  def benchmark_trajectory_batch_write_and_read(self):
+    spec = _trajectory_spec()
+    items = [array_spec.sample_spec_nest(spec, np.random.RandomState(i))
+             for i in range(8)]
+    batch = nest_utils.BatchedArrayNest(spec, (8,))
+
+    def write_rows():
+      for i, item in enumerate(items):
+        batch.write(i, item)
+
+    self._report('batched_array_nest_write', write_rows, 1000)
+    self._report('batched_array_nest_read',
+                 lambda: [batch.read(i) for i in range(8)], 1000)
+
 if __name__ == '__main__':
   tf.test.main()
@@ -210,6 +210,12 @@ def dynamic_unroll(cell,
   If `n == 1` is known statically, then only a single step is executed.
   This is done via a static unroll without using `tf.while_loop`.
 
+  If `cell` is a `tf.keras.layers.LSTMCell` without dropout, `inputs` is a
+  single float32 tensor and `mask_fn` is not set, the LSTM is unrolled by a
+  fused loop: the input projection of all time steps is computed by a single
+  matmul before the loop, and resets are applied by multiplying the state with
+  a precomputed mask, which is much faster on CPU than stepping the cell.
+
   Args:
     cell: A `tf.nn.rnn_cell.RNNCell` or Keras `RNNCell` (e.g. `LSTMCell`)
       whose `call()` method has the signature `call(input, state, ...)`.
@@ -317,6 +323,17 @@ def dynamic_unroll(cell,
           zero_state=zero_state,
           mask_fn=mask_fn,
           batch_size=batch_size)
+    elif _is_fusable_lstm_cell(cell, inputs, initial_state, mask_fn):
+      return _dynamic_unroll_lstm(
+          cell,
+          inputs,
+          reset_mask,
+          initial_state=initial_state,
+          parallel_iterations=parallel_iterations,
+          swap_memory=swap_memory,
+          iterations=iterations,
+          batch_size=batch_size,
+          const_batch_size=const_batch_size)
     else:
       return _dynamic_unroll_multi_step(
           cell,
@@ -333,6 +350,53 @@ def dynamic_unroll(cell,
           const_batch_size=const_batch_size)
 
 
+def unroll_with_burn_in(network, inputs, network_state=None, burn_in_steps=0):
+  """Unrolls a recurrent network over sequences after warming up its state.
+
+  The network is first unrolled over the `burn_in_steps` leading time steps of
+  `inputs`, starting from `network_state`, to compute its state at the start of
+  the remaining steps. No gradients flow through the burn-in steps: they only
+  move the state away from its (possibly stale or zero) initial value, and the
+  network is trained on the remaining steps, as in truncated backpropagation
+  through time.
+
+  Args:
+    network: A `network.Network` called as `network(*inputs, network_state)`,
+      e.g. a `QRnnNetwork` with inputs `(observation, step_type)`.
+    inputs: A tuple of the positional inputs of `network`, nests of tensors
+      shaped `[batch_size, n, ...]`.
+    network_state: (optional) The state of the network before the first time
+      step of `inputs`, e.g. a policy state stored in the replay buffer. If
+      None, the network starts from its zero state.
+    burn_in_steps: Python int, the number of leading time steps only used to
+      compute the state of the network.
+
+  Returns:
+    A tuple `(outputs, network_state)` with the outputs of the network for all
+    the `n` time steps, where the outputs of the burn-in steps are wrapped in
+    `tf.stop_gradient`, and the final network state.
+  """
+  if not burn_in_steps:
+    if network_state is None:
+      return network(*inputs)
+    return network(*inputs, network_state=network_state)
+
+  with tf.name_scope('burn_in'):
+    burn_in_inputs = nest.map_structure(lambda t: t[:, :burn_in_steps], inputs)
+    inputs = nest.map_structure(lambda t: t[:, burn_in_steps:], inputs)
+    if network_state is None:
+      burn_in_outputs, network_state = network(*burn_in_inputs)
+    else:
+      burn_in_outputs, network_state = network(
+          *burn_in_inputs, network_state=network_state)
+    burn_in_outputs = nest.map_structure(tf.stop_gradient, burn_in_outputs)
+    network_state = nest.map_structure(tf.stop_gradient, network_state)
+  outputs, network_state = network(*inputs, network_state=network_state)
+  outputs = nest.map_structure(lambda b, o: tf.concat([b, o], axis=1),
+                               burn_in_outputs, outputs)
+  return outputs, network_state
+
+
 def _maybe_reset_state(reset, s_zero, s):
   if not isinstance(s, tf.TensorArray) and s.shape.ndims > 0:
     return tf.where(reset, s_zero, s)
@@ -502,3 +566,111 @@ def _dynamic_unroll_multi_step(cell,
     mask = tf.transpose(mask)
 
   return (outputs, final_state, mask)
+
+
+def _is_fusable_lstm_cell(cell, inputs, initial_state, mask_fn):
+  """Whether `dynamic_unroll` can unroll `cell` with `_dynamic_unroll_lstm`."""
+  return (isinstance(cell, tf.keras.layers.LSTMCell)
+          and not cell.dropout
+          and not cell.recurrent_dropout
+          and mask_fn is None
+          and not nest.is_sequence(inputs)
+          and inputs.dtype == tf.float32
+          and len(nest.flatten(initial_state)) == 2)
+
+
+def _dynamic_unroll_lstm(cell,
+                         inputs,
+                         reset_mask,
+                         initial_state,
+                         parallel_iterations,
+                         swap_memory,
+                         iterations,
+                         batch_size,
+                         const_batch_size):
+  """Helper for dynamic_unroll which runs a fused loop for a Keras LSTMCell.
+
+  Computes the same outputs and final state as `_dynamic_unroll_multi_step`
+  with the cell's own weights, but only the recurrent matmul and the gates are
+  computed inside the `tf.while_loop`.
+  """
+  with tf.name_scope("fused_lstm"):
+    if not cell.built:
+      # Create the cell's variables the same way stepping the cell would. In
+      # graph mode this step is never run since its outputs are not used.
+      cell(inputs[0], initial_state)
+
+    units = cell.units
+    input_depth = inputs.shape[2].value or tf.shape(inputs)[2]
+
+    # Project the inputs of all the time steps with a single matmul.
+    input_projection = tf.matmul(
+        tf.reshape(inputs, [-1, input_depth]), cell.kernel)
+    if cell.use_bias:
+      input_projection = tf.nn.bias_add(input_projection, cell.bias)
+    input_projection = tf.reshape(
+        input_projection, [iterations, batch_size, 4 * units])
+
+    # The zero state of an LSTMCell is all zeros, so a reset is a product
+    # with a mask that is 0 wherever reset_mask is True.
+    keep_mask = tf.expand_dims(
+        tf.to_float(tf.logical_not(reset_mask)), -1)
+
+    projection_ta = tf.TensorArray(
+        dtype=tf.float32,
+        size=iterations,
+        element_shape=tf.TensorShape([const_batch_size, 4 * units])).unstack(
+            input_projection)
+    keep_mask_ta = tf.TensorArray(
+        dtype=tf.float32,
+        size=iterations,
+        element_shape=tf.TensorShape([const_batch_size, 1])).unstack(
+            keep_mask)
+    output_ta = tf.TensorArray(
+        dtype=tf.float32,
+        size=iterations,
+        element_shape=tf.TensorShape([const_batch_size, units]))
+
+    recurrent_kernel = cell.recurrent_kernel
+    activation = cell.activation
+    recurrent_activation = cell.recurrent_activation
+
+    def pred(time, *unused_args):
+      return time < iterations
+
+    def body(time, h, c, output_ta):
+      """Runs the LSTM for the time step `time`."""
+      keep = keep_mask_ta.read(time)
+      h *= keep
+      c *= keep
+      z = projection_ta.read(time) + tf.matmul(h, recurrent_kernel)
+      z_i, z_f, z_c, z_o = tf.split(z, 4, axis=1)
+      c = (recurrent_activation(z_f) * c +
+           recurrent_activation(z_i) * activation(z_c))
+      h = recurrent_activation(z_o) * activation(c)
+      return (time + 1, h, c, output_ta.write(time, h))
+
+    h, c = nest.flatten(initial_state)
+    with tf.variable_scope(tf.get_variable_scope()) as varscope:
+      if (not tf.contrib.eager.executing_eagerly()
+          and varscope.caching_device is None):
+        varscope.set_caching_device(lambda op: op.device)
+
+      _, h, c, output_ta = tf.while_loop(
+          pred,
+          body,
+          (tf.constant(0, name="time"), h, c, output_ta),
+          parallel_iterations=parallel_iterations,
+          swap_memory=swap_memory,
+          maximum_iterations=iterations)
+
+    outputs = output_ta.stack()
+    if isinstance(iterations, int):
+      outputs.set_shape(
+          tf.TensorShape([iterations]).concatenate(outputs.shape[1:]))
+
+    # Convert back to batch major.
+    outputs = tf.contrib.rnn.transpose_batch_time(outputs)
+    final_state = nest.pack_sequence_as(initial_state, [h, c])
+
+  return (outputs, final_state, None)
@@ -22,6 +22,8 @@ from __future__ import print_function
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.networks import q_rnn_network
+from tf_agents.specs import tensor_spec
 from tf_agents.utils import rnn_utils
 from tensorflow.python.framework import test_util  # TF internal
 
@@ -218,6 +220,94 @@ class DynamicUnrollTest(tf.test.TestCase):
     self.assertAllClose(outputs, expected_outputs)
 
 
+class FusedLSTMUnrollTest(tf.test.TestCase):
+
+  def _unroll(self, cell, inputs, reset_mask, initial_state):
+    return rnn_utils.dynamic_unroll(
+        cell, inputs, reset_mask, initial_state=initial_state)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testFusedLSTMMatchesCellUnroll(self):
+    cell = tf.keras.layers.LSTMCell(3)
+    # A StackedRNNCells wrapper is not fused and steps the same LSTMCell.
+    stacked_cell = tf.keras.layers.StackedRNNCells([cell])
+    batch_size = 4
+    max_time = 7
+    inputs = tf.random_uniform((batch_size, max_time, 2), dtype=tf.float32)
+    reset_mask = tf.random_normal((batch_size, max_time)) > 0
+    initial_state = [tf.random_uniform((batch_size, 3)),
+                     tf.random_uniform((batch_size, 3))]
+
+    outputs, final_state, _ = self._unroll(
+        stacked_cell, inputs, reset_mask, [initial_state])
+    self.assertTrue(rnn_utils._is_fusable_lstm_cell(  # pylint: disable=protected-access
+        cell, inputs, initial_state, None))
+    fused_outputs, fused_final_state, _ = self._unroll(
+        cell, inputs, reset_mask, initial_state)
+    self.assertEqual(outputs.shape, fused_outputs.shape)
+
+    self.evaluate(tf.global_variables_initializer())
+    outputs, final_state, fused_outputs, fused_final_state = self.evaluate(
+        (outputs, final_state, fused_outputs, fused_final_state))
+    self.assertAllClose(outputs, fused_outputs)
+    self.assertAllClose(final_state[0], fused_final_state)
+
+  def testFusedLSTMGradientsMatchCellUnroll(self):
+    cell = tf.keras.layers.LSTMCell(3)
+    stacked_cell = tf.keras.layers.StackedRNNCells([cell])
+    inputs = tf.random_uniform((4, 7, 2), dtype=tf.float32)
+    reset_mask = tf.random_normal((4, 7)) > 0
+    initial_state = cell.get_initial_state(batch_size=4, dtype=tf.float32)
+
+    outputs, _, _ = self._unroll(
+        stacked_cell, inputs, reset_mask, [initial_state])
+    fused_outputs, _, _ = self._unroll(cell, inputs, reset_mask, initial_state)
+    gradients = tf.gradients(tf.reduce_sum(outputs), cell.trainable_weights)
+    fused_gradients = tf.gradients(
+        tf.reduce_sum(fused_outputs), cell.trainable_weights)
+
+    self.evaluate(tf.global_variables_initializer())
+    gradients, fused_gradients = self.evaluate((gradients, fused_gradients))
+    for gradient, fused_gradient in zip(gradients, fused_gradients):
+      self.assertAllClose(gradient, fused_gradient)
+
+
+class UnrollWithBurnInTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(UnrollWithBurnInTest, self).setUp()
+    observation_spec = tensor_spec.TensorSpec([2], tf.float32)
+    action_spec = tensor_spec.BoundedTensorSpec([1], tf.int32, 0, 1)
+    self._network = q_rnn_network.QRnnNetwork(
+        observation_spec, action_spec, input_fc_layer_params=None,
+        lstm_size=(3,), output_fc_layer_params=None)
+    observations = tf.random_uniform((4, 5, 2), dtype=tf.float32)
+    step_types = tf.ones((4, 5), dtype=tf.int32)
+    self._inputs = (observations, step_types)
+
+  def testOutputsMatchFullUnroll(self):
+    outputs, final_state = rnn_utils.unroll_with_burn_in(
+        self._network, self._inputs, burn_in_steps=2)
+    expected_outputs, expected_final_state = self._network(*self._inputs)
+    self.evaluate(tf.global_variables_initializer())
+    outputs, final_state, expected_outputs, expected_final_state = (
+        self.evaluate((outputs, final_state, expected_outputs,
+                       expected_final_state)))
+    self.assertEqual((4, 5, 2), outputs.shape)
+    self.assertAllClose(outputs, expected_outputs)
+    self.assertAllClose(final_state, expected_final_state)
+
+  def testNoGradientsThroughBurnIn(self):
+    outputs, _ = rnn_utils.unroll_with_burn_in(
+        self._network, self._inputs, burn_in_steps=2)
+    burn_in_gradients = tf.gradients(
+        tf.reduce_sum(outputs[:, :2]), self._network.trainable_weights)
+    self.assertTrue(all(g is None for g in burn_in_gradients))
+    gradients = tf.gradients(
+        tf.reduce_sum(outputs[:, 2:]), self._network.trainable_weights)
+    self.assertTrue(any(g is not None for g in gradients))
+
+
 class RNNUtilsBenchmark(tf.test.Benchmark):
 
   def benchmark_range_with_reset_mask(self):
@@ -238,6 +328,37 @@ class RNNUtilsBenchmark(tf.test.Benchmark):
             s, v_scan.op,
             name='range_with_reset_mask_scan_bs_%d_n_%d' % (batch_size, n))
 
+  def benchmark_lstm_unroll(self):
+    for batch_size in [1, 32, 128]:
+      for n in [10, 100, 1000]:
+        tf.reset_default_graph()
+        with tf.device('/cpu:0'):
+          cell = tf.keras.layers.LSTMCell(64)
+          inputs = tf.get_variable(
+              'inputs', initializer=tf.random_normal((batch_size, n, 32)))
+          # reset == true for ~2% of the locations.
+          reset_mask = tf.get_variable(
+              'reset_mask',
+              initializer=tf.random_normal((batch_size, n)) > 2)
+          fused_outputs, _, _ = rnn_utils.dynamic_unroll(
+              cell, inputs, reset_mask, dtype=tf.float32)
+          # The generic unroll steps the same cell through a wrapper.
+          outputs, _, _ = rnn_utils.dynamic_unroll(
+              tf.keras.layers.StackedRNNCells([cell]), inputs, reset_mask,
+              dtype=tf.float32)
+          fused_train_op = tf.group(tf.gradients(
+              tf.reduce_sum(fused_outputs), cell.trainable_weights))
+          train_op = tf.group(tf.gradients(
+              tf.reduce_sum(outputs), cell.trainable_weights))
+        s = tf.Session()
+        s.run(tf.global_variables_initializer())
+        self.run_op_benchmark(
+            s, fused_train_op,
+            name='fused_lstm_unroll_bs_%d_n_%d' % (batch_size, n))
+        self.run_op_benchmark(
+            s, train_op,
+            name='lstm_cell_unroll_bs_%d_n_%d' % (batch_size, n))
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -16,10 +16,144 @@
 """Methods for computing advantages and target values.
 """
 
+import numpy as np
 import tensorflow as tf
 
+# Time dimensions shorter than this are computed with a sequential `tf.scan`.
+_MIN_PARALLEL_SCAN_LENGTH = 8
+# The NumPy parallel scan does O(T log T) work per element instead of O(T). It
+# only beats a Python loop over T when there are few elements per time step.
+_NUMPY_MAX_PARALLEL_SCAN_ELEMENTS = 32
 
-def discounted_return(rewards, discounts, final_value=None, time_major=True):
+
+def _parallel_reverse_linear_recurrence(coefficients, inputs, length,
+                                        concat_fn, ones_like_fn,
+                                        zeros_like_fn):
+  """Computes the affine maps folding x_t = inputs_t + coefficients_t * x_t+1.
+
+  Uses a parallel prefix (Hillis-Steele) scan with O(log T) depth: after the
+  round with shift k, element t holds the composition of the maps t..t+2k-1.
+
+  Args:
+    coefficients: Time major array or tensor with shape [T, ...].
+    inputs: Time major array or tensor with the shape of `coefficients`.
+    length: The number of time steps T.
+    concat_fn: Concatenates a list of arrays or tensors along axis 0.
+    ones_like_fn: Returns ones with the shape and dtype of its argument.
+    zeros_like_fn: Returns zeros with the shape and dtype of its argument.
+
+  Returns:
+    A tuple `(products, sums)` such that x_t = sums_t + products_t * x_T.
+  """
+  shift = 1
+  while shift < length:
+    next_coefficients = concat_fn(
+        [coefficients[shift:], ones_like_fn(coefficients[:shift])])
+    next_inputs = concat_fn([inputs[shift:], zeros_like_fn(inputs[:shift])])
+    inputs = inputs + coefficients * next_inputs
+    coefficients = coefficients * next_coefficients
+    shift *= 2
+  return coefficients, inputs
+
+
+def reverse_linear_recurrence(coefficients, inputs, final_value,
+                              use_parallel_scan=None, back_prop=True):
+  """Computes x_t = inputs_t + coefficients_t * x_{t+1} with x_T = final_value.
+
+  Discounted returns and GAE advantages are both of this form.
+
+  Args:
+    coefficients: Time major tensor with shape [T, ...].
+    inputs: Time major tensor with the shape of `coefficients`.
+    final_value: Tensor with shape [...] representing x_T.
+    use_parallel_scan: Whether to use a parallel scan with O(log T) depth
+      instead of a sequential `tf.scan` over T steps. If None, the parallel
+      scan is used when T is statically known and at least
+      `_MIN_PARALLEL_SCAN_LENGTH`.
+    back_prop: Whether gradients flow through the result. With the parallel
+      scan, a False value stops the gradients at the output.
+
+  Returns:
+    A tensor with shape [T, ...] holding x_t.
+
+  Raises:
+    ValueError: If `use_parallel_scan` is True but T is not statically known.
+  """
+  coefficients = tf.convert_to_tensor(coefficients)
+  inputs = tf.convert_to_tensor(inputs)
+  final_value = tf.convert_to_tensor(final_value)
+  length = inputs.shape[0].value if inputs.shape.ndims else None
+  if use_parallel_scan is None:
+    use_parallel_scan = (length is not None and
+                         length >= _MIN_PARALLEL_SCAN_LENGTH)
+  if not use_parallel_scan:
+    def linear_recurrence_fn(accumulated, coefficient_input):
+      coefficient, value = coefficient_input
+      return value + coefficient * accumulated
+
+    return tf.scan(
+        fn=linear_recurrence_fn,
+        elems=(coefficients, inputs),
+        reverse=True,
+        initializer=final_value,
+        back_prop=back_prop)
+
+  if length is None:
+    raise ValueError('The parallel scan requires a statically known time '
+                     'dimension, got shape {}.'.format(inputs.shape))
+  products, sums = _parallel_reverse_linear_recurrence(
+      coefficients, inputs, length,
+      concat_fn=lambda values: tf.concat(values, axis=0),
+      ones_like_fn=tf.ones_like,
+      zeros_like_fn=tf.zeros_like)
+  outputs = sums + products * final_value
+  if not back_prop:
+    outputs = tf.stop_gradient(outputs)
+  return outputs
+
+
+def numpy_reverse_linear_recurrence(coefficients, inputs, final_value,
+                                    use_parallel_scan=None):
+  """NumPy version of `reverse_linear_recurrence`.
+
+  Args:
+    coefficients: Time major `np.array` with shape [T, ...].
+    inputs: Time major `np.array` with the shape of `coefficients`.
+    final_value: `np.array` with shape [...] representing x_T.
+    use_parallel_scan: Whether to use a vectorized parallel scan instead of a
+      Python loop over T. If None, the parallel scan is used when T is at least
+      `_MIN_PARALLEL_SCAN_LENGTH` and there are at most
+      `_NUMPY_MAX_PARALLEL_SCAN_ELEMENTS` elements per time step.
+
+  Returns:
+    A `np.array` with shape [T, ...] holding x_t.
+  """
+  coefficients = np.asarray(coefficients)
+  inputs = np.asarray(inputs)
+  length = len(inputs)
+  if use_parallel_scan is None:
+    use_parallel_scan = (
+        length >= _MIN_PARALLEL_SCAN_LENGTH and
+        inputs[0].size <= _NUMPY_MAX_PARALLEL_SCAN_ELEMENTS)
+  if not use_parallel_scan:
+    outputs = np.zeros(np.broadcast(inputs, final_value).shape,
+                       np.result_type(inputs, final_value))
+    accumulated = final_value
+    for t in reversed(range(length)):
+      accumulated = inputs[t] + coefficients[t] * accumulated
+      outputs[t] = accumulated
+    return outputs
+
+  products, sums = _parallel_reverse_linear_recurrence(
+      coefficients, inputs, length,
+      concat_fn=lambda values: np.concatenate(values, axis=0),
+      ones_like_fn=np.ones_like,
+      zeros_like_fn=np.zeros_like)
+  return sums + products * final_value
+
+
+def discounted_return(rewards, discounts, final_value=None, time_major=True,
+                      use_parallel_scan=None):
   """Computes discounted return.
 
   ```
@@ -42,6 +176,8 @@ def discounted_return(rewards, discounts, final_value=None, time_major=True):
       reward to go computation. Otherwise it's zero.
     time_major: A boolean indicating whether input tensors are time major. False
       means input tensors have shape [B, T].
+    use_parallel_scan: Whether to accumulate the rewards with a parallel scan.
+      See `reverse_linear_recurrence`; None selects it based on T.
 
   Returns:
       A tensor with shape [T, B] (or [T]) representing the discounted returns.
@@ -55,15 +191,8 @@ def discounted_return(rewards, discounts, final_value=None, time_major=True):
   if final_value is None:
     final_value = tf.zeros_like(rewards[-1])
 
-  def discounted_return_fn(accumulated_discounted_reward, reward_discount):
-    reward, discount = reward_discount
-    return accumulated_discounted_reward * discount + reward
-
-  returns = tf.scan(
-      fn=discounted_return_fn,
-      elems=(rewards, discounts),
-      reverse=True,
-      initializer=final_value,
+  returns = reverse_linear_recurrence(
+      discounts, rewards, final_value, use_parallel_scan=use_parallel_scan,
       back_prop=False)
 
   if not time_major:
@@ -78,7 +207,8 @@ def generalized_advantage_estimation(values,
                                      discounts,
                                      rewards,
                                      td_lambda=1.0,
-                                     time_major=True):
+                                     time_major=True,
+                                     use_parallel_scan=None):
   """Computes generalized advantage estimation (GAE).
 
   For theory, see
@@ -101,6 +231,8 @@ def generalized_advantage_estimation(values,
       in temporal difference.
     time_major: A boolean indicating whether input tensors are time major.
       False means input tensors have shape [B, T].
+    use_parallel_scan: Whether to accumulate the TD errors with a parallel
+      scan. See `reverse_linear_recurrence`; None selects it based on T.
 
   Returns:
     A tensor with shape [T, B] representing advantages. Shape is [B, T] when
@@ -120,19 +252,85 @@ def generalized_advantage_estimation(values,
     delta = rewards + discounts * next_values - values
     weighted_discounts = discounts * td_lambda
 
-    def weighted_cumulative_td_fn(accumulated_td, reversed_weights_td_tuple):
-      weighted_discount, td = reversed_weights_td_tuple
-      return td + weighted_discount * accumulated_td
-
-    advantages = tf.scan(
-        fn=weighted_cumulative_td_fn,
-        elems=(weighted_discounts, delta),
-        initializer=tf.zeros_like(final_value),
-        reverse=True,
-        back_prop=False)
+    advantages = reverse_linear_recurrence(
+        weighted_discounts, delta, tf.zeros_like(final_value),
+        use_parallel_scan=use_parallel_scan, back_prop=False)
 
   if not time_major:
     with tf.name_scope("to_batch_major_tensors"):
       advantages = tf.transpose(advantages)
 
   return tf.stop_gradient(advantages)
+
+
+def numpy_discounted_return(rewards, discounts, final_value=None,
+                            time_major=True):
+  """NumPy version of `discounted_return`, for the Python collection path.
+
+  Args:
+    rewards: `np.array` with shape [T, B] (or [T]) representing rewards.
+    discounts: `np.array` with shape [T, B] (or [T]) representing discounts.
+    final_value: Optional `np.array` with shape [B] (or a scalar) representing
+      the value estimate at t=T. Defaults to zero.
+    time_major: A boolean indicating whether input arrays are time major. False
+      means input arrays have shape [B, T].
+
+  Returns:
+    A `np.array` with shape [T, B] (or [T]) representing the discounted returns.
+    Shape is [B, T] when time_major is false.
+  """
+  rewards = np.asarray(rewards)
+  discounts = np.asarray(discounts)
+  if not time_major:
+    rewards = np.transpose(rewards)
+    discounts = np.transpose(discounts)
+  if final_value is None:
+    final_value = np.zeros_like(rewards[-1])
+
+  returns = numpy_reverse_linear_recurrence(discounts, rewards, final_value)
+
+  if not time_major:
+    returns = np.transpose(returns)
+  return returns
+
+
+def numpy_generalized_advantage_estimation(values,
+                                           final_value,
+                                           discounts,
+                                           rewards,
+                                           td_lambda=1.0,
+                                           time_major=True):
+  """NumPy version of `generalized_advantage_estimation`.
+
+  Args:
+    values: `np.array` with shape [T, B] representing value estimates.
+    final_value: `np.array` with shape [B] representing value estimate at t=T.
+    discounts: `np.array` with shape [T, B] representing discounts received by
+      following the behavior policy.
+    rewards: `np.array` with shape [T, B] representing rewards received by
+      following the behavior policy.
+    td_lambda: A float scalar between [0, 1].
+    time_major: A boolean indicating whether input arrays are time major.
+      False means input arrays have shape [B, T].
+
+  Returns:
+    A `np.array` with shape [T, B] representing advantages. Shape is [B, T]
+    when time_major is false.
+  """
+  values = np.asarray(values)
+  final_value = np.asarray(final_value)
+  discounts = np.asarray(discounts)
+  rewards = np.asarray(rewards)
+  if not time_major:
+    values = np.transpose(values)
+    discounts = np.transpose(discounts)
+    rewards = np.transpose(rewards)
+
+  next_values = np.concatenate([values[1:], final_value[None]], axis=0)
+  delta = rewards + discounts * next_values - values
+  advantages = numpy_reverse_linear_recurrence(
+      discounts * td_lambda, delta, np.zeros_like(final_value))
+
+  if not time_major:
+    advantages = np.transpose(advantages)
+  return advantages
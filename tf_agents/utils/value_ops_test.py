@@ -197,5 +197,109 @@ class GeneralizedAdvantageEstimationTest(tf.test.TestCase,
     self.assertAllClose(advantages, ground_truth)
 
 
+class ParallelScanTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((1, 3), (7, 3), (8, 3), (33, 5), (100, 1))
+  def testDiscountedReturnParallelScanMatchesScan(self, num_time_steps,
+                                                  batch_size):
+    rewards = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    discounts = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    final_value = np.random.rand(batch_size).astype(np.float32)
+
+    scan_returns = value_ops.discounted_return(
+        rewards, discounts, final_value, use_parallel_scan=False)
+    parallel_returns = value_ops.discounted_return(
+        rewards, discounts, final_value, use_parallel_scan=True)
+    self.assertAllClose(scan_returns, parallel_returns)
+
+  @parameterized.parameters((1, 3), (7, 3), (8, 3), (33, 5), (100, 1))
+  def testAdvantagesParallelScanMatchesScan(self, num_time_steps, batch_size):
+    rewards = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    discounts = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    values = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    final_value = np.random.rand(batch_size).astype(np.float32)
+
+    advantages = [
+        value_ops.generalized_advantage_estimation(
+            values, final_value, discounts, rewards, td_lambda=0.95,
+            use_parallel_scan=use_parallel_scan)
+        for use_parallel_scan in (False, True)]
+    self.assertAllClose(advantages[0], advantages[1])
+
+  @parameterized.parameters(True, False)
+  def testParallelScanBackProp(self, back_prop):
+    coefficients = tf.constant(np.random.rand(8, 2).astype(np.float32))
+    inputs = tf.constant(np.random.rand(8, 2).astype(np.float32))
+    final_value = tf.constant(np.random.rand(2).astype(np.float32))
+    outputs = value_ops.reverse_linear_recurrence(
+        coefficients, inputs, final_value, use_parallel_scan=True,
+        back_prop=back_prop)
+    gradients = tf.gradients(outputs, [coefficients, inputs, final_value])
+    self.assertEqual(back_prop, all(g is not None for g in gradients))
+    self.assertEqual(not back_prop, all(g is None for g in gradients))
+
+  def testParallelScanRaisesWithUnknownLength(self):
+    rewards = tf.placeholder(tf.float32, [None, 2])
+    with self.assertRaises(ValueError):
+      value_ops.discounted_return(
+          rewards, rewards, use_parallel_scan=True)
+
+
+class NumpyValueOpsTest(parameterized.TestCase):
+
+  @parameterized.parameters((None,), (False,), (True,))
+  def testNumpyReverseLinearRecurrence(self, use_parallel_scan):
+    rewards = np.random.rand(50, 64).astype(np.float32)
+    discounts = np.random.rand(50, 64).astype(np.float32)
+    final_value = np.random.rand(64).astype(np.float32)
+
+    returns = value_ops.numpy_reverse_linear_recurrence(
+        discounts, rewards, final_value, use_parallel_scan=use_parallel_scan)
+    np.testing.assert_allclose(
+        returns, _numpy_discounted_return(rewards, discounts, final_value),
+        rtol=1e-5)
+
+  @parameterized.parameters((1, 1, False), (7, 9, False), (7, 9, True),
+                            (40, 3, True))
+  def testNumpyDiscountedReturn(self, num_time_steps, batch_size,
+                                with_final_value):
+    rewards = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    discounts = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    final_value = np.random.rand(batch_size).astype(
+        np.float32) if with_final_value else None
+
+    expected = _numpy_discounted_return(
+        rewards=rewards, discounts=discounts, final_value=final_value)
+    np.testing.assert_allclose(
+        value_ops.numpy_discounted_return(rewards, discounts, final_value),
+        expected, rtol=1e-5)
+    np.testing.assert_allclose(
+        value_ops.numpy_discounted_return(
+            rewards.T, discounts.T, final_value, time_major=False),
+        expected.T, rtol=1e-5)
+
+  @parameterized.parameters((1, 1, 0.7), (7, 9, 0.7), (7, 9, 0.), (33, 2, 1.))
+  def testNumpyAdvantages(self, num_time_steps, batch_size, td_lambda):
+    rewards = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    discounts = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    values = np.random.rand(num_time_steps, batch_size).astype(np.float32)
+    final_value = np.random.rand(batch_size).astype(np.float32)
+    ground_truth = _naive_gae_as_ground_truth(
+        discounts=discounts,
+        rewards=rewards,
+        values=values,
+        final_value=final_value,
+        td_lambda=td_lambda)
+
+    advantages = value_ops.numpy_generalized_advantage_estimation(
+        values, final_value, discounts, rewards, td_lambda=td_lambda)
+    np.testing.assert_allclose(advantages, ground_truth, rtol=1e-4, atol=1e-5)
+    advantages = value_ops.numpy_generalized_advantage_estimation(
+        values.T, final_value, discounts.T, rewards.T, td_lambda=td_lambda,
+        time_major=False)
+    np.testing.assert_allclose(advantages, ground_truth.T, rtol=1e-4,
+                               atol=1e-5)
+
+
 if __name__ == '__main__':
   tf.test.main()